@@ -0,0 +1,241 @@
+"""
+intake_agent.py
+
+IntakeAgent onboards NEW_PATIENT records.
+
+This agent:
+- Streams patient registrations from a local CSV or JSONL file
+- Validates them in chunks (constant memory, any file size)
+- Requests NEW_PATIENT → INTAKE_COMPLETED through the validator
+- Does NOT use LLMs
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.core.state import PatientState, PatientJourneyState, SIMULATION_START
+from app.core.validator import validate_transition
+
+
+REQUIRED_FIELDS = ("patient_id", "full_name", "date_of_birth")
+
+
+# -------------------------------------------------------------------
+# DATA TYPES
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class IntakeRecord:
+    patient_id: str
+    full_name: str
+    date_of_birth: date
+    phone: Optional[str] = None
+    email: Optional[str] = None
+
+
+@dataclass
+class IntakeSummary:
+    accepted: int = 0
+    rejected: int = 0
+    rejections: List[Tuple[int, str]] = field(default_factory=list)
+    max_rejections_kept: int = 100
+
+    def reject(self, line_no: int, reason: str):
+        self.rejected += 1
+        if len(self.rejections) < self.max_rejections_kept:
+            self.rejections.append((line_no, reason))
+
+
+# -------------------------------------------------------------------
+# STREAMING READERS
+# -------------------------------------------------------------------
+
+def iter_rows(path) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yields (line_no, row) from a .csv or .jsonl file, one row at a time.
+
+    Unparseable JSONL lines are yielded as {"_error": reason} so they
+    are rejected like any other invalid row.
+    """
+    path = Path(path)
+
+    with path.open(newline="", encoding="utf-8") as handle:
+        if path.suffix == ".csv":
+            for line_no, row in enumerate(csv.DictReader(handle), start=2):
+                yield line_no, row
+
+        elif path.suffix in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield line_no, {"_error": f"Invalid JSON: {exc.msg}"}
+                    continue
+
+                # Valid JSON but not a record, e.g. null or [1]
+                if not isinstance(row, dict):
+                    row = {"_error": f"Expected a JSON object, got {type(row).__name__}"}
+                yield line_no, row
+
+        else:
+            raise ValueError(f"Unsupported intake file type: {path.suffix}")
+
+
+def iter_chunks(path, chunk_size: int) -> Iterator[List[Tuple[int, Dict]]]:
+    rows = iter_rows(path)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# -------------------------------------------------------------------
+# INTAKE AGENT
+# -------------------------------------------------------------------
+
+class IntakeAgent:
+    """
+    IntakeAgent validates registrations and completes intake.
+    """
+
+    def __init__(self, chunk_size: int = None):
+        self.chunk_size = chunk_size or get_settings().intake_chunk_size
+
+    # -----------------------------
+    # Validation
+    # -----------------------------
+    def parse_record(self, row: Dict, today: date) -> Tuple[Optional[IntakeRecord], str]:
+        """
+        Returns (record, "OK") or (None, "Reason").
+        """
+        if "_error" in row:
+            return None, row["_error"]
+
+        for name in REQUIRED_FIELDS:
+            if not str(row.get(name) or "").strip():
+                return None, f"Missing required field: {name}"
+
+        try:
+            dob = date.fromisoformat(str(row["date_of_birth"]).strip())
+        except ValueError:
+            return None, f"Invalid date_of_birth: {row['date_of_birth']}"
+
+        if dob > today:
+            return None, "date_of_birth is in the future"
+
+        phone = str(row.get("phone") or "").strip() or None
+        email = str(row.get("email") or "").strip() or None
+
+        if phone is None and email is None:
+            return None, "At least one contact (phone or email) is required"
+
+        if email is not None and "@" not in email:
+            return None, f"Invalid email: {email}"
+
+        record = IntakeRecord(
+            patient_id=str(row["patient_id"]).strip(),
+            full_name=str(row["full_name"]).strip(),
+            date_of_birth=dob,
+            phone=phone,
+            email=email,
+        )
+        return record, "OK"
+
+    def validate_batch(
+        self,
+        rows: List[Tuple[int, Dict]],
+        today: date,
+        summary: IntakeSummary,
+    ) -> List[IntakeRecord]:
+        """
+        Validates one chunk. Duplicate patient ids inside the chunk
+        are rejected; ids are not tracked across chunks.
+        """
+        accepted: List[IntakeRecord] = []
+        seen = set()
+
+        for line_no, row in rows:
+            record, reason = self.parse_record(row, today)
+
+            if record is not None and record.patient_id in seen:
+                record, reason = None, f"Duplicate patient_id: {record.patient_id}"
+
+            if record is None:
+                summary.reject(line_no, reason)
+                continue
+
+            seen.add(record.patient_id)
+            accepted.append(record)
+
+        return accepted
+
+    # -----------------------------
+    # Transitions
+    # -----------------------------
+    def complete_intake(self, patient_state: PatientState) -> bool:
+        """
+        Requests NEW_PATIENT → INTAKE_COMPLETED.
+
+        Returns True if the transition was applied.
+        """
+        if patient_state.current_state != PatientJourneyState.NEW_PATIENT:
+            return False
+
+        allowed, reason = validate_transition(
+            patient_state=patient_state,
+            to_state=PatientJourneyState.INTAKE_COMPLETED,
+            requested_by="IntakeAgent",
+        )
+
+        if not allowed:
+            print(f"[IntakeAgent] Transition blocked: {reason}")
+            return False
+
+        patient_state.apply_transition(
+            to_state=PatientJourneyState.INTAKE_COMPLETED,
+            by="IntakeAgent",
+        )
+        return True
+
+    # -----------------------------
+    # File intake
+    # -----------------------------
+    def stream_intake(
+        self,
+        path,
+        summary: Optional[IntakeSummary] = None,
+        current_time: Optional[datetime] = None,
+    ) -> Iterator[List[PatientState]]:
+        """
+        Yields chunks of onboarded PatientStates (INTAKE_COMPLETED).
+
+        Only one chunk is held in memory at a time; pass a summary
+        to collect accepted / rejected counts.
+        """
+        summary = summary if summary is not None else IntakeSummary()
+        today = (current_time or SIMULATION_START).date()
+
+        for rows in iter_chunks(path, self.chunk_size):
+            patients: List[PatientState] = []
+
+            for record in self.validate_batch(rows, today, summary):
+                patient_state = PatientState(patient_id=record.patient_id)
+                if current_time is not None:
+                    patient_state.current_time = current_time
+
+                if self.complete_intake(patient_state):
+                    summary.accepted += 1
+                    patients.append(patient_state)
+                else:
+                    summary.reject(-1, f"Intake transition blocked for {record.patient_id}")
+
+            yield patients
@@ -5,6 +5,7 @@ Decides whether the patient journey workflow should continue or stop.
 """
 
 from app.core.state import PatientJourneyState
+from app.core.journey_index import journey_index
 
 
 
@@ -14,6 +15,17 @@ class MonitoringAgent:
             print("[MonitoringAgent] Escalation required. Halting workflow.")
             return "stop"
 
+        if patient_state.signals.get("journey_stalled"):
+            return "stop"
+
+        # Stop once the journey is closed, or can no longer be closed
+        remaining = journey_index.remaining_steps(patient_state)
+        if remaining is None:
+            print("[MonitoringAgent] Journey can no longer reach JOURNEY_CLOSED. Halting workflow.")
+            return "stop"
+        if remaining == 0:
+            return "stop"
+
         """
         Decide whether the workflow should continue or stop.
         """
@@ -11,13 +11,17 @@ This agent:
 - DOES NOT use LLMs
 """
 
+import asyncio
 from datetime import timedelta
-from typing import Dict
+from typing import Dict, List, Tuple
 
-from app.core.state import PatientState, EventStatus
+from app.config.settings import get_settings
+from app.core.state import PatientState, PatientEvent, EventStatus
 from app.tools.notification_tools import (
     send_reminder,
     send_missed_alert,
+    asend_reminder,
+    asend_missed_alert,
 )
 
 
@@ -27,53 +31,97 @@ class ReminderAgent:
     and triggers notification tools accordingly.
     """
 
-    def __init__(self, reminder_offset_minutes: int = 30):
+    def __init__(self, reminder_offset_minutes: int = None):
         """
         reminder_offset_minutes:
         How long before scheduled time to send reminder
+        (defaults to settings.reminder_offset_minutes)
         """
+        if reminder_offset_minutes is None:
+            reminder_offset_minutes = get_settings().reminder_offset_minutes
+
         self.reminder_offset = timedelta(minutes=reminder_offset_minutes)
 
-    def run(self, patient_state: PatientState) -> Dict:
+    def _due_notifications(self, patient_state: PatientState) -> List[Tuple[str, PatientEvent]]:
         """
-        Execute reminder logic.
+        Returns [(kind, event)] for every SCHEDULED event that is
+        missed ("missed") or inside its reminder window ("reminder").
 
-        Returns a signal dictionary used by LangGraph routing.
+        Only `patient_state.due_events` are checked when a timer-driven
+        caller has set them; otherwise every event is scanned.
         """
 
         current_time = patient_state.current_time
-        signals = {
-            "reminder_sent": False,
-            "missed_detected": False,
-        }
+        due = []
+
+        candidates = patient_state.due_events
+        if candidates is None:
+            candidates = patient_state.events
 
-        for event in patient_state.events:
+        for event in candidates:
             # Ignore completed or already missed events
             if event.status != EventStatus.SCHEDULED:
                 continue
 
             # 1️⃣ Missed event detection
             if current_time > event.scheduled_time:
-                send_missed_alert(
-                    patient_id=patient_state.patient_id,
-                    event_type=event.event_type,
-                    event_id=event.event_id,
-                )
-                # 🔔 Signal to the rest of the system
-                patient_state.set_signal("missed_event")
-                
-                signals["missed_detected"] = True
+                due.append(("missed", event))
                 continue
 
             # 2️⃣ Reminder detection
             reminder_time = event.scheduled_time - self.reminder_offset
 
             if reminder_time <= current_time <= event.scheduled_time:
-                send_reminder(
-                    patient_id=patient_state.patient_id,
-                    event_type=event.event_type,
-                    event_id=event.event_id,
-                )
-                signals["reminder_sent"] = True
+                due.append(("reminder", event))
+
+        return due
+
+    def _signals(self, patient_state: PatientState, due) -> Dict:
+        signals = {
+            "reminder_sent": any(kind == "reminder" for kind, _ in due),
+            "missed_detected": any(kind == "missed" for kind, _ in due),
+        }
+
+        if signals["missed_detected"]:
+            # 🔔 Signal to the rest of the system
+            patient_state.set_signal("missed_event")
 
         return signals
+
+    def run(self, patient_state: PatientState) -> Dict:
+        """
+        Execute reminder logic.
+
+        Returns a signal dictionary used by LangGraph routing.
+        """
+
+        due = self._due_notifications(patient_state)
+
+        for kind, event in due:
+            send = send_missed_alert if kind == "missed" else send_reminder
+            send(
+                patient_id=patient_state.patient_id,
+                event_type=event.event_type,
+                event_id=event.event_id,
+            )
+
+        return self._signals(patient_state, due)
+
+    async def arun(self, patient_state: PatientState) -> Dict:
+        """
+        Async `run`: all of the patient's notifications are sent
+        concurrently (bounded by the notification limit).
+        """
+
+        due = self._due_notifications(patient_state)
+
+        await asyncio.gather(*(
+            (asend_missed_alert if kind == "missed" else asend_reminder)(
+                patient_id=patient_state.patient_id,
+                event_type=event.event_type,
+                event_id=event.event_id,
+            )
+            for kind, event in due
+        ))
+
+        return self._signals(patient_state, due)
@@ -5,34 +5,216 @@ LLM-based agent responsible for scheduling next steps
 (appointments, lab tests, follow-ups).
 """
 
+from datetime import timedelta
+
 from langchain_openai import ChatOpenAI
-from app.core.state import PatientJourneyState
+from app.config.settings import get_settings
+from app.core.state import PatientJourneyState, PatientEvent, EventStatus, STATE_BITS
+from app.core.journey_index import journey_index
+from app.core.rescheduling import (
+    RetryPolicy,
+    reschedule_event,
+)
+from app.tools.scheduling_tools import (
+    SlotAllocator,
+    build_default_allocator,
+    build_scheduling_tools,
+)
+from app.tools.tool_executor import ToolExecutor
+
+
+MAX_RETRIES = dict(get_settings().max_retries)
+
+
+# Per-event-type backoff, built on MAX_RETRIES
+RETRY_BASE_DELAYS = {
+    "appointment": timedelta(days=2),
+    "lab_test": timedelta(days=1),
+    "follow_up": timedelta(days=7),
+}
+
+def build_retry_policies(max_retries) -> dict:
+    """
+    Builds {event_type: RetryPolicy} from {event_type: max_retries}.
+    """
+    return {
+        event_type: RetryPolicy(
+            max_retries=limit,
+            base_delay=RETRY_BASE_DELAYS.get(event_type, timedelta(days=1)),
+        )
+        for event_type, limit in max_retries.items()
+    }
 
 
-MAX_RETRIES = {
-    "appointment": 2,
-    "lab_test": 2,
-    "follow_up": 1,
+RETRY_POLICIES = build_retry_policies(MAX_RETRIES)
+
+# Unknown event types are never retried
+DEFAULT_RETRY_POLICY = RetryPolicy(max_retries=0)
+
+
+# Scheduled states that need a booked event
+STATE_EVENT_TYPES = {
+    PatientJourneyState.APPOINTMENT_SCHEDULED: "appointment",
+    PatientJourneyState.LAB_TEST_SCHEDULED: "lab_test",
+    PatientJourneyState.FOLLOW_UP_SCHEDULED: "follow_up",
+}
+
+# Event type → (resource kind, duration in minutes)
+EVENT_RESOURCES = {
+    "appointment": ("doctor", 30),
+    "lab_test": ("lab", 20),
+    "follow_up": ("doctor", 15),
 }
 
 
 
 class SchedulingAgent:
-    def __init__(self, use_llm: bool = False):
+    def __init__(
+        self,
+        use_llm: bool = False,
+        slot_allocator: SlotAllocator = None,
+        tools: list = None,
+        retry_policies: dict = None,
+    ):
         """
         SchedulingAgent can operate in:
         - rule-based mode (default, no LLM)
         - LLM-based mode (enabled later)
+
+        slot_allocator:
+        Clinic capacity used to place every booked event. Bookings
+        go through `self.tool_executor` ("allocate_slot").
+
+        tools:
+        Extra LangChain tools for the executor. In LLM mode the model
+        is bound to all executor tools, allocate_slot included.
+
+        retry_policies:
+        Per-event-type retry policies (defaults to RETRY_POLICIES,
+        built from settings.max_retries).
+
+        Call `close()` when the agent is no longer used.
         """
         self.use_llm = use_llm
         self.llm = None
+        self.slot_allocator = (
+            build_default_allocator() if slot_allocator is None else slot_allocator
+        )
+        self.tool_executor = ToolExecutor(
+            build_scheduling_tools(self.slot_allocator) + list(tools or [])
+        )
+        self.retry_policies = RETRY_POLICIES if retry_policies is None else retry_policies
 
         if self.use_llm:
             self.llm = ChatOpenAI(
-                model="gpt-4o-mini",
+                model=get_settings().llm_model,
                 temperature=0
             )
 
+            # The model sees every tool the executor can run, so its
+            # calls go through run_tool_loop(self.llm, messages, self.tool_executor)
+            self.llm = self.llm.bind_tools(list(self.tool_executor.tools.values()))
+
+
+    def close(self):
+        """
+        Releases the tool executor's thread pool. Direct tool calls
+        run inline, so the agent keeps working afterwards.
+        """
+        self.tool_executor.close()
+
+
+    def handle_missed_events(self, patient_state) -> bool:
+        """
+        Reschedules every missed event using its retry policy.
+
+        Returns False (and sets escalation_required) when an
+        event type has exhausted its retries, or when the clinic has
+        no slot left for the replacement.
+        """
+
+        missed = [
+            e for e in patient_state.events
+            if e.status == EventStatus.SCHEDULED
+            and patient_state.current_time > e.scheduled_time
+        ]
+
+        for event in missed:
+            event_type = event.event_type
+            policy = self.retry_policies.get(event_type, DEFAULT_RETRY_POLICY)
+
+            if patient_state.get_retry_count(event_type) >= policy.max_retries:
+                patient_state.set_event_status(event, EventStatus.MISSED)
+                patient_state.set_signal("escalation_required")
+                return False
+
+            patient_state.increment_retry(event_type)
+
+            replacement = reschedule_event(patient_state, event, policy)
+            if not self._place_in_slot(replacement):
+                # The missed event stays MISSED; nothing is rebooked
+                print(
+                    f"[SchedulingAgent] No slot left to reschedule {event_type} "
+                    f"{event.event_id}. Escalating."
+                )
+                patient_state.set_signal("escalation_required")
+                return False
+
+            patient_state.add_event(replacement)
+
+            print(
+                f"[SchedulingAgent] Rescheduled {event_type} "
+                f"{event.event_id} → {replacement.event_id} "
+                f"at {replacement.scheduled_time}"
+            )
+
+        return True
+
+
+    def _place_in_slot(self, event: PatientEvent) -> bool:
+        """
+        Moves `event` to the first free slot at or after its
+        scheduled time. Returns False if no capacity is left.
+        """
+        kind, duration = EVENT_RESOURCES.get(event.event_type, (None, 0))
+        if kind is None:
+            return True
+
+        assignment = self.tool_executor.call("allocate_slot", {
+            "kind": kind,
+            "earliest": event.scheduled_time,
+            "duration_minutes": duration,
+        })
+        if assignment is None:
+            return False
+
+        event.scheduled_time = assignment.start
+        event.resource_id = assignment.resource_id
+        return True
+
+
+    def needs_booking(self, to_state) -> bool:
+        return to_state in STATE_EVENT_TYPES
+
+
+    def book_event(self, patient_state, to_state):
+        """
+        Books a slot for the event behind `to_state` and attaches
+        it to the patient. Returns None if the clinic is full.
+        """
+        event_type = STATE_EVENT_TYPES[to_state]
+
+        event = PatientEvent(
+            event_id=f"{patient_state.patient_id}-{event_type}-{patient_state.event_count + 1}",
+            event_type=event_type,
+            scheduled_time=patient_state.current_time,
+        )
+        if not self._place_in_slot(event):
+            return None
+
+        patient_state.add_event(event)
+        return event
+
 
     def decide_next_state(self, patient_state):
         """
@@ -40,40 +222,41 @@ class SchedulingAgent:
         (Temporary rule-based logic; LLM reasoning can be added later)
         """
 
-        # Handle missed events (reschedule logic)
+        # Handle missed events (reschedule logic).
+        # Rescheduling keeps the current state, so no transition is requested.
         if patient_state.signals.get("missed_event"):
             patient_state.clear_signal("missed_event")
-        
-            for event in patient_state.events:
-                event_type = event.event_type
-                retries = patient_state.get_retry_count(event_type)
-        
-                if retries >= MAX_RETRIES.get(event_type, 0):
-                    patient_state.set_signal("escalation_required")
-                    return None
-        
-                patient_state.increment_retry(event_type)
-        
-                if patient_state.current_state == PatientJourneyState.APPOINTMENT_SCHEDULED:
-                    return PatientJourneyState.APPOINTMENT_SCHEDULED
-        
-                if patient_state.current_state == PatientJourneyState.LAB_TEST_SCHEDULED:
-                    return PatientJourneyState.LAB_TEST_SCHEDULED
-        
-                if patient_state.current_state == PatientJourneyState.FOLLOW_UP_SCHEDULED:
-                    return PatientJourneyState.FOLLOW_UP_SCHEDULED
-        
-
+            self.handle_missed_events(patient_state)
+            return None
 
         current = patient_state.current_state
+        desired = None
 
         if current == PatientJourneyState.INTAKE_COMPLETED:
-            return PatientJourneyState.APPOINTMENT_SCHEDULED
+            desired = PatientJourneyState.APPOINTMENT_SCHEDULED
+
+        elif current == PatientJourneyState.LAB_TEST_REQUIRED:
+            desired = PatientJourneyState.LAB_TEST_SCHEDULED
+
+        elif current == PatientJourneyState.DOCTOR_REVIEW_PENDING:
+            desired = PatientJourneyState.FOLLOW_UP_SCHEDULED
+
+        # Never request a state the journey could not close from (O(1) lookup)
+        if desired is not None:
+            mask = patient_state.completed_mask | STATE_BITS[desired]
+            if journey_index.steps_to_close(desired, mask) is None:
+                print(f"[SchedulingAgent] {desired.value} cannot lead to journey closure. Not requesting it.")
+                return None
 
-        if current == PatientJourneyState.LAB_TEST_REQUIRED:
-            return PatientJourneyState.LAB_TEST_SCHEDULED
+        return desired
 
-        if current == PatientJourneyState.DOCTOR_REVIEW_PENDING:
-            return PatientJourneyState.FOLLOW_UP_SCHEDULED
 
-        return None
+    async def adecide_next_state(self, patient_state):
+        """
+        Sync shim so async graph nodes can await the decision.
+
+        It does no async I/O: the rule-based decision and slot booking
+        are CPU-only and run inline. An LLM call added here should use
+        `self.llm.ainvoke` under the "llm" concurrency limit.
+        """
+        return self.decide_next_state(patient_state)
@@ -0,0 +1,494 @@
+"""
+capacity_sweep.py
+
+Monte Carlo capacity-planning sweeps.
+
+Answers "what if" questions such as:
+- follow-up max retries 1 → 2
+- reminder offset 30 → 120 minutes
+- patients miss 10% vs 25% of events
+
+For every grid point, many seeded replicas of a synthetic cohort are
+simulated with the real SchedulingAgent (slot booking, retry policies,
+escalation), ReminderAgent and transition validator. Replicas run on a
+process pool.
+
+Common random numbers: every random draw is keyed by
+(replica seed, patient, event type, attempt), so replica r faces the
+SAME patients at every grid point. Differences between points are
+then driven by the parameters, not by noise, and paired comparisons
+(`SweepReport.compare`) have much tighter intervals.
+
+Attendance model (synthetic, calibrate before trusting absolute numbers):
+    p(miss) = miss_probability * (1 - reduction * 0.5 ** (lead / half_life))
+where `lead` is how long before the event its reminder actually went
+out (0 reduction if no reminder was sent).
+
+CLI:
+    python -m app.analytics.capacity_sweep --follow-up-retries 1 2 \\
+        --reminder-offsets 30 120 --miss-probabilities 0.1 0.25
+"""
+
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.agents.intake_agent import IntakeAgent
+from app.agents.reminder_agent import ReminderAgent
+from app.agents.scheduling_agent import (
+    SchedulingAgent,
+    MAX_RETRIES,
+    build_retry_policies,
+)
+from app.core.state import PatientState, PatientJourneyState, EventStatus
+from app.core.validator import validate_transition
+from app.tools.scheduling_tools import build_default_allocator
+
+
+CLOSED = "closed"
+ESCALATED = "escalated"
+UNBOOKED = "unbooked"
+UNFINISHED = "unfinished"
+
+# Scheduled state → state reached when its event is attended
+COMPLETED_STATES = {
+    PatientJourneyState.APPOINTMENT_SCHEDULED: PatientJourneyState.APPOINTMENT_COMPLETED,
+    PatientJourneyState.LAB_TEST_SCHEDULED: PatientJourneyState.LAB_TEST_COMPLETED,
+    PatientJourneyState.FOLLOW_UP_SCHEDULED: PatientJourneyState.FOLLOW_UP_COMPLETED,
+}
+
+# Two-sided 95% Student-t critical values by degrees of freedom
+_T95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447,
+    7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131,
+    20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+
+
+def _t95(df: int) -> float:
+    if df <= 0:
+        return float("nan")
+    eligible = [k for k in _T95 if k <= df]
+    return _T95[max(eligible)] if df <= 120 else 1.960
+
+
+# -------------------------------------------------------------------
+# GRID
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class AttendanceModel:
+    reminder_reduction: float = 0.4
+    reminder_half_life_minutes: float = 240.0
+    lab_test_probability: float = 0.5
+
+    def miss_probability(self, base: float, lead: Optional[timedelta]) -> float:
+        if lead is None:
+            return base
+        decay = 0.5 ** (lead.total_seconds() / 60 / self.reminder_half_life_minutes)
+        return base * (1 - self.reminder_reduction * decay)
+
+
+@dataclass(frozen=True)
+class SweepPoint:
+    max_retries: Tuple[Tuple[str, int], ...]
+    reminder_offset_minutes: int
+    miss_probability: float
+
+    def label(self) -> str:
+        retries = ",".join(f"{k}={v}" for k, v in self.max_retries)
+        return (
+            f"retries[{retries}] offset={self.reminder_offset_minutes}m "
+            f"miss={self.miss_probability:g}"
+        )
+
+
+@dataclass
+class SweepGrid:
+    """
+    Cartesian product of the parameter options.
+
+    retry_options maps an event type to the max_retries values to try;
+    event types not listed keep settings.max_retries.
+    """
+    retry_options: Dict[str, List[int]] = field(default_factory=dict)
+    reminder_offsets: List[int] = field(default_factory=lambda: [30])
+    miss_probabilities: List[float] = field(default_factory=lambda: [0.15])
+
+    def points(self) -> List[SweepPoint]:
+        event_types = sorted(self.retry_options)
+        points = []
+
+        for limits in itertools.product(*(self.retry_options[t] for t in event_types)):
+            max_retries = dict(MAX_RETRIES)
+            max_retries.update(zip(event_types, limits))
+
+            for offset, miss in itertools.product(self.reminder_offsets, self.miss_probabilities):
+                points.append(SweepPoint(
+                    max_retries=tuple(sorted(max_retries.items())),
+                    reminder_offset_minutes=offset,
+                    miss_probability=miss,
+                ))
+        return points
+
+
+# -------------------------------------------------------------------
+# SIMULATION
+# -------------------------------------------------------------------
+
+def _uniform(seed: int, patient_id: str, key: str) -> float:
+    """
+    Deterministic U[0, 1) draw keyed by replica, patient and decision.
+    """
+    digest = hashlib.blake2b(f"{seed}:{patient_id}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+def _transition(patient_state: PatientState, to_state: PatientJourneyState, by: str):
+    allowed, reason = validate_transition(patient_state, to_state, requested_by=by)
+    if not allowed:
+        raise RuntimeError(f"Simulation requested an invalid transition: {reason}")
+    patient_state.apply_transition(to_state=to_state, by=by)
+
+
+def _advance_to(patient_state: PatientState, moment):
+    if moment > patient_state.current_time:
+        patient_state.advance_time(moment - patient_state.current_time)
+
+
+def simulate_patient(
+    patient_id: str,
+    seed: int,
+    point: SweepPoint,
+    scheduler: SchedulingAgent,
+    reminder_agent: ReminderAgent,
+    intake_agent: IntakeAgent,
+    model: AttendanceModel,
+    max_steps: int = 100,
+) -> Tuple[str, float]:
+    """
+    Simulates one journey. Returns (outcome, journey length in days).
+    """
+    patient_state = PatientState(patient_id=patient_id)
+    started = patient_state.current_time
+    outcome = UNFINISHED
+
+    for _ in range(max_steps):
+        state = patient_state.current_state
+
+        if state == PatientJourneyState.NEW_PATIENT:
+            intake_agent.complete_intake(patient_state)
+
+        elif state == PatientJourneyState.APPOINTMENT_COMPLETED:
+            # Clinical decision: lab work first, or straight to follow-up
+            if _uniform(seed, patient_id, "lab") < model.lab_test_probability:
+                _transition(patient_state, PatientJourneyState.LAB_TEST_REQUIRED, "Simulator")
+            elif not _book(patient_state, PatientJourneyState.FOLLOW_UP_SCHEDULED, scheduler):
+                outcome = UNBOOKED
+                break
+
+        elif state == PatientJourneyState.LAB_TEST_COMPLETED:
+            _transition(patient_state, PatientJourneyState.DOCTOR_REVIEW_PENDING, "Simulator")
+
+        elif state == PatientJourneyState.FOLLOW_UP_COMPLETED:
+            _transition(patient_state, PatientJourneyState.JOURNEY_CLOSED, "Simulator")
+            outcome = CLOSED
+            break
+
+        elif state in COMPLETED_STATES:
+            if not _attend_or_miss(patient_state, seed, point, scheduler, reminder_agent, model):
+                outcome = ESCALATED
+                break
+
+        else:
+            desired = scheduler.decide_next_state(patient_state)
+            if desired is None or not _book(patient_state, desired, scheduler):
+                outcome = UNBOOKED
+                break
+
+    length = (patient_state.current_time - started).total_seconds() / 86400
+    return outcome, length
+
+
+def _book(patient_state: PatientState, to_state, scheduler: SchedulingAgent) -> bool:
+    allowed, _ = validate_transition(patient_state, to_state, requested_by="SchedulingAgent")
+    if not allowed or scheduler.book_event(patient_state, to_state) is None:
+        return False
+    patient_state.apply_transition(to_state=to_state, by="SchedulingAgent")
+    return True
+
+
+def _attend_or_miss(patient_state, seed, point, scheduler, reminder_agent, model) -> bool:
+    """
+    Resolves the pending event. Returns False if the patient escalated.
+    """
+    event = next(
+        e for e in reversed(patient_state.events)
+        if e.status == EventStatus.SCHEDULED
+    )
+
+    # Reminder goes out at scheduled - offset, or right away if booked late
+    _advance_to(patient_state, event.scheduled_time - reminder_agent.reminder_offset)
+    reminded_at = patient_state.current_time
+    lead = None
+    if reminder_agent.run(patient_state)["reminder_sent"]:
+        lead = event.scheduled_time - reminded_at
+
+    miss = model.miss_probability(point.miss_probability, lead)
+    if _uniform(seed, patient_state.patient_id, f"{event.event_type}#{event.attempt}") >= miss:
+        _advance_to(patient_state, event.scheduled_time)
+        patient_state.set_event_status(event, EventStatus.COMPLETED)
+        _transition(patient_state, COMPLETED_STATES[patient_state.current_state], "Simulator")
+        return True
+
+    # Missed: detection (ReminderAgent) then retry / escalation (SchedulingAgent)
+    _advance_to(patient_state, event.scheduled_time + timedelta(minutes=1))
+    reminder_agent.run(patient_state)
+    scheduler.decide_next_state(patient_state)
+    return not patient_state.signals.get("escalation_required")
+
+
+def run_replica(
+    point: SweepPoint,
+    seed: int,
+    cohort_size: int,
+    model: AttendanceModel,
+) -> Tuple[Dict[str, int], List[float]]:
+    """
+    Simulates one seeded cohort with fresh clinic capacity.
+    Returns (outcome counts, journey lengths in days).
+    """
+    scheduler = SchedulingAgent(
+        slot_allocator=build_default_allocator(),
+        retry_policies=build_retry_policies(dict(point.max_retries)),
+    )
+    reminder_agent = ReminderAgent(reminder_offset_minutes=point.reminder_offset_minutes)
+    intake_agent = IntakeAgent()
+
+    counts = {CLOSED: 0, ESCALATED: 0, UNBOOKED: 0, UNFINISHED: 0}
+    lengths = []
+
+    # Agents log every step; a sweep only needs the aggregates
+    try:
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            for index in range(cohort_size):
+                outcome, length = simulate_patient(
+                    f"P{index:06d}", seed, point,
+                    scheduler, reminder_agent, intake_agent, model,
+                )
+                counts[outcome] += 1
+                lengths.append(length)
+    finally:
+        scheduler.close()
+
+    return counts, lengths
+
+
+def _run_task(task):
+    point_index, point, seed, cohort_size, model = task
+    counts, lengths = run_replica(point, seed, cohort_size, model)
+    return point_index, seed, counts, lengths
+
+
+# -------------------------------------------------------------------
+# RESULTS
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Interval:
+    mean: float
+    low: float
+    high: float
+
+    @classmethod
+    def of(cls, values: Sequence[float]) -> "Interval":
+        values = np.asarray(values, dtype=float)
+        mean = float(values.mean())
+        if len(values) < 2:
+            return cls(mean, float("nan"), float("nan"))
+        half = _t95(len(values) - 1) * float(values.std(ddof=1)) / float(np.sqrt(len(values)))
+        return cls(mean, mean - half, mean + half)
+
+
+@dataclass
+class PointResult:
+    point: SweepPoint
+    replicas: int
+    escalation_rate: Interval
+    completion_rate: Interval
+    mean_length_days: Interval
+    length_percentiles_days: Dict[str, float]
+    # Per-replica metric values in seed order, for paired comparisons
+    per_replica: Dict[str, List[float]] = field(repr=False)
+
+
+@dataclass
+class SweepReport:
+    results: List[PointResult]
+    cohort_size: int
+    seeds: List[int]
+
+    def compare(self, a: int, b: int, metric: str = "escalation_rate") -> Interval:
+        """
+        Paired (common random numbers) difference b - a in `metric`
+        between grid points `a` and `b`.
+        """
+        diffs = (
+            np.asarray(self.results[b].per_replica[metric])
+            - np.asarray(self.results[a].per_replica[metric])
+        )
+        return Interval.of(diffs)
+
+    def to_dict(self) -> Dict:
+        return {
+            "cohort_size": self.cohort_size,
+            "seeds": self.seeds,
+            "results": [
+                {
+                    "label": r.point.label(),
+                    "point": asdict(r.point),
+                    "replicas": r.replicas,
+                    "escalation_rate": asdict(r.escalation_rate),
+                    "completion_rate": asdict(r.completion_rate),
+                    "mean_length_days": asdict(r.mean_length_days),
+                    "length_percentiles_days": r.length_percentiles_days,
+                }
+                for r in self.results
+            ],
+        }
+
+
+def _summarize(point: SweepPoint, replicas: List[Tuple[int, Dict, List[float]]]) -> PointResult:
+    replicas = sorted(replicas, key=lambda r: r[0])
+    escalation, completion, mean_length, pooled = [], [], [], []
+
+    for _, counts, lengths in replicas:
+        total = sum(counts.values())
+        escalation.append(counts[ESCALATED] / total)
+        completion.append(counts[CLOSED] / total)
+        mean_length.append(float(np.mean(lengths)))
+        pooled.extend(lengths)
+
+    p50, p90, p99 = np.percentile(pooled, [50, 90, 99])
+    return PointResult(
+        point=point,
+        replicas=len(replicas),
+        escalation_rate=Interval.of(escalation),
+        completion_rate=Interval.of(completion),
+        mean_length_days=Interval.of(mean_length),
+        length_percentiles_days={"p50": float(p50), "p90": float(p90), "p99": float(p99)},
+        per_replica={
+            "escalation_rate": escalation,
+            "completion_rate": completion,
+            "mean_length_days": mean_length,
+        },
+    )
+
+
+# -------------------------------------------------------------------
+# SWEEP
+# -------------------------------------------------------------------
+
+def run_sweep(
+    grid: SweepGrid,
+    replicas: int = 20,
+    cohort_size: int = 200,
+    model: Optional[AttendanceModel] = None,
+    workers: Optional[int] = None,
+    base_seed: int = 0,
+) -> SweepReport:
+    """
+    Runs `replicas` seeded cohorts per grid point on a process pool.
+    Seeds are shared by all points (common random numbers).
+    """
+    model = model or AttendanceModel()
+    points = grid.points()
+    seeds = [base_seed + r for r in range(replicas)]
+
+    tasks = [
+        (index, point, seed, cohort_size, model)
+        for index, point in enumerate(points)
+        for seed in seeds
+    ]
+
+    collected: Dict[int, List] = {index: [] for index in range(len(points))}
+    if workers == 1:
+        outputs = map(_run_task, tasks)
+        for point_index, seed, counts, lengths in outputs:
+            collected[point_index].append((seed, counts, lengths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            for point_index, seed, counts, lengths in pool.map(_run_task, tasks, chunksize=chunksize):
+                collected[point_index].append((seed, counts, lengths))
+
+    return SweepReport(
+        results=[_summarize(point, collected[index]) for index, point in enumerate(points)],
+        cohort_size=cohort_size,
+        seeds=seeds,
+    )
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo capacity-planning sweep.")
+    for event_type in sorted(MAX_RETRIES):
+        parser.add_argument(
+            f"--{event_type.replace('_', '-')}-retries",
+            type=int, nargs="+", dest=f"retries_{event_type}",
+        )
+    parser.add_argument("--reminder-offsets", type=int, nargs="+", default=[30])
+    parser.add_argument("--miss-probabilities", type=float, nargs="+", default=[0.15])
+    parser.add_argument("--replicas", type=int, default=20)
+    parser.add_argument("--cohort", type=int, default=200)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    grid = SweepGrid(
+        retry_options={
+            event_type: getattr(args, f"retries_{event_type}")
+            for event_type in MAX_RETRIES
+            if getattr(args, f"retries_{event_type}")
+        },
+        reminder_offsets=args.reminder_offsets,
+        miss_probabilities=args.miss_probabilities,
+    )
+    report = run_sweep(
+        grid,
+        replicas=args.replicas,
+        cohort_size=args.cohort,
+        workers=args.workers,
+        base_seed=args.seed,
+    )
+
+    for index, result in enumerate(report.results):
+        esc, length = result.escalation_rate, result.mean_length_days
+        print(
+            f"[{index:3d}] {result.point.label()}: "
+            f"escalation {esc.mean:.3f} [{esc.low:.3f}, {esc.high:.3f}]  "
+            f"length {length.mean:.1f}d [{length.low:.1f}, {length.high:.1f}]  "
+            f"p90 {result.length_percentiles_days['p90']:.1f}d"
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report.to_dict(), handle, indent=2)
+        print("Report written to:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+journey_analytics.py
+
+Columnar analytics over many patient journeys.
+
+Histories are consumed in batches. Each batch is turned into NumPy
+columns (integer codes for states / agents / event types, datetime64
+timestamps), reduced to partial aggregates, and then dropped. The
+aggregates are bounded too: time-in-state percentiles come from a
+fixed-size uniform reservoir per state (exact until a state has more
+than `reservoir_size` samples), while counts and means stay exact.
+
+Computed:
+- Stage funnel per PatientJourneyState
+- Time-in-state percentiles (from StateTransition.at)
+- Retry and escalation rates per event_type
+- Transition counts per (from_state, to_state, agent)
+- Remaining steps to JOURNEY_CLOSED (via the precomputed journey index)
+
+IMPORTANT:
+- Read-only: never mutates patient state
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.core.state import PatientState, PatientJourneyState, EventStatus
+from app.core.journey_index import journey_index, MASKS, UNREACHABLE
+from app.tools.persistence_tools import iter_states_jsonl
+
+
+STATES: List[PatientJourneyState] = list(PatientJourneyState)
+STATE_CODES: Dict[PatientJourneyState, int] = {s: i for i, s in enumerate(STATES)}
+
+EVENT_STATUSES: List[EventStatus] = list(EventStatus)
+STATUS_CODES: Dict[EventStatus, int] = {s: i for i, s in enumerate(EVENT_STATUSES)}
+
+PERCENTILES = (50, 90, 99)
+
+# Time-in-state samples kept per state for percentiles
+RESERVOIR_SIZE = 10000
+
+# Fewest steps to JOURNEY_CLOSED, indexed by state code * MASKS + completed_mask
+_MIN_STEPS = np.asarray(journey_index.min_steps, dtype=np.int8)
+
+# Timestamps are stored as int64 microseconds since the epoch;
+# integer arithmetic is much cheaper than numpy's datetime parsing.
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+# -------------------------------------------------------------------
+# CODE INTERNING
+# -------------------------------------------------------------------
+
+class _Interner:
+    """
+    Maps strings (agent names, event types) to dense integer codes.
+    """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.codes[name] = code
+            self.names.append(name)
+        return code
+
+
+# -------------------------------------------------------------------
+# DURATION RESERVOIR
+# -------------------------------------------------------------------
+
+class _Reservoir:
+    """
+    Uniform sample (Algorithm R) of at most `capacity` values, plus
+    the exact count and sum of everything offered.
+    """
+
+    def __init__(self, capacity: int, rng: np.random.Generator):
+        self.capacity = capacity
+        self.rng = rng
+        self.samples = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+        self.count = 0
+        self.total = 0.0
+
+    def extend(self, values: np.ndarray):
+        self.total += float(values.sum())
+
+        # Fill free slots first
+        fill = min(self.capacity - self.size, len(values))
+        self.samples[self.size:self.size + fill] = values[:fill]
+        self.size += fill
+        self.count += fill
+
+        # Value number k (0-based) replaces a random slot with
+        # probability capacity / (k + 1); later values win ties
+        rest = values[fill:]
+        if len(rest):
+            seen = self.count + np.arange(len(rest), dtype=np.int64)
+            slots = (self.rng.random(len(rest)) * (seen + 1)).astype(np.int64)
+            keep = slots < self.capacity
+            self.samples[slots[keep]] = rest[keep]
+            self.count += len(rest)
+
+    def values(self) -> np.ndarray:
+        return self.samples[:self.size]
+
+
+# -------------------------------------------------------------------
+# COLUMN BATCH
+# -------------------------------------------------------------------
+
+@dataclass
+class ColumnBatch:
+    """
+    One batch of journeys in columnar form.
+    """
+    # Transitions, grouped by patient and in history order
+    t_patient: np.ndarray
+    t_from: np.ndarray
+    t_to: np.ndarray
+    t_agent: np.ndarray
+    t_at: np.ndarray  # int64 microseconds since epoch
+
+    # Events
+    e_patient: np.ndarray
+    e_type: np.ndarray
+    e_status: np.ndarray
+
+    # Patients
+    p_reached: np.ndarray
+    p_state: np.ndarray
+    p_completed: np.ndarray  # PatientState.completed_mask
+    p_escalated: np.ndarray
+    p_retries: np.ndarray  # shape (patients, event types seen so far)
+
+
+def build_columns(
+    states: List[PatientState],
+    agents: _Interner,
+    event_types: _Interner,
+) -> ColumnBatch:
+    t_patient, t_from, t_to, t_agent, t_at = [], [], [], [], []
+    e_patient, e_type, e_status = [], [], []
+    reached = np.zeros(len(states), dtype=np.int64)
+    current = np.zeros(len(states), dtype=np.int64)
+    completed = np.zeros(len(states), dtype=np.int64)
+    escalated = np.zeros(len(states), dtype=bool)
+    retries: List[Tuple[int, int, int]] = []
+
+    new_patient_bit = 1 << STATE_CODES[PatientJourneyState.NEW_PATIENT]
+
+    for p, patient_state in enumerate(states):
+        # completed_mask also covers transitions moved to the archive
+        mask = new_patient_bit | patient_state.completed_mask
+        for t in patient_state.history:
+            to_code = STATE_CODES[t.to_state]
+            t_patient.append(p)
+            t_from.append(STATE_CODES[t.from_state])
+            t_to.append(to_code)
+            t_agent.append(agents.code(t.by))
+            t_at.append((t.at - _EPOCH) // _MICROSECOND)
+            mask |= 1 << to_code
+        reached[p] = mask
+        current[p] = STATE_CODES[patient_state.current_state]
+        completed[p] = patient_state.completed_mask
+
+        for e in patient_state.events:
+            e_patient.append(p)
+            e_type.append(event_types.code(e.event_type))
+            e_status.append(STATUS_CODES[e.status])
+
+        escalated[p] = bool(patient_state.signals.get("escalation_required"))
+
+        for event_type, count in patient_state.retry_counts.items():
+            retries.append((p, event_types.code(event_type), count))
+
+    p_retries = np.zeros((len(states), len(event_types.names)), dtype=np.int32)
+    if retries:
+        r = np.array(retries, dtype=np.int64)
+        p_retries[r[:, 0], r[:, 1]] = r[:, 2]
+
+    return ColumnBatch(
+        t_patient=np.array(t_patient, dtype=np.int64),
+        t_from=np.array(t_from, dtype=np.int16),
+        t_to=np.array(t_to, dtype=np.int16),
+        t_agent=np.array(t_agent, dtype=np.int32),
+        t_at=np.array(t_at, dtype=np.int64),
+        e_patient=np.array(e_patient, dtype=np.int64),
+        e_type=np.array(e_type, dtype=np.int32),
+        e_status=np.array(e_status, dtype=np.int8),
+        p_reached=reached,
+        p_state=current,
+        p_completed=completed,
+        p_escalated=escalated,
+        p_retries=p_retries,
+    )
+
+
+# -------------------------------------------------------------------
+# REPORT
+# -------------------------------------------------------------------
+
+@dataclass
+class JourneyReport:
+    patients: int
+    transitions: int
+    funnel: Dict[str, int]
+    time_in_state_seconds: Dict[str, Dict[str, float]]
+    event_types: Dict[str, Dict[str, float]]
+    transitions_by_agent: Dict[Tuple[str, str, str], int]
+    # Patients per fewest-remaining-steps count ("unreachable" if the
+    # journey can no longer be closed)
+    remaining_steps: Dict[str, int]
+
+
+# -------------------------------------------------------------------
+# ANALYTICS ACCUMULATOR
+# -------------------------------------------------------------------
+
+@dataclass
+class JourneyAnalytics:
+    """
+    Streaming accumulator: feed PatientStates in any number of calls,
+    then call `report()`.
+    """
+    batch_size: int = field(default_factory=lambda: get_settings().cohort_batch_size)
+    reservoir_size: int = RESERVOIR_SIZE
+    seed: int = 0
+
+    patients: int = 0
+    transitions: int = 0
+
+    _agents: _Interner = field(default_factory=_Interner)
+    _event_types: _Interner = field(default_factory=_Interner)
+
+    _funnel: np.ndarray = field(default_factory=lambda: np.zeros(len(STATES), dtype=np.int64))
+    _durations: List[_Reservoir] = field(default_factory=list)
+    _pair_counts: Dict[int, int] = field(default_factory=dict)
+    # Last slot counts patients that can no longer close
+    _remaining: np.ndarray = field(
+        default_factory=lambda: np.zeros(len(STATES) + 1, dtype=np.int64)
+    )
+
+    # Per event type (grown as new types appear)
+    _events: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    _missed: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    _with_type: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    _retried: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    _retries: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    _escalated: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    def __post_init__(self):
+        rng = np.random.default_rng(self.seed)
+        self._durations = [_Reservoir(self.reservoir_size, rng) for _ in STATES]
+
+    # -----------------------------
+    # Ingestion
+    # -----------------------------
+    def add(self, states: Iterable[PatientState]) -> "JourneyAnalytics":
+        states = iter(states)
+        while True:
+            batch = list(islice(states, self.batch_size))
+            if not batch:
+                return self
+            self._add_batch(build_columns(batch, self._agents, self._event_types))
+
+    def add_file(self, path) -> "JourneyAnalytics":
+        """
+        Streams a JSONL patient store (see persistence_tools).
+        """
+        return self.add(iter_states_jsonl(path))
+
+    def _add_batch(self, cols: ColumnBatch):
+        n_patients = len(cols.p_reached)
+        self.patients += n_patients
+        self.transitions += len(cols.t_patient)
+
+        # Funnel: count patients per reached-state bit
+        for code in range(len(STATES)):
+            self._funnel[code] += int(np.count_nonzero((cols.p_reached >> code) & 1))
+
+        # Remaining steps: one table lookup per patient
+        steps = _MIN_STEPS[cols.p_state * MASKS + cols.p_completed].astype(np.int64)
+        steps[steps == UNREACHABLE] = len(STATES)
+        self._remaining += np.bincount(steps, minlength=len(STATES) + 1)
+
+        # Time in state: gap between consecutive transitions of the
+        # same patient is time spent in the earlier transition's to_state
+        if len(cols.t_patient) > 1:
+            same = cols.t_patient[1:] == cols.t_patient[:-1]
+            gaps = (cols.t_at[1:] - cols.t_at[:-1])[same]
+            seconds = gaps / 1e6
+            in_state = cols.t_to[:-1][same]
+
+            order = np.argsort(in_state, kind="stable")
+            codes, starts = np.unique(in_state[order], return_index=True)
+            for code, chunk in zip(codes, np.split(seconds[order], starts[1:])):
+                self._durations[code].extend(chunk)
+
+        # (from, to, agent) counts via a single packed key
+        if len(cols.t_patient):
+            n = len(STATES)
+            keys = (cols.t_agent.astype(np.int64) * n + cols.t_from) * n + cols.t_to
+            uniq, counts = np.unique(keys, return_counts=True)
+            for key, count in zip(uniq.tolist(), counts.tolist()):
+                self._pair_counts[key] = self._pair_counts.get(key, 0) + count
+
+        # Event types
+        n_types = len(self._event_types.names)
+        self._grow(n_types)
+
+        self._events += np.bincount(cols.e_type, minlength=n_types)
+        missed = cols.e_status == STATUS_CODES[EventStatus.MISSED]
+        self._missed += np.bincount(cols.e_type[missed], minlength=n_types)
+
+        if len(cols.e_patient):
+            pairs = np.unique(cols.e_patient * n_types + cols.e_type)
+            self._with_type += np.bincount(pairs % n_types, minlength=n_types)
+
+        retries = np.zeros((n_patients, n_types), dtype=np.int64)
+        retries[:, :cols.p_retries.shape[1]] = cols.p_retries
+        self._retries += retries.sum(axis=0)
+        self._retried += (retries > 0).sum(axis=0)
+
+        # Escalations are attributed to the patient's last missed event
+        escalated_misses = np.nonzero(missed & cols.p_escalated[cols.e_patient])[0]
+        if len(escalated_misses):
+            reversed_idx = escalated_misses[::-1]
+            _, first = np.unique(cols.e_patient[reversed_idx], return_index=True)
+            last_types = cols.e_type[reversed_idx[first]]
+            self._escalated += np.bincount(last_types, minlength=n_types)
+
+    def _grow(self, n_types: int):
+        for name in ("_events", "_missed", "_with_type", "_retried", "_retries", "_escalated"):
+            current = getattr(self, name)
+            if len(current) < n_types:
+                grown = np.zeros(n_types, dtype=np.int64)
+                grown[:len(current)] = current
+                setattr(self, name, grown)
+
+    # -----------------------------
+    # Report
+    # -----------------------------
+    def report(self) -> JourneyReport:
+        funnel = {s.value: int(self._funnel[STATE_CODES[s]]) for s in STATES}
+
+        time_in_state = {}
+        for state, reservoir in zip(STATES, self._durations):
+            if not reservoir.count:
+                continue
+            stats = dict(zip(
+                (f"p{p}" for p in PERCENTILES),
+                np.percentile(reservoir.values(), PERCENTILES).tolist(),
+            ))
+            stats["mean"] = reservoir.total / reservoir.count
+            stats["count"] = float(reservoir.count)
+            time_in_state[state.value] = stats
+
+        event_types = {}
+        for code, name in enumerate(self._event_types.names):
+            with_type = max(int(self._with_type[code]), 1)
+            events = max(int(self._events[code]), 1)
+            event_types[name] = {
+                "events": int(self._events[code]),
+                "miss_rate": int(self._missed[code]) / events,
+                "retry_rate": int(self._retried[code]) / with_type,
+                "mean_retries": int(self._retries[code]) / with_type,
+                "escalation_rate": int(self._escalated[code]) / with_type,
+            }
+
+        n = len(STATES)
+        by_agent = {}
+        for key, count in sorted(self._pair_counts.items()):
+            agent, rest = divmod(key, n * n)
+            from_code, to_code = divmod(rest, n)
+            by_agent[(
+                STATES[from_code].value,
+                STATES[to_code].value,
+                self._agents.names[agent],
+            )] = count
+
+        remaining = {
+            str(steps): int(count)
+            for steps, count in enumerate(self._remaining[:-1].tolist())
+            if count
+        }
+        if self._remaining[-1]:
+            remaining["unreachable"] = int(self._remaining[-1])
+
+        return JourneyReport(
+            patients=self.patients,
+            transitions=self.transitions,
+            funnel=funnel,
+            time_in_state_seconds=time_in_state,
+            event_types=event_types,
+            transitions_by_agent=by_agent,
+            remaining_steps=remaining,
+        )
+
+
+def analyze(
+    states: Optional[Iterable[PatientState]] = None,
+    path=None,
+) -> JourneyReport:
+    """
+    Convenience wrapper: analytics over in-memory states and/or a file.
+    """
+    analytics = JourneyAnalytics()
+    if states is not None:
+        analytics.add(states)
+    if path is not None:
+        analytics.add_file(path)
+    return analytics.report()
@@ -0,0 +1,211 @@
+"""
+settings.py
+
+Typed, frozen runtime settings for the Patient Journey Orchestration Agent.
+
+Settings are resolved ONCE per process, in this order (last wins):
+1. Defaults declared on `Settings`
+2. A JSON file (path in AGENTOPS_SETTINGS_FILE)
+3. Environment variables (AGENTOPS_<FIELD_NAME>)
+
+After loading, the object is immutable. Agents, cohort runners and
+workers call `get_settings()` and never re-parse the environment.
+
+Persistence paths left unset are derived from `data_dir`, so pointing
+AGENTOPS_DATA_DIR elsewhere moves the WAL, snapshots, archive,
+escalation journal and profiles together.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+
+ENV_PREFIX = "AGENTOPS_"
+SETTINGS_FILE_ENV = "AGENTOPS_SETTINGS_FILE"
+
+# Path settings derived from data_dir when not set explicitly
+DATA_PATHS = {
+    "wal_dir": "wal",
+    "snapshot_dir": "snapshots",
+    "archive_dir": "archive",
+    "escalation_queue_path": "escalations.jsonl",
+    "profile_dir": "profiles",
+}
+
+
+def _frozen_mapping(values: Dict[str, int]) -> Mapping[str, int]:
+    return MappingProxyType(dict(values))
+
+
+# -------------------------------------------------------------------
+# SETTINGS
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Settings:
+    # Simulation
+    simulation_start: datetime = datetime(2025, 1, 1, 9, 0)
+
+    # Agents
+    reminder_offset_minutes: int = 30
+    max_retries: Mapping[str, int] = field(
+        default_factory=lambda: _frozen_mapping(
+            {"appointment": 2, "lab_test": 2, "follow_up": 1}
+        )
+    )
+    llm_model: str = "gpt-4o-mini"
+
+    # Journey budget
+    journey_max_iterations: int = 50
+    journey_max_wall_seconds: float = 5.0
+    journey_max_no_progress: int = 3
+
+    # Concurrency limits
+    worker_concurrency: int = 4
+    notification_concurrency: int = 16
+    persistence_concurrency: int = 4
+    llm_concurrency: int = 4
+
+    # Batch sizes
+    intake_chunk_size: int = 5000
+    cohort_batch_size: int = 1000
+
+    # Tool execution (LLM tool calls)
+    tool_concurrency: int = 8
+    tool_timeout_seconds: float = 10.0
+
+    # Caches
+    tool_cache_size: int = 1024
+    tool_cache_ttl_seconds: float = 300.0
+
+    # Reminders
+    reminder_wheel_resolution_seconds: int = 60
+
+    # Profiling (0 = off, N = profile 1 in N journeys)
+    profile_sample_rate: int = 0
+    profile_dir: Optional[Path] = None
+
+    # Persistence (unset paths live under data_dir, see DATA_PATHS)
+    data_dir: Path = Path("data")
+    wal_dir: Optional[Path] = None
+    snapshot_dir: Optional[Path] = None
+    archive_dir: Optional[Path] = None
+
+    # History tiering (hot window per patient; older entries archived)
+    history_tiering_enabled: bool = False
+    history_max_transitions: int = 50
+    history_max_terminal_events: int = 20
+
+    # Write-ahead log (group commit + snapshot compaction)
+    wal_enabled: bool = False
+    wal_flush_interval_seconds: float = 0.005
+    wal_max_batch: int = 4096
+    wal_snapshot_every_records: int = 100000
+    wal_keep_snapshots: int = 2
+
+    # Escalation queue (in memory unless persistent)
+    escalation_queue_persistent: bool = False
+    escalation_queue_path: Optional[Path] = None
+
+    # Orchestration service (app/service)
+    service_host: str = "127.0.0.1"
+    service_port: int = 8080
+    service_batch_window_ms: float = 2.0
+    service_max_batch: int = 256
+    service_max_pending: int = 10000
+    service_p99_target_ms: float = 250.0
+
+    def __post_init__(self):
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if value < 0:
+                    raise ValueError(f"Setting {f.name} must be >= 0, got {value}")
+
+        for name, relative in DATA_PATHS.items():
+            if getattr(self, name) is None:
+                object.__setattr__(self, name, self.data_dir / relative)
+
+        # Always store mappings read-only, even when passed a dict
+        if not isinstance(self.max_retries, MappingProxyType):
+            object.__setattr__(self, "max_retries", _frozen_mapping(self.max_retries))
+
+
+# -------------------------------------------------------------------
+# PARSING
+# -------------------------------------------------------------------
+
+def _parse_mapping(raw: Any) -> Mapping[str, int]:
+    """
+    Accepts a dict or "appointment=2,lab_test=2".
+    """
+    if isinstance(raw, dict):
+        return _frozen_mapping({k: int(v) for k, v in raw.items()})
+
+    pairs = [p for p in str(raw).split(",") if p.strip()]
+    values = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        values[key.strip()] = int(value)
+    return _frozen_mapping(values)
+
+
+def _coerce(name: str, target: Any, raw: Any) -> Any:
+    try:
+        if target is bool:
+            return str(raw).strip().lower() in {"1", "true", "yes", "on"}
+        if target is int:
+            return int(raw)
+        if target is float:
+            return float(raw)
+        if target is datetime:
+            return raw if isinstance(raw, datetime) else datetime.fromisoformat(str(raw))
+        if target in (Path, Optional[Path]):
+            return Path(raw)
+        if target == Mapping[str, int]:
+            return _parse_mapping(raw)
+        return str(raw)
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid value for setting {name}: {raw!r}") from exc
+
+
+def load_settings(
+    env: Optional[Mapping[str, str]] = None,
+    path: Optional[Path] = None,
+) -> Settings:
+    """
+    Builds a Settings object from defaults, an optional JSON file
+    and environment variables.
+    """
+    env = os.environ if env is None else env
+    known = {f.name: f.type for f in fields(Settings)}
+    overrides: Dict[str, Any] = {}
+
+    path = path or env.get(SETTINGS_FILE_ENV)
+    if path:
+        with open(path, encoding="utf-8") as handle:
+            for name, raw in json.load(handle).items():
+                if name not in known:
+                    raise ValueError(f"Unknown setting in {path}: {name}")
+                overrides[name] = _coerce(name, known[name], raw)
+
+    for name, target in known.items():
+        raw = env.get(ENV_PREFIX + name.upper())
+        if raw is not None:
+            overrides[name] = _coerce(name, target, raw)
+
+    return Settings(**overrides)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Process-wide settings, loaded on first use.
+    """
+    return load_settings()
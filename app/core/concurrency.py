@@ -0,0 +1,70 @@
+"""
+concurrency.py
+
+Per-resource concurrency limits for async journeys.
+
+Each external resource (notifications, persistence, LLM, journey
+workers) gets its own asyncio.Semaphore sized from settings, so many
+journeys can overlap their I/O without flooding any one backend.
+
+Semaphores are created lazily per running event loop, so the same
+limits object works across repeated `asyncio.run()` calls.
+"""
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict
+
+from app.config.settings import get_settings
+
+
+NOTIFICATION = "notification"
+PERSISTENCE = "persistence"
+LLM = "llm"
+WORKER = "worker"
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    notification: int = 16
+    persistence: int = 4
+    llm: int = 4
+    worker: int = 4
+
+    @classmethod
+    def from_settings(cls) -> "ResourceLimits":
+        settings = get_settings()
+        return cls(
+            notification=settings.notification_concurrency,
+            persistence=settings.persistence_concurrency,
+            llm=settings.llm_concurrency,
+            worker=settings.worker_concurrency,
+        )
+
+    def semaphore(self, resource: str) -> asyncio.Semaphore:
+        """
+        Returns the semaphore for `resource` on the running loop.
+        """
+        loop = asyncio.get_running_loop()
+        per_loop = _SEMAPHORES.setdefault(loop, {})
+        key = (id(self), resource)
+
+        if key not in per_loop:
+            limit = getattr(self, resource)
+            # 0 means "no limit"
+            per_loop[key] = asyncio.Semaphore(limit if limit > 0 else 2 ** 31)
+        return per_loop[key]
+
+    @asynccontextmanager
+    async def limit(self, resource: str):
+        async with self.semaphore(resource):
+            yield
+
+
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+resource_limits = ResourceLimits.from_settings()
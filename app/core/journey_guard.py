@@ -0,0 +1,143 @@
+"""
+journey_guard.py
+
+Per-journey loop protection for the LangGraph workflow.
+
+The graph loops until MonitoringAgent says "stop". A journey that
+never makes progress (e.g. repeatedly blocked transitions) would
+otherwise spin until LangGraph's recursion limit raises.
+
+This module:
+- Enforces an iteration budget and a wall-clock budget per journey
+- Detects "no progress" by fingerprinting state, clock and signals
+- Produces a structured outcome instead of an exception
+
+IMPORTANT:
+- No LLM usage
+- Does NOT mutate patient state
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.config.settings import get_settings
+from app.core.state import PatientState
+
+
+# -------------------------------------------------------------------
+# BUDGET
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class JourneyBudget:
+    max_iterations: int = 50
+    max_wall_seconds: float = 5.0
+    max_no_progress: int = 3
+
+    @classmethod
+    def from_settings(cls) -> "JourneyBudget":
+        settings = get_settings()
+        return cls(
+            max_iterations=settings.journey_max_iterations,
+            max_wall_seconds=settings.journey_max_wall_seconds,
+            max_no_progress=settings.journey_max_no_progress,
+        )
+
+    @property
+    def recursion_limit(self) -> int:
+        """
+        LangGraph recursion limit that can never be hit before the
+        budget itself (4 nodes per loop, plus headroom).
+        """
+        return self.max_iterations * 4 + 10
+
+
+# -------------------------------------------------------------------
+# OUTCOME
+# -------------------------------------------------------------------
+
+STALLED = "stalled"
+
+
+@dataclass(frozen=True)
+class JourneyOutcome:
+    status: str
+    reason: str
+    iterations: int
+    elapsed_seconds: float
+
+
+# -------------------------------------------------------------------
+# GUARD
+# -------------------------------------------------------------------
+
+def progress_fingerprint(patient_state: PatientState) -> tuple:
+    """
+    Cheap summary of everything that counts as progress.
+
+    Uses lengths and counters rather than full contents, so it is
+    O(number of signals) regardless of history size.
+    """
+    return (
+        patient_state.current_state,
+        patient_state.current_time,
+        patient_state.transition_count,
+        patient_state.event_count,
+        sum(patient_state.retry_counts.values()),
+        tuple(sorted(k for k, v in patient_state.signals.items() if v)),
+    )
+
+
+@dataclass
+class JourneyGuard:
+    """
+    Tracks one journey's loop iterations.
+
+    Call `tick()` once per loop; it returns a JourneyOutcome when the
+    journey must be stopped, otherwise None.
+    """
+    budget: JourneyBudget = field(default_factory=JourneyBudget)
+    iterations: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    no_progress: int = 0
+    last_fingerprint: Optional[tuple] = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def tick(self, patient_state: PatientState) -> Optional[JourneyOutcome]:
+        self.iterations += 1
+
+        fingerprint = progress_fingerprint(patient_state)
+        if fingerprint == self.last_fingerprint:
+            self.no_progress += 1
+        else:
+            self.no_progress = 0
+            self.last_fingerprint = fingerprint
+
+        if self.no_progress >= self.budget.max_no_progress:
+            return self._stalled(
+                f"No progress for {self.no_progress} iterations "
+                f"in {patient_state.current_state.value}"
+            )
+
+        if self.iterations >= self.budget.max_iterations:
+            return self._stalled(
+                f"Iteration budget of {self.budget.max_iterations} exhausted"
+            )
+
+        if self.elapsed() >= self.budget.max_wall_seconds:
+            return self._stalled(
+                f"Wall-clock budget of {self.budget.max_wall_seconds}s exhausted"
+            )
+
+        return None
+
+    def _stalled(self, reason: str) -> JourneyOutcome:
+        return JourneyOutcome(
+            status=STALLED,
+            reason=reason,
+            iterations=self.iterations,
+            elapsed_seconds=self.elapsed(),
+        )
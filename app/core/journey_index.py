@@ -0,0 +1,251 @@
+"""
+journey_index.py
+
+Precomputed reachability / remaining-steps index over the transition
+tables in transitions.py.
+
+Built ONCE at import for every (state, completed-mask) combination
+(one bitmask bit per state, so 11 x 2**11 entries), so planning questions are O(1) lookups:
+- can this patient still reach JOURNEY_CLOSED / any given state?
+- fewest steps left to close the journey?
+- longest possible remaining path (critical path)?
+
+A step from `state` to `to_state` is valid under `completed_mask`
+exactly when the validator would allow it:
+- to_state is in ALLOWED_TRANSITIONS[state]
+- all PREREQUISITE_STATES[to_state] are completed
+- to_state is not already completed (no regressions)
+
+IMPORTANT:
+- No LLM usage, no state mutation
+- Import FAILS (JourneyGraphError) if the tables are inconsistent:
+  unknown states, cycles, unreachable states, dead ends, or
+  prerequisites that can never be completed first
+"""
+
+from typing import Dict, List, Optional, Set
+
+from app.core.state import PatientJourneyState, PatientState, STATE_BITS
+from app.core.transitions import ALLOWED_TRANSITIONS, PREREQUISITE_STATES
+
+
+STATES: List[PatientJourneyState] = list(PatientJourneyState)
+STATE_CODES: Dict[PatientJourneyState, int] = {s: i for i, s in enumerate(STATES)}
+MASKS = 1 << len(STATES)
+
+START = PatientJourneyState.NEW_PATIENT
+CLOSED = PatientJourneyState.JOURNEY_CLOSED
+
+UNREACHABLE = -1
+
+
+class JourneyGraphError(ValueError):
+    """
+    Raised at import when the transition tables are inconsistent.
+    """
+
+
+# -------------------------------------------------------------------
+# TABLE VALIDATION
+# -------------------------------------------------------------------
+
+def _topological_order(allowed) -> List[PatientJourneyState]:
+    indegree = {s: 0 for s in STATES}
+    for targets in allowed.values():
+        for target in targets:
+            indegree[target] += 1
+
+    ready = [s for s in STATES if indegree[s] == 0]
+    order = []
+    while ready:
+        state = ready.pop()
+        order.append(state)
+        for target in allowed[state]:
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                ready.append(target)
+
+    if len(order) != len(STATES):
+        cyclic = sorted(s.value for s in STATES if indegree[s] > 0)
+        raise JourneyGraphError(f"Transition cycle involving: {', '.join(cyclic)}")
+    return order
+
+
+def _validate(allowed, prerequisites) -> List[PatientJourneyState]:
+    """
+    Checks the raw tables. Returns a topological order of states.
+    """
+    missing = [s.value for s in STATES if s not in allowed]
+    if missing:
+        raise JourneyGraphError(f"States missing from ALLOWED_TRANSITIONS: {missing}")
+
+    for state, targets in allowed.items():
+        for target in targets:
+            if not isinstance(target, PatientJourneyState):
+                raise JourneyGraphError(f"Unknown target {target!r} from {state.value}")
+            if target == state:
+                raise JourneyGraphError(f"Self-transition on {state.value}")
+
+    order = _topological_order(allowed)
+
+    # Descendants ignoring prerequisites
+    closure = {s: 0 for s in STATES}
+    for state in reversed(order):
+        for target in allowed[state]:
+            closure[state] |= STATE_BITS[target] | closure[target]
+
+    unreachable = [
+        s.value for s in STATES
+        if s != START and not closure[START] & STATE_BITS[s]
+    ]
+    if unreachable:
+        raise JourneyGraphError(f"States unreachable from {START.value}: {unreachable}")
+
+    dead_ends = [
+        s.value for s in STATES
+        if s != CLOSED and not closure[s] & STATE_BITS[CLOSED]
+    ]
+    if dead_ends:
+        raise JourneyGraphError(f"States that cannot reach {CLOSED.value}: {dead_ends}")
+
+    for state, required in prerequisites.items():
+        for prerequisite in required:
+            if not closure[prerequisite] & STATE_BITS[state]:
+                raise JourneyGraphError(
+                    f"Prerequisite {prerequisite.value} of {state.value} "
+                    f"can never be completed before it"
+                )
+
+    return order
+
+
+# -------------------------------------------------------------------
+# INDEX
+# -------------------------------------------------------------------
+
+class JourneyIndex:
+    """
+    Flat lookup tables indexed by STATE_CODES[state] * MASKS + completed_mask.
+    """
+
+    def __init__(self, allowed=None, prerequisites=None):
+        allowed = ALLOWED_TRANSITIONS if allowed is None else allowed
+        prerequisites = PREREQUISITE_STATES if prerequisites is None else prerequisites
+
+        order = _validate(allowed, prerequisites)
+
+        self.descendants: Dict[PatientJourneyState, int] = {}
+        required = {
+            s: sum(STATE_BITS[p] for p in prerequisites.get(s, ()))
+            for s in STATES
+        }
+
+        size = len(STATES) * MASKS
+        self.reachable: List[int] = [0] * size
+        self.min_steps: List[int] = [UNREACHABLE] * size
+        self.max_steps: List[int] = [UNREACHABLE] * size
+        # Next state on the longest remaining path (-1 if none)
+        self.critical_next: List[int] = [UNREACHABLE] * size
+
+        # Targets are filled before their sources, for every mask
+        for state in reversed(order):
+            code = STATE_CODES[state]
+            base = code * MASKS
+            targets = [(STATE_CODES[t], STATE_BITS[t], required[t]) for t in allowed[state]]
+
+            descendants = 0
+            for target in allowed[state]:
+                descendants |= STATE_BITS[target] | self.descendants[target]
+            self.descendants[state] = descendants
+
+            for mask in range(MASKS):
+                reachable = STATE_BITS[state]
+                best = 0 if state == CLOSED else UNREACHABLE
+                worst = best
+                worst_next = UNREACHABLE
+
+                for t_code, t_bit, t_required in targets:
+                    if mask & t_bit or t_required & ~mask:
+                        continue
+                    index = t_code * MASKS + (mask | t_bit)
+                    reachable |= self.reachable[index]
+
+                    steps = self.min_steps[index]
+                    if steps != UNREACHABLE and (best == UNREACHABLE or steps + 1 < best):
+                        best = steps + 1
+                    steps = self.max_steps[index]
+                    if steps != UNREACHABLE and steps + 1 > worst:
+                        worst, worst_next = steps + 1, t_code
+
+                self.reachable[base + mask] = reachable
+                self.min_steps[base + mask] = best
+                self.max_steps[base + mask] = worst
+                self.critical_next[base + mask] = worst_next
+
+        # Prerequisites must not block a fresh journey anywhere
+        fresh = self.reachable[STATE_CODES[START] * MASKS]
+        blocked = [s.value for s in STATES if not fresh & STATE_BITS[s]]
+        if blocked:
+            raise JourneyGraphError(
+                f"Prerequisites make these states unreachable from {START.value}: {blocked}"
+            )
+
+    # -----------------------------
+    # Lookups (all O(1))
+    # -----------------------------
+    @staticmethod
+    def _index(state: PatientJourneyState, completed_mask: int) -> int:
+        return STATE_CODES[state] * MASKS + (completed_mask & (MASKS - 1))
+
+    def can_reach(self, state, completed_mask: int, target: PatientJourneyState) -> bool:
+        return bool(self.reachable[self._index(state, completed_mask)] & STATE_BITS[target])
+
+    def reachable_states(self, state, completed_mask: int) -> Set[PatientJourneyState]:
+        reachable = self.reachable[self._index(state, completed_mask)]
+        return {s for s in STATES if reachable & STATE_BITS[s]}
+
+    def steps_to_close(self, state, completed_mask: int) -> Optional[int]:
+        """
+        Fewest transitions left until JOURNEY_CLOSED (None if impossible).
+        """
+        steps = self.min_steps[self._index(state, completed_mask)]
+        return None if steps == UNREACHABLE else steps
+
+    def critical_path_length(self, state, completed_mask: int) -> Optional[int]:
+        """
+        Most transitions left until JOURNEY_CLOSED (None if impossible).
+        """
+        steps = self.max_steps[self._index(state, completed_mask)]
+        return None if steps == UNREACHABLE else steps
+
+    def critical_path(self, state, completed_mask: int) -> List[PatientJourneyState]:
+        """
+        The longest remaining path to JOURNEY_CLOSED, excluding `state`.
+        """
+        path = []
+        index = self._index(state, completed_mask)
+        while self.critical_next[index] != UNREACHABLE:
+            state = STATES[self.critical_next[index]]
+            completed_mask |= STATE_BITS[state]
+            path.append(state)
+            index = self._index(state, completed_mask)
+        return path
+
+    def is_descendant(self, state, target) -> bool:
+        """
+        Transitive closure of ALLOWED_TRANSITIONS (ignores prerequisites).
+        """
+        return bool(self.descendants[state] & STATE_BITS[target])
+
+    # -----------------------------
+    # PatientState helpers
+    # -----------------------------
+    def remaining_steps(self, patient_state: PatientState) -> Optional[int]:
+        return self.steps_to_close(patient_state.current_state, patient_state.completed_mask)
+
+    def can_close(self, patient_state: PatientState) -> bool:
+        return self.can_reach(patient_state.current_state, patient_state.completed_mask, CLOSED)
+
+
+# Built (and validated) once per process
+journey_index = JourneyIndex()
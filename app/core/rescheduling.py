@@ -0,0 +1,94 @@
+"""
+rescheduling.py
+
+Deterministic retry / backoff engine for missed patient events.
+
+Responsibilities:
+- Describe per-event-type retry policies (limits + backoff)
+- Create the replacement PatientEvent for a missed one
+
+Replacements are woken in time order by the cohort reminder wheel
+(app/workflows/reminder_wheel.py), which tracks every SCHEDULED event.
+
+IMPORTANT:
+- No LLM usage
+- No randomness (same inputs → same schedule)
+"""
+
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from app.core.state import PatientState, PatientEvent, EventStatus
+
+
+# -------------------------------------------------------------------
+# RETRY POLICY
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retry limits and backoff for one event type.
+
+    The n-th retry (1-based) is scheduled at:
+        missed_at + min(base_delay * factor ** (n - 1), max_delay) + jitter
+
+    Jitter is derived from the event id, so it is stable across runs.
+    """
+    max_retries: int
+    base_delay: timedelta = timedelta(days=1)
+    factor: float = 2.0
+    max_delay: timedelta = timedelta(days=14)
+    jitter: timedelta = timedelta(0)
+
+    def backoff(self, attempt: int, key: str = "") -> timedelta:
+        """
+        Returns the delay before retry number `attempt` (1-based).
+        """
+        delay = self.base_delay * (self.factor ** max(attempt - 1, 0))
+        delay = min(delay, self.max_delay)
+
+        if self.jitter and key:
+            fraction = (zlib.crc32(key.encode()) % 1000) / 1000
+            delay += self.jitter * fraction
+
+        return delay
+
+    def next_time(self, missed_at: datetime, attempt: int, key: str = "") -> datetime:
+        return missed_at + self.backoff(attempt, key)
+
+
+# -------------------------------------------------------------------
+# RESCHEDULING
+# -------------------------------------------------------------------
+
+def reschedule_event(
+    patient_state: PatientState,
+    event: PatientEvent,
+    policy: RetryPolicy,
+) -> PatientEvent:
+    """
+    Marks `event` as MISSED and builds its replacement at the
+    policy's backoff time.
+
+    The replacement is NOT attached; the caller may move it to a free
+    slot first and then call `patient_state.add_event`.
+    The caller is responsible for checking retry limits first.
+    """
+
+    attempt = event.attempt + 1
+    patient_state.set_event_status(event, EventStatus.MISSED)
+
+    replacement = PatientEvent(
+        event_id=f"{event.event_id.split('#')[0]}#{attempt}",
+        event_type=event.event_type,
+        scheduled_time=policy.next_time(
+            patient_state.current_time,
+            attempt,
+            key=f"{patient_state.patient_id}:{event.event_id}",
+        ),
+        attempt=attempt,
+    )
+
+    return replacement
@@ -7,7 +7,20 @@ Canonical patient state model for Patient Journey Orchestration Agent.
 from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+
+from app.config.settings import get_settings
+
+
+# Default start of the simulated clock
+SIMULATION_START = get_settings().simulation_start
+
+
+class HistoryArchiveMissing(RuntimeError):
+    """
+    Part of a patient's history was archived, but no archive is
+    attached to read it back (see PatientState.archive).
+    """
 
 
 class PatientJourneyState(Enum):
@@ -29,6 +42,12 @@ class PatientJourneyState(Enum):
     JOURNEY_CLOSED = "JOURNEY_CLOSED"
 
 
+# One bit per state, in declaration order (see PatientState.completed_mask)
+STATE_BITS: Dict[PatientJourneyState, int] = {
+    state: 1 << index for index, state in enumerate(PatientJourneyState)
+}
+
+
 class EventStatus(str, Enum):
     SCHEDULED = "scheduled"
     COMPLETED = "completed"
@@ -41,6 +60,8 @@ class PatientEvent:
     event_type: str
     scheduled_time: datetime
     status: EventStatus = EventStatus.SCHEDULED
+    attempt: int = 0
+    resource_id: Optional[str] = None
 
 
 @dataclass(frozen=True)
@@ -59,7 +80,7 @@ class PatientState:
 
     # 🕒 Simulated time
     current_time: datetime = field(
-        default_factory=lambda: datetime(2025, 1, 1, 9, 0)
+        default_factory=lambda: SIMULATION_START
     )
 
     # 📅 Events
@@ -68,6 +89,34 @@ class PatientState:
     # 🚨 Workflow signals (agent communication bus)
     signals: Dict[str, bool] = field(default_factory=dict)
 
+    # 📝 Change observers, e.g. the write-ahead log or reminder wheel.
+    # Each is called as observer(patient_id, kind, data, current_time).
+    observers: List[Callable] = field(default_factory=list, repr=False, compare=False)
+
+    def add_observer(self, observer: Callable):
+        if observer not in self.observers:
+            self.observers.append(observer)
+
+    # 🗄️ Tiering: old history / events may live in an archive
+    # (see app/memory/history_archive.py). These summaries stay exact.
+    completed_mask: int = 0
+    archived_transitions: int = 0
+    archived_events: int = 0
+    archive: Optional[object] = field(default=None, repr=False, compare=False)
+
+    # ⏰ Events whose timers fired, set by a timer-driven caller
+    # (CohortClock). When set, ReminderAgent checks only these instead
+    # of scanning every event. Not persisted.
+    due_events: Optional[List[PatientEvent]] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        for transition in self.history:
+            self.completed_mask |= STATE_BITS[transition.to_state]
+
+    def _emit(self, kind: str, **data):
+        for observer in self.observers:
+            observer(self.patient_id, kind, data, self.current_time)
+
     # -----------------------------
     # State transitions
     # -----------------------------
@@ -75,20 +124,45 @@ class PatientState:
         transition = StateTransition(
             from_state=self.current_state,
             to_state=to_state,
-            by=by
+            by=by,
+            at=self.current_time,
         )
         self.history.append(transition)
         self.current_state = to_state
+        self.completed_mask |= STATE_BITS[to_state]
+        self._emit(
+            "transition",
+            from_state=transition.from_state.value,
+            to_state=to_state.value,
+            by=by,
+        )
 
     # -----------------------------
     # Simulated time control
     # -----------------------------
     def advance_time(self, delta: timedelta):
         self.current_time += delta
+        self._emit("time")
 
     # -----------------------------
     # Event helpers
     # -----------------------------
+    def add_event(self, event: PatientEvent):
+        self.events.append(event)
+        self._emit(
+            "event_added",
+            event_id=event.event_id,
+            event_type=event.event_type,
+            scheduled_time=event.scheduled_time.isoformat(),
+            status=event.status.value,
+            attempt=event.attempt,
+            resource_id=event.resource_id,
+        )
+
+    def set_event_status(self, event: PatientEvent, status: EventStatus):
+        event.status = status
+        self._emit("event_status", event_id=event.event_id, status=status.value)
+
     def get_due_events(self):
         return [
             e for e in self.events
@@ -100,16 +174,24 @@ class PatientState:
     # Signal helpers
     # -----------------------------
     def set_signal(self, key: str):
+        if not self.signals.get(key):
+            self._emit("signal_set", key=key)
         self.signals[key] = True
 
     def clear_signal(self, key: str):
-        self.signals.pop(key, None)
+        if self.signals.pop(key, None) is not None:
+            self._emit("signal_cleared", key=key)
 
     # 🔁 Retry counters (per event type)
     retry_counts: Dict[str, int] = field(default_factory=dict)
 
     def increment_retry(self, event_type: str):
         self.retry_counts[event_type] = self.retry_counts.get(event_type, 0) + 1
+        self._emit("retry", event_type=event_type)
+
+    def reset_retries(self, event_type: str):
+        if self.retry_counts.pop(event_type, None) is not None:
+            self._emit("retry_reset", event_type=event_type)
     
     
     def get_retry_count(self, event_type: str) -> int:
@@ -119,4 +201,41 @@ class PatientState:
 
     @property
     def completed_states(self) -> set:
-        return {t.to_state for t in self.history}
+        return {s for s, bit in STATE_BITS.items() if self.completed_mask & bit}
+
+    def has_completed(self, state: PatientJourneyState) -> bool:
+        return bool(self.completed_mask & STATE_BITS[state])
+
+    # -----------------------------
+    # Totals / full history (hot + archived)
+    # -----------------------------
+    @property
+    def transition_count(self) -> int:
+        return self.archived_transitions + len(self.history)
+
+    @property
+    def event_count(self) -> int:
+        return self.archived_events + len(self.events)
+
+    def _require_archive(self):
+        if self.archive is None:
+            raise HistoryArchiveMissing(
+                f"Patient {self.patient_id} has {self.archived_transitions} archived "
+                f"transitions and {self.archived_events} archived events, but no "
+                f"archive is attached"
+            )
+
+    def full_history(self) -> List[StateTransition]:
+        """
+        Every transition, loading archived ones on demand.
+        """
+        if not self.archived_transitions:
+            return list(self.history)
+        self._require_archive()
+        return self.archive.load_transitions(self.patient_id) + self.history
+
+    def full_events(self) -> List[PatientEvent]:
+        if not self.archived_events:
+            return list(self.events)
+        self._require_archive()
+        return self.archive.load_events(self.patient_id) + self.events
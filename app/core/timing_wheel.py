@@ -0,0 +1,179 @@
+"""
+timing_wheel.py
+
+Hierarchical timing wheel keyed by simulated time.
+
+Timers are bucketed by tick (one tick = `resolution`). Level 0 holds
+timers due within the next `slots` ticks, level 1 within `slots**2`
+ticks, and so on; timers further out wait in an overflow heap.
+As the wheel advances, higher-level buckets cascade down.
+
+Cost per timer is amortised O(1): one insert, at most `levels`
+cascades, one pop. Runs of empty ticks are skipped in jumps, so
+advancing the clock by days costs nothing when no timers are due.
+
+IMPORTANT:
+- No LLM usage
+- No wall-clock reads: the caller drives time via `advance(now)`
+"""
+
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from typing import Any, List, Tuple
+
+
+Timer = Tuple[int, int, Any]
+# (tick, timer_id, item)
+
+
+class HierarchicalTimingWheel:
+    def __init__(
+        self,
+        start: datetime,
+        resolution: timedelta = timedelta(minutes=1),
+        slots: int = 64,
+        levels: int = 4,
+    ):
+        self.origin = start
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+
+        self._spans = [slots ** level for level in range(levels + 1)]
+        self._wheels: List[List[List[Timer]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self._counts = [0] * levels
+        self._overflow: List[Timer] = []
+
+        self._current = 0
+        self._ids = itertools.count()
+        self._active = set()
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    # -----------------------------
+    # Time <-> tick
+    # -----------------------------
+    def _tick_at_or_after(self, moment: datetime) -> int:
+        ticks, remainder = divmod(moment - self.origin, self.resolution)
+        return ticks + (1 if remainder else 0)
+
+    def _tick_at_or_before(self, moment: datetime) -> int:
+        return (moment - self.origin) // self.resolution
+
+    def time_of(self, tick: int) -> datetime:
+        return self.origin + tick * self.resolution
+
+    @property
+    def now(self) -> datetime:
+        return self.time_of(self._current)
+
+    # -----------------------------
+    # Scheduling
+    # -----------------------------
+    def schedule(self, due: datetime, item: Any) -> int:
+        """
+        Schedules `item` to fire once the clock reaches `due`.
+        Returns a timer id usable with `cancel()`.
+        """
+        timer_id = next(self._ids)
+        tick = max(self._tick_at_or_after(due), self._current)
+        self._place((tick, timer_id, item))
+        self._active.add(timer_id)
+        return timer_id
+
+    def cancel(self, timer_id: int):
+        """
+        Lazily cancels a timer; it is dropped when its bucket is reached.
+        """
+        self._active.discard(timer_id)
+
+    def _place(self, timer: Timer):
+        delta = timer[0] - self._current
+
+        for level in range(self.levels):
+            if delta < self._spans[level + 1]:
+                slot = (timer[0] // self._spans[level]) % self.slots
+                self._wheels[level][slot].append(timer)
+                self._counts[level] += 1
+                return
+
+        heapq.heappush(self._overflow, timer)
+
+    # -----------------------------
+    # Advancing
+    # -----------------------------
+    def advance(self, now: datetime) -> List[Any]:
+        """
+        Moves the clock to `now` and returns every item that fell due,
+        in due order (ties in scheduling order).
+        """
+        target = self._tick_at_or_before(now)
+        fired: List[Timer] = self._pop_bucket(0, self._current % self.slots)
+
+        while self._current < target:
+            self._current += self._jump(target)
+
+            # Top-down, so cascaded timers can cascade again this tick
+            if self._current % self._spans[self.levels] == 0:
+                self._drain_overflow()
+
+            for level in range(self.levels - 1, 0, -1):
+                if self._current % self._spans[level] == 0:
+                    self._cascade(level)
+
+            fired.extend(self._pop_bucket(0, self._current % self.slots))
+
+        fired.sort(key=lambda timer: (timer[0], timer[1]))
+        return [item for _, _, item in fired]
+
+    def _jump(self, target: int) -> int:
+        """
+        Distance to the next tick where anything can happen.
+        """
+        for level in range(self.levels):
+            if self._counts[level]:
+                span = self._spans[level]
+                break
+        else:
+            span = self._spans[self.levels]
+
+        step = span - (self._current % span) if span > 1 else 1
+        return min(step, target - self._current)
+
+    def _pop_bucket(self, level: int, slot: int) -> List[Timer]:
+        bucket = self._wheels[level][slot]
+        if not bucket:
+            return []
+
+        self._wheels[level][slot] = []
+        self._counts[level] -= len(bucket)
+
+        fired = []
+        for timer in bucket:
+            if timer[1] in self._active:
+                self._active.discard(timer[1])
+                fired.append(timer)
+        return fired
+
+    def _cascade(self, level: int):
+        slot = (self._current // self._spans[level]) % self.slots
+        bucket = self._wheels[level][slot]
+        if not bucket:
+            return
+
+        self._wheels[level][slot] = []
+        self._counts[level] -= len(bucket)
+        for timer in bucket:
+            if timer[1] in self._active:
+                self._place(timer)
+
+    def _drain_overflow(self):
+        horizon = self._current + self._spans[self.levels]
+        while self._overflow and self._overflow[0][0] < horizon:
+            timer = heapq.heappop(self._overflow)
+            if timer[1] in self._active:
+                self._place(timer)
@@ -85,7 +85,7 @@ def validate_transition(
     # ---------------------------------------------------------------
     # Rule 4: Prevent backward transitions (regressions)
     # ---------------------------------------------------------------
-    if to_state in patient_state.completed_states:
+    if patient_state.has_completed(to_state):
         return (
             False,
             f"State regression not allowed: {to_state.value} already completed"
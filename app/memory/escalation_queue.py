@@ -0,0 +1,551 @@
+"""
+escalation_queue.py
+
+Persistent, indexed work queue of escalated patients.
+
+When a journey halts on `escalation_required`, the patient is pushed
+here instead of being dropped. Reviewers (ops) then:
+- browse / filter open escalations (`peek`, by event_type and state)
+- claim a batch (`claim`) and hand back what they cannot finish (`release`)
+- resolve an escalation (`resolve`), which can rebook the missed event
+  and resume the journey graph
+
+Ordering (highest priority first):
+1. severity (higher first)
+2. time waiting (earlier escalation first)
+3. retry count (more failed attempts first)
+
+Open escalations are kept in sorted indexes (overall, per event_type,
+per state), so filtered top-N queries stay in the millisecond range
+with 100k+ open items.
+
+Durability: every operation is appended to a JSONL journal and the
+queue is rebuilt from it on startup. The journal is compacted (only
+unresolved escalations kept) once resolved entries dominate it.
+"""
+
+import bisect
+import itertools
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.config.settings import get_settings
+from app.core.state import PatientState, EventStatus
+from app.tools.persistence_tools import (
+    patient_state_to_dict,
+    patient_state_from_dict,
+)
+
+
+OPEN = "open"
+CLAIMED = "claimed"
+RESOLVED = "resolved"
+
+# Default severity by the event type that exhausted its retries
+EVENT_SEVERITY = {
+    "lab_test": 3,
+    "appointment": 2,
+    "follow_up": 1,
+}
+DEFAULT_SEVERITY = 1
+
+COMPACT_MIN_RECORDS = 10000
+
+
+# -------------------------------------------------------------------
+# ESCALATION RECORD
+# -------------------------------------------------------------------
+
+@dataclass
+class Escalation:
+    escalation_id: str
+    patient_id: str
+    state: str
+    event_type: Optional[str]
+    severity: int
+    retry_count: int
+    escalated_at: datetime
+    reason: str = ""
+    status: str = OPEN
+    claimed_by: Optional[str] = None
+    resolution: Optional[str] = None
+
+    @property
+    def priority(self) -> Tuple:
+        """
+        Sort key: smaller sorts first.
+        """
+        return (-self.severity, self.escalated_at, -self.retry_count, self.escalation_id)
+
+    def to_dict(self) -> Dict:
+        return {
+            "escalation_id": self.escalation_id,
+            "patient_id": self.patient_id,
+            "state": self.state,
+            "event_type": self.event_type,
+            "severity": self.severity,
+            "retry_count": self.retry_count,
+            "escalated_at": self.escalated_at.isoformat(),
+            "reason": self.reason,
+            "status": self.status,
+            "claimed_by": self.claimed_by,
+            "resolution": self.resolution,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Escalation":
+        data = dict(data)
+        data["escalated_at"] = datetime.fromisoformat(data["escalated_at"])
+        return cls(**data)
+
+
+# -------------------------------------------------------------------
+# SORTED INDEX
+# -------------------------------------------------------------------
+
+class _SortedIndex:
+    """
+    Priority-ordered keys with O(log n) search and memmove-cheap
+    insert / delete.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Tuple):
+        bisect.insort(self._keys, key)
+
+    def remove(self, key: Tuple):
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
+
+    def __iter__(self) -> Iterator[Tuple]:
+        return iter(self._keys)
+
+
+# -------------------------------------------------------------------
+# ESCALATION QUEUE
+# -------------------------------------------------------------------
+
+class EscalationQueue:
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        severity_by_event_type: Optional[Dict[str, int]] = None,
+        fsync: bool = False,
+    ):
+        """
+        path:
+        JSONL journal; None keeps the queue in memory only.
+        """
+        self.path = Path(path) if path is not None else None
+        self.severity_by_event_type = severity_by_event_type or EVENT_SEVERITY
+        self.fsync = fsync
+
+        self._items: Dict[str, Escalation] = {}
+        self._patients: Dict[str, PatientState] = {}
+        # patient_id → unresolved escalation_id
+        self._by_patient: Dict[str, str] = {}
+
+        self._open = _SortedIndex()
+        self._open_by_event_type: Dict[Optional[str], _SortedIndex] = {}
+        self._open_by_state: Dict[str, _SortedIndex] = {}
+        # reviewer → claimed escalation_ids
+        self._claimed: Dict[str, Set[str]] = {}
+
+        self._last_id = 0
+        self._journal_records = 0
+        self._handle = None
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists():
+                valid_bytes = self._load()
+                # Drop a torn tail so new records start on a clean line
+                with self.path.open("r+b") as handle:
+                    handle.truncate(valid_bytes)
+            self._handle = self.path.open("a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        """
+        Number of unresolved (open + claimed) escalations.
+        """
+        return len(self._by_patient)
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    # -----------------------------
+    # Escalating
+    # -----------------------------
+    def escalate(
+        self,
+        patient_state: PatientState,
+        reason: str = "",
+        severity: Optional[int] = None,
+    ) -> Escalation:
+        """
+        Queues a halted patient. Idempotent: a patient with an
+        unresolved escalation gets that escalation back.
+        """
+        existing = self._by_patient.get(patient_state.patient_id)
+        if existing is not None:
+            return self._items[existing]
+
+        event_type = self._failed_event_type(patient_state)
+        if severity is None:
+            severity = self.severity_by_event_type.get(event_type, DEFAULT_SEVERITY)
+
+        escalation = Escalation(
+            escalation_id=self._next_id(),
+            patient_id=patient_state.patient_id,
+            state=patient_state.current_state.value,
+            event_type=event_type,
+            severity=severity,
+            retry_count=patient_state.get_retry_count(event_type) if event_type else 0,
+            escalated_at=patient_state.current_time,
+            reason=reason or f"{event_type or 'journey'} retries exhausted",
+        )
+
+        self._append({
+            "op": "escalate",
+            "escalation": escalation.to_dict(),
+            "patient": patient_state_to_dict(patient_state),
+        })
+        self._insert(escalation, patient_state)
+        return escalation
+
+    def _next_id(self) -> str:
+        self._last_id += 1
+        return f"ESC-{self._last_id:08d}"
+
+    @staticmethod
+    def _failed_event_type(patient_state: PatientState) -> Optional[str]:
+        for event in reversed(patient_state.events):
+            if event.status == EventStatus.MISSED:
+                return event.event_type
+        return None
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def get(self, escalation_id: str) -> Optional[Escalation]:
+        return self._items.get(escalation_id)
+
+    def patient_state(self, escalation_id: str) -> Optional[PatientState]:
+        return self._patients.get(escalation_id)
+
+    def peek(
+        self,
+        limit: int = 50,
+        event_type: Optional[str] = None,
+        state: Optional[str] = None,
+    ) -> List[Escalation]:
+        """
+        Highest-priority OPEN escalations, optionally filtered.
+        """
+        return list(itertools.islice(self._iter_open(event_type, state), limit))
+
+    def count_open(self, event_type: Optional[str] = None, state: Optional[str] = None) -> int:
+        if event_type is None and state is None:
+            return len(self._open)
+        if state is None:
+            return len(self._open_by_event_type.get(event_type, ()))
+        if event_type is None:
+            return len(self._open_by_state.get(state, ()))
+        return sum(1 for _ in self._iter_open(event_type, state))
+
+    def stats(self) -> Dict:
+        return {
+            "open": len(self._open),
+            "claimed": len(self) - len(self._open),
+            "open_by_event_type": {k: len(v) for k, v in self._open_by_event_type.items() if len(v)},
+            "open_by_state": {k: len(v) for k, v in self._open_by_state.items() if len(v)},
+        }
+
+    def _iter_open(self, event_type: Optional[str], state: Optional[str]) -> Iterator[Escalation]:
+        if event_type is None and state is None:
+            index, check = self._open, None
+        elif state is None:
+            index, check = self._open_by_event_type.get(event_type, ()), None
+        elif event_type is None:
+            index, check = self._open_by_state.get(state, ()), None
+        else:
+            # Walk the smaller index, filter on the other attribute
+            by_type = self._open_by_event_type.get(event_type, ())
+            by_state = self._open_by_state.get(state, ())
+            if len(by_type) <= len(by_state):
+                index, check = by_type, ("state", state)
+            else:
+                index, check = by_state, ("event_type", event_type)
+
+        for key in index:
+            escalation = self._items[key[-1]]
+            if check is None or getattr(escalation, check[0]) == check[1]:
+                yield escalation
+
+    # -----------------------------
+    # Claim / release
+    # -----------------------------
+    def claim(
+        self,
+        reviewer: str,
+        limit: int = 10,
+        event_type: Optional[str] = None,
+        state: Optional[str] = None,
+    ) -> List[Escalation]:
+        """
+        Atomically claims up to `limit` top-priority OPEN escalations.
+        """
+        claimed = self.peek(limit, event_type=event_type, state=state)
+        if not claimed:
+            return []
+
+        self._append({
+            "op": "claim",
+            "ids": [e.escalation_id for e in claimed],
+            "reviewer": reviewer,
+        })
+        for escalation in claimed:
+            self._mark_claimed(escalation, reviewer)
+        return claimed
+
+    def release(
+        self,
+        escalation_ids: Optional[Iterable[str]] = None,
+        reviewer: Optional[str] = None,
+    ) -> int:
+        """
+        Returns claimed escalations to the queue at their original
+        priority: the given ids, or everything held by `reviewer`.
+        """
+        if escalation_ids is None:
+            reviewers = self._claimed if reviewer is None else [reviewer]
+            escalation_ids = [
+                i for r in reviewers for i in self._claimed.get(r, ())
+            ]
+
+        released = [
+            self._items[i] for i in escalation_ids
+            if i in self._items and self._items[i].status == CLAIMED
+        ]
+        if not released:
+            return 0
+
+        self._append({"op": "release", "ids": [e.escalation_id for e in released]})
+        for escalation in released:
+            self._mark_open(escalation)
+        return len(released)
+
+    def claimed_by(self, reviewer: str) -> List[Escalation]:
+        return sorted(
+            (self._items[i] for i in self._claimed.get(reviewer, ())),
+            key=lambda e: e.priority,
+        )
+
+    # -----------------------------
+    # Resolution
+    # -----------------------------
+    def resolve(
+        self,
+        escalation_id: str,
+        resolution: str = "",
+        rebook: bool = False,
+        scheduling_agent=None,
+        runner=None,
+    ) -> Optional[Dict]:
+        """
+        Closes an escalation and releases the patient back to the
+        journey.
+
+        rebook=True resets the failed event type's retry budget and
+        books a fresh event through `scheduling_agent`.
+        With a `runner` (JourneyRunner), the journey graph is resumed
+        and its result returned.
+        """
+        escalation = self._items.get(escalation_id)
+        if escalation is None or escalation.status == RESOLVED:
+            raise KeyError(f"No unresolved escalation {escalation_id}")
+
+        patient_state = self._patients[escalation_id]
+
+        self._append({"op": "resolve", "id": escalation_id, "resolution": resolution})
+        self._remove(escalation)
+        escalation.status = RESOLVED
+        escalation.resolution = resolution
+
+        patient_state.clear_signal("escalation_required")
+
+        if rebook and escalation.event_type is not None:
+            patient_state.reset_retries(escalation.event_type)
+            if scheduling_agent is not None and scheduling_agent.needs_booking(patient_state.current_state):
+                scheduling_agent.book_event(patient_state, patient_state.current_state)
+
+        self._maybe_compact()
+
+        if runner is not None:
+            return runner.run(patient_state)
+        return None
+
+    # -----------------------------
+    # Index maintenance
+    # -----------------------------
+    def _insert(self, escalation: Escalation, patient_state: PatientState):
+        self._items[escalation.escalation_id] = escalation
+        self._patients[escalation.escalation_id] = patient_state
+        self._by_patient[escalation.patient_id] = escalation.escalation_id
+        if escalation.status == OPEN:
+            self._index_open(escalation)
+
+    def _remove(self, escalation: Escalation):
+        if escalation.status == OPEN:
+            self._unindex_open(escalation)
+        elif escalation.status == CLAIMED:
+            self._claimed[escalation.claimed_by].discard(escalation.escalation_id)
+        self._items.pop(escalation.escalation_id, None)
+        self._patients.pop(escalation.escalation_id, None)
+        self._by_patient.pop(escalation.patient_id, None)
+
+    def _mark_claimed(self, escalation: Escalation, reviewer: str):
+        self._unindex_open(escalation)
+        escalation.status = CLAIMED
+        escalation.claimed_by = reviewer
+        self._claimed.setdefault(reviewer, set()).add(escalation.escalation_id)
+
+    def _mark_open(self, escalation: Escalation):
+        self._claimed[escalation.claimed_by].discard(escalation.escalation_id)
+        escalation.status = OPEN
+        escalation.claimed_by = None
+        self._index_open(escalation)
+
+    def _index_open(self, escalation: Escalation):
+        key = escalation.priority
+        self._open.add(key)
+        self._open_by_event_type.setdefault(escalation.event_type, _SortedIndex()).add(key)
+        self._open_by_state.setdefault(escalation.state, _SortedIndex()).add(key)
+
+    def _unindex_open(self, escalation: Escalation):
+        key = escalation.priority
+        self._open.remove(key)
+        self._open_by_event_type[escalation.event_type].remove(key)
+        self._open_by_state[escalation.state].remove(key)
+
+    # -----------------------------
+    # Journal
+    # -----------------------------
+    def _append(self, record: Dict):
+        if self._handle is None:
+            return
+        self._handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._handle.flush()
+        if self.fsync:
+            os.fsync(self._handle.fileno())
+        self._journal_records += 1
+
+    def _load(self) -> int:
+        """
+        Replays the journal. Returns the byte offset just past the
+        last complete record.
+        """
+        valid_bytes = 0
+        with self.path.open("rb") as handle:
+            for line in handle:
+                # Torn final line from a crash (partial or unterminated)
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._journal_records += 1
+                self._replay(record)
+                valid_bytes += len(line)
+        return valid_bytes
+
+    def _replay(self, record: Dict):
+        op = record["op"]
+
+        if op == "meta":
+            self._last_id = max(self._last_id, record["last_id"])
+
+        elif op == "escalate":
+            escalation = Escalation.from_dict(record["escalation"])
+            self._insert(escalation, patient_state_from_dict(record["patient"]))
+            self._last_id = max(self._last_id, int(escalation.escalation_id.split("-")[1]))
+
+        elif op == "claim":
+            for escalation_id in record["ids"]:
+                self._mark_claimed(self._items[escalation_id], record["reviewer"])
+
+        elif op == "release":
+            for escalation_id in record["ids"]:
+                self._mark_open(self._items[escalation_id])
+
+        elif op == "resolve":
+            self._remove(self._items[record["id"]])
+
+        else:
+            raise ValueError(f"Unknown escalation journal op: {op}")
+
+    def _maybe_compact(self):
+        if self._handle is None:
+            return
+        if self._journal_records >= max(COMPACT_MIN_RECORDS, 2 * len(self)):
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the journal with only unresolved escalations.
+        """
+        if self.path is None:
+            return
+
+        tmp = self.path.with_suffix(".tmp")
+        records = 1
+        with tmp.open("w", encoding="utf-8") as handle:
+            # Resolved ids are dropped; keep the counter so ids never repeat
+            handle.write(json.dumps({"op": "meta", "last_id": self._last_id}) + "\n")
+            for escalation_id in self._by_patient.values():
+                escalation = self._items[escalation_id]
+                snapshot = escalation.to_dict()
+                snapshot["status"], snapshot["claimed_by"] = OPEN, None
+                handle.write(json.dumps({
+                    "op": "escalate",
+                    "escalation": snapshot,
+                    "patient": patient_state_to_dict(self._patients[escalation_id]),
+                }, separators=(",", ":")) + "\n")
+                records += 1
+
+                if escalation.status == CLAIMED:
+                    handle.write(json.dumps({
+                        "op": "claim",
+                        "ids": [escalation_id],
+                        "reviewer": escalation.claimed_by,
+                    }, separators=(",", ":")) + "\n")
+                    records += 1
+
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+
+        self.close()
+        os.replace(tmp, self.path)
+        self._handle = self.path.open("a", encoding="utf-8")
+        self._journal_records = records
+
+
+def escalation_queue_from_settings() -> EscalationQueue:
+    settings = get_settings()
+    if settings.escalation_queue_persistent:
+        return EscalationQueue(path=settings.escalation_queue_path)
+    return EscalationQueue()
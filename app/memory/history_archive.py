@@ -0,0 +1,170 @@
+"""
+history_archive.py
+
+Archival tiering for long-running patient journeys.
+
+PatientState keeps a bounded HOT window:
+- the most recent `max_transitions` transitions
+- every SCHEDULED event, plus the most recent `max_terminal_events`
+  completed / missed events
+
+Older entries are appended to a per-patient JSONL file under
+settings.archive_dir and dropped from memory. What the graph loop
+needs stays exact without them:
+- completed states → PatientState.completed_mask
+- retry totals     → PatientState.retry_counts (never trimmed)
+- totals / ids     → archived_transitions / archived_events counters
+
+`PatientState.full_history()` / `full_events()` load the archive lazily.
+
+Trimming uses hysteresis (only once the hot window reaches twice its
+size), so archiving is amortised O(1) per appended entry.
+"""
+
+import json
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from app.config.settings import get_settings
+from app.core.state import PatientState, PatientEvent, EventStatus, StateTransition
+from app.tools.persistence_tools import (
+    transition_to_row,
+    transition_from_row,
+    event_to_row,
+    event_from_row,
+)
+
+
+TRANSITION = "t"
+EVENT = "e"
+
+
+# -------------------------------------------------------------------
+# ARCHIVE STORE
+# -------------------------------------------------------------------
+
+class HistoryArchive:
+    """
+    Append-only per-patient archive files, sharded into 256 directories.
+    """
+
+    def __init__(self, archive_dir: Optional[Path] = None):
+        self.archive_dir = Path(archive_dir or get_settings().archive_dir)
+
+    def path_for(self, patient_id: str) -> Path:
+        shard = f"{zlib.crc32(patient_id.encode()) % 256:02x}"
+        return self.archive_dir / shard / f"{patient_id}.jsonl"
+
+    def append(
+        self,
+        patient_id: str,
+        transitions: List[StateTransition],
+        events: List[PatientEvent],
+    ):
+        if not transitions and not events:
+            return
+
+        path = self.path_for(patient_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        lines = [json.dumps([TRANSITION] + transition_to_row(t)) for t in transitions]
+        lines += [json.dumps([EVENT] + event_to_row(e)) for e in events]
+
+        with path.open("a", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+
+    def _rows(self, patient_id: str, kind: str) -> List[List]:
+        path = self.path_for(patient_id)
+        if not path.exists():
+            return []
+
+        rows = []
+        with path.open(encoding="utf-8") as handle:
+            for line in handle:
+                row = json.loads(line)
+                if row[0] == kind:
+                    rows.append(row[1:])
+        return rows
+
+    def load_transitions(self, patient_id: str) -> List[StateTransition]:
+        """
+        Archived transitions, oldest first.
+        """
+        return [transition_from_row(row) for row in self._rows(patient_id, TRANSITION)]
+
+    def load_events(self, patient_id: str) -> List[PatientEvent]:
+        """
+        Archived events, in the order they were archived.
+        """
+        return [event_from_row(row) for row in self._rows(patient_id, EVENT)]
+
+
+# -------------------------------------------------------------------
+# TIERING POLICY
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class TieringPolicy:
+    max_transitions: int = 50
+    max_terminal_events: int = 20
+
+    @classmethod
+    def from_settings(cls) -> "TieringPolicy":
+        settings = get_settings()
+        return cls(
+            max_transitions=settings.history_max_transitions,
+            max_terminal_events=settings.history_max_terminal_events,
+        )
+
+
+class HistoryTiering:
+    def __init__(
+        self,
+        archive: Optional[HistoryArchive] = None,
+        policy: Optional[TieringPolicy] = None,
+    ):
+        self.archive = archive or HistoryArchive()
+        self.policy = policy or TieringPolicy.from_settings()
+
+    def apply(self, patient_state: PatientState) -> int:
+        """
+        Moves entries beyond the hot window to the archive.
+        Returns how many entries were archived.
+        """
+        patient_state.archive = self.archive
+        policy = self.policy
+
+        history = patient_state.history
+        cut = 0
+        if len(history) >= 2 * policy.max_transitions > 0:
+            cut = len(history) - policy.max_transitions
+        old_transitions = history[:cut]
+
+        old_events: List[PatientEvent] = []
+        hot_events = patient_state.events
+        terminal = [e for e in hot_events if e.status != EventStatus.SCHEDULED]
+        if len(terminal) >= 2 * policy.max_terminal_events > 0:
+            archived_ids = {
+                id(e) for e in terminal[:len(terminal) - policy.max_terminal_events]
+            }
+            hot_events = []
+            for event in patient_state.events:
+                (old_events if id(event) in archived_ids else hot_events).append(event)
+
+        # Write first: if the archive fails, the hot state is untouched
+        self.archive.append(patient_state.patient_id, old_transitions, old_events)
+
+        patient_state.history = history[cut:]
+        patient_state.events = hot_events
+        patient_state.archived_transitions += len(old_transitions)
+        patient_state.archived_events += len(old_events)
+
+        return len(old_transitions) + len(old_events)
+
+
+def history_tiering_from_settings() -> Optional[HistoryTiering]:
+    if not get_settings().history_tiering_enabled:
+        return None
+    return HistoryTiering()
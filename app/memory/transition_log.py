@@ -0,0 +1,626 @@
+"""
+transition_log.py
+
+Event-sourced write-ahead log (WAL) for patient state.
+
+Every change made through PatientState (transitions, event additions
+and status changes, signal changes, retries, clock advances) is
+appended as one JSON line with a monotonically increasing LSN.
+Attaching a patient first logs a "baseline" record (the full state, in
+snapshot format), so history made before the log saw the patient,
+e.g. by stream_intake or a JSONL store, is recovered too.
+
+Durability at cohort throughput:
+- Writers only append to an in-memory buffer
+- A single flusher thread writes the buffer and fsyncs ONCE per batch
+  (group commit); `wait=True` / `flush()` block until durable
+
+Recovery cost stays bounded:
+- `compact()` seals the current segment and folds it into a
+  PatientState snapshot, so recovery = latest snapshot + WAL tail
+- Older snapshots / segments are kept for point-in-time replay
+  (see `keep_snapshots`)
+
+Replay tool:
+    python -m app.memory.transition_log P001 --until-time 2025-01-03T09:00
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.core.concurrency import PERSISTENCE, resource_limits
+from app.core.state import (
+    STATE_BITS,
+    PatientState,
+    PatientJourneyState,
+    PatientEvent,
+    EventStatus,
+    StateTransition,
+)
+from app.tools.persistence_tools import (
+    patient_state_to_dict,
+    patient_state_from_dict,
+)
+
+
+SEGMENT_PREFIX = "wal-"
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+class HistoryNotRetainedError(LookupError):
+    """
+    A point-in-time replay asked for history that retention deleted.
+    """
+
+
+# -------------------------------------------------------------------
+# RECORD REPLAY
+# -------------------------------------------------------------------
+
+def apply_record(states: Dict[str, PatientState], record: Dict) -> PatientState:
+    """
+    Applies one WAL record to `states` (keyed by patient_id).
+
+    Mutates fields directly so replay never re-emits records.
+    """
+    patient_id = record["pid"]
+    kind, data = record["kind"], record["data"]
+
+    # Full state as of attach; replaces whatever was replayed before
+    if kind == "baseline":
+        patient_state = patient_state_from_dict(data)
+        states[patient_id] = patient_state
+        return patient_state
+
+    patient_state = states.get(patient_id)
+    if patient_state is None:
+        patient_state = PatientState(patient_id=patient_id)
+        states[patient_id] = patient_state
+
+    patient_state.current_time = datetime.fromisoformat(record["at"])
+
+    if kind == "transition":
+        to_state = PatientJourneyState(data["to_state"])
+        patient_state.history.append(StateTransition(
+            from_state=PatientJourneyState(data["from_state"]),
+            to_state=to_state,
+            by=data["by"],
+            at=patient_state.current_time,
+        ))
+        patient_state.current_state = to_state
+        patient_state.completed_mask |= STATE_BITS[to_state]
+
+    elif kind == "event_added":
+        patient_state.events.append(PatientEvent(
+            event_id=data["event_id"],
+            event_type=data["event_type"],
+            scheduled_time=datetime.fromisoformat(data["scheduled_time"]),
+            status=EventStatus(data["status"]),
+            attempt=data["attempt"],
+            resource_id=data["resource_id"],
+        ))
+
+    elif kind == "event_status":
+        for event in reversed(patient_state.events):
+            if event.event_id == data["event_id"]:
+                event.status = EventStatus(data["status"])
+                break
+
+    elif kind == "signal_set":
+        patient_state.signals[data["key"]] = True
+
+    elif kind == "signal_cleared":
+        patient_state.signals.pop(data["key"], None)
+
+    elif kind == "retry":
+        event_type = data["event_type"]
+        patient_state.retry_counts[event_type] = (
+            patient_state.retry_counts.get(event_type, 0) + 1
+        )
+
+    elif kind == "retry_reset":
+        patient_state.retry_counts.pop(data["event_type"], None)
+
+    elif kind != "time":
+        raise ValueError(f"Unknown WAL record kind: {kind}")
+
+    return patient_state
+
+
+# -------------------------------------------------------------------
+# ON-DISK LAYOUT
+# -------------------------------------------------------------------
+
+def _numbered(directory: Path, prefix: str) -> List[Tuple[int, Path]]:
+    """
+    Returns [(number, path)] for files named <prefix><number>.*, sorted.
+    """
+    found = []
+    for path in Path(directory).glob(f"{prefix}*"):
+        number = path.name[len(prefix):].split(".")[0]
+        if number.isdigit():
+            found.append((int(number), path))
+    return sorted(found)
+
+
+def iter_segment(path: Path) -> Iterator[Dict]:
+    """
+    Yields records from one segment. A torn final line (crash during
+    write) ends the segment instead of raising.
+    """
+    with Path(path).open(encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return
+
+
+def iter_wal(wal_dir: Path, after_lsn: int = 0) -> Iterator[Dict]:
+    for _, path in _numbered(wal_dir, SEGMENT_PREFIX):
+        for record in iter_segment(path):
+            if record["lsn"] > after_lsn:
+                yield record
+
+
+def read_snapshot(path: Path) -> Tuple[Dict, Dict[str, PatientState]]:
+    """
+    Returns (header, states). The header holds "lsn" and "max_at".
+    """
+    with Path(path).open(encoding="utf-8") as handle:
+        header = json.loads(handle.readline())
+        states = {}
+        for line in handle:
+            patient_state = patient_state_from_dict(json.loads(line))
+            states[patient_state.patient_id] = patient_state
+    return header, states
+
+
+def _fsync_dir(directory: Path):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+# -------------------------------------------------------------------
+# RECOVERY / POINT-IN-TIME REPLAY
+# -------------------------------------------------------------------
+
+def recover_states(wal_dir: Path, snapshot_dir: Path, archive=None) -> Dict[str, PatientState]:
+    """
+    Rebuilds every patient: latest snapshot + WAL records after it.
+    `archive` (a HistoryArchive) is reattached to every patient.
+    """
+    lsn, states = 0, {}
+    snapshots = _numbered(snapshot_dir, SNAPSHOT_PREFIX)
+    if snapshots:
+        header, states = read_snapshot(snapshots[-1][1])
+        lsn = header["lsn"]
+
+    for record in iter_wal(wal_dir, after_lsn=lsn):
+        apply_record(states, record)
+
+    if archive is not None:
+        for patient_state in states.values():
+            patient_state.archive = archive
+    return states
+
+
+def rebuild_patient(
+    patient_id: str,
+    wal_dir: Path,
+    snapshot_dir: Path,
+    until_lsn: Optional[int] = None,
+    until_time: Optional[datetime] = None,
+    archive=None,
+) -> Optional[PatientState]:
+    """
+    Rebuilds one patient as of `until_lsn` and/or simulated `until_time`
+    (inclusive). Starts from the newest snapshot that predates both.
+
+    `archive` (a HistoryArchive) is reattached to the result.
+
+    Returns None if the patient has no records by then. Raises
+    HistoryNotRetainedError if the bounds reach back past the oldest
+    retained snapshot (the replay would silently miss records).
+    """
+    lsn, states = 0, {}
+
+    for number, path in reversed(_numbered(snapshot_dir, SNAPSHOT_PREFIX)):
+        with path.open(encoding="utf-8") as handle:
+            header = json.loads(handle.readline())
+        max_at = datetime.fromisoformat(header["max_at"]) if header["max_at"] else None
+
+        if until_lsn is not None and number > until_lsn:
+            continue
+        if until_time is not None and max_at is not None and max_at > until_time:
+            continue
+
+        _, snapshot_states = read_snapshot(path)
+        lsn = number
+        if patient_id in snapshot_states:
+            states[patient_id] = snapshot_states[patient_id]
+        break
+
+    segments = _numbered(wal_dir, SEGMENT_PREFIX)
+    first_retained = segments[0][0] if segments else lsn + 1
+    if first_retained > lsn + 1:
+        raise HistoryNotRetainedError(
+            f"Cannot rebuild {patient_id}: records before LSN {first_retained} "
+            f"were removed by retention (increase wal_keep_snapshots)"
+        )
+
+    for record in iter_wal(wal_dir, after_lsn=lsn):
+        if until_lsn is not None and record["lsn"] > until_lsn:
+            break
+        if record["pid"] != patient_id:
+            continue
+        if until_time is not None and datetime.fromisoformat(record["at"]) > until_time:
+            break
+        apply_record(states, record)
+
+    patient_state = states.get(patient_id)
+    if patient_state is not None and archive is not None:
+        patient_state.archive = archive
+    return patient_state
+
+
+# -------------------------------------------------------------------
+# WRITE-AHEAD LOG
+# -------------------------------------------------------------------
+
+class TransitionLog:
+    """
+    Append-only, group-committed log of patient state changes.
+
+    Attach to a patient with `log.attach(patient_state)`; its current
+    state is logged as a baseline and every subsequent change is
+    recorded without further calls.
+    """
+
+    def __init__(
+        self,
+        wal_dir: Optional[Path] = None,
+        snapshot_dir: Optional[Path] = None,
+        flush_interval: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        keep_snapshots: Optional[int] = None,
+        snapshot_every: Optional[int] = None,
+        fsync: bool = True,
+    ):
+        settings = get_settings()
+        self.wal_dir = Path(wal_dir or settings.wal_dir)
+        self.snapshot_dir = Path(snapshot_dir or settings.snapshot_dir)
+        self.flush_interval = flush_interval or settings.wal_flush_interval_seconds
+        self.max_batch = max_batch or settings.wal_max_batch
+        self.keep_snapshots = max(1, keep_snapshots or settings.wal_keep_snapshots)
+        self.snapshot_every = snapshot_every or settings.wal_snapshot_every_records
+        self.fsync = fsync
+
+        self.wal_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+        # Buffer state (guarded by _cond)
+        self._cond = threading.Condition()
+        self._pending: List[str] = []
+        self._urgent = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+
+        last_lsn = self._last_lsn_on_disk()
+        self._next_lsn = last_lsn + 1
+        self._durable_lsn = last_lsn
+        self.records_since_snapshot = 0
+
+        # File state (guarded by _io_lock)
+        self._io_lock = threading.Lock()
+        self._written_lsn = last_lsn
+        self._segment = self._open_segment(self._next_lsn)
+
+        self.batches_written = 0
+        self._compact_lock = threading.Lock()
+
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="wal-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def attach(self, patient_state: PatientState):
+        # Runners attach on every run; only the first attach logs a baseline
+        if self.record in patient_state.observers:
+            return
+        self.record(
+            patient_state.patient_id,
+            "baseline",
+            patient_state_to_dict(patient_state),
+            patient_state.current_time,
+        )
+        patient_state.add_observer(self.record)
+
+    def record(
+        self,
+        patient_id: str,
+        kind: str,
+        data: Dict,
+        at: datetime,
+        wait: bool = False,
+    ) -> int:
+        """
+        Appends one record and returns its LSN.
+
+        With wait=True, blocks until the record's batch is fsynced.
+        """
+        body = json.dumps(
+            {"pid": patient_id, "kind": kind, "at": at.isoformat(), "data": data},
+            separators=(",", ":"),
+        )
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("TransitionLog is closed")
+
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            self._pending.append(f'{{"lsn":{lsn},{body[1:]}\n')
+            self.records_since_snapshot += 1
+
+            if wait or len(self._pending) >= self.max_batch:
+                self._urgent = True
+                self._cond.notify_all()
+
+        if wait:
+            self.wait_durable(lsn)
+        return lsn
+
+    def wait_durable(self, lsn: int):
+        with self._cond:
+            while self._durable_lsn < lsn and self._error is None:
+                self._urgent = True
+                self._cond.notify_all()
+                self._cond.wait()
+            if self._error is not None:
+                raise RuntimeError("WAL write failed") from self._error
+
+    def flush(self):
+        """
+        Blocks until everything recorded so far is durable.
+        """
+        with self._cond:
+            target = self._next_lsn - 1
+        self.wait_durable(target)
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        with self._io_lock:
+            self._segment.close()
+
+    # -----------------------------
+    # Flusher thread
+    # -----------------------------
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._urgent or self._closed,
+                    timeout=self.flush_interval,
+                )
+                batch, self._pending = self._pending, []
+                self._urgent = False
+                closed = self._closed
+                last_lsn = self._next_lsn - 1
+
+            if batch:
+                try:
+                    self._write_batch(batch, last_lsn)
+                except BaseException as exc:
+                    with self._cond:
+                        self._error = exc
+                        self._cond.notify_all()
+                    return
+
+                with self._cond:
+                    self._durable_lsn = last_lsn
+                    self._cond.notify_all()
+
+            if closed and not batch:
+                return
+
+    def _write_batch(self, batch: List[str], last_lsn: int):
+        with self._io_lock:
+            self._segment.write("".join(batch))
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            self._written_lsn = last_lsn
+            self.batches_written += 1
+
+    # -----------------------------
+    # Segments
+    # -----------------------------
+    def _open_segment(self, first_lsn: int):
+        path = self.wal_dir / f"{SEGMENT_PREFIX}{first_lsn:016d}.log"
+        handle = path.open("a", encoding="utf-8")
+        _fsync_dir(self.wal_dir)
+        return handle
+
+    def _last_lsn_on_disk(self) -> int:
+        last = 0
+        snapshots = _numbered(self.snapshot_dir, SNAPSHOT_PREFIX)
+        if snapshots:
+            last = snapshots[-1][0]
+
+        for _, path in reversed(_numbered(self.wal_dir, SEGMENT_PREFIX)):
+            records = list(iter_segment(path))
+            if records:
+                return max(last, records[-1]["lsn"])
+        return last
+
+    # -----------------------------
+    # Snapshots / compaction
+    # -----------------------------
+    def maybe_compact(self) -> Optional[Path]:
+        if self.records_since_snapshot < self.snapshot_every:
+            return None
+        with self._compact_lock:
+            # Another caller may have compacted while we waited
+            if self.records_since_snapshot < self.snapshot_every:
+                return None
+            return self._compact()
+
+    def compact(self) -> Optional[Path]:
+        """
+        Seals the current segment and folds all sealed segments into a
+        new snapshot. Returns the snapshot path (None if nothing new).
+        """
+        with self._compact_lock:
+            return self._compact()
+
+    def _compact(self) -> Optional[Path]:
+        self.flush()
+
+        with self._io_lock:
+            sealed_lsn = self._written_lsn
+            self._segment.close()
+            self._segment = self._open_segment(sealed_lsn + 1)
+        with self._cond:
+            self.records_since_snapshot = 0
+
+        snapshots = _numbered(self.snapshot_dir, SNAPSHOT_PREFIX)
+        base_lsn, states, max_at = 0, {}, None
+        if snapshots:
+            header, states = read_snapshot(snapshots[-1][1])
+            base_lsn = header["lsn"]
+            max_at = header["max_at"]
+
+        if sealed_lsn <= base_lsn:
+            return None
+
+        for record in iter_wal(self.wal_dir, after_lsn=base_lsn):
+            if record["lsn"] > sealed_lsn:
+                break
+            apply_record(states, record)
+            if max_at is None or record["at"] > max_at:
+                max_at = record["at"]
+
+        path = self._write_snapshot(sealed_lsn, max_at, states)
+        self._apply_retention()
+        return path
+
+    def _write_snapshot(self, lsn: int, max_at: Optional[str], states: Dict[str, PatientState]) -> Path:
+        path = self.snapshot_dir / f"{SNAPSHOT_PREFIX}{lsn:016d}.jsonl"
+        tmp = path.with_suffix(".tmp")
+
+        with tmp.open("w", encoding="utf-8") as handle:
+            handle.write(json.dumps({"lsn": lsn, "max_at": max_at}) + "\n")
+            for patient_state in states.values():
+                handle.write(json.dumps(patient_state_to_dict(patient_state)) + "\n")
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+
+        os.replace(tmp, path)
+        _fsync_dir(self.snapshot_dir)
+        return path
+
+    def _apply_retention(self):
+        snapshots = _numbered(self.snapshot_dir, SNAPSHOT_PREFIX)
+        for _, path in snapshots[:-self.keep_snapshots]:
+            path.unlink()
+
+        oldest_kept = snapshots[-self.keep_snapshots:][0][0]
+
+        # A segment ends where the next one begins
+        segments = _numbered(self.wal_dir, SEGMENT_PREFIX)
+        for (_, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first - 1 <= oldest_kept:
+                path.unlink()
+
+    # -----------------------------
+    # Async
+    # -----------------------------
+    async def aflush(self):
+        """
+        Async `flush`: waits in a worker thread, under the persistence limit.
+        """
+        async with resource_limits.limit(PERSISTENCE):
+            await asyncio.to_thread(self.flush)
+
+    async def amaybe_compact(self) -> Optional[Path]:
+        if self.records_since_snapshot < self.snapshot_every:
+            return None
+        async with resource_limits.limit(PERSISTENCE):
+            return await asyncio.to_thread(self.maybe_compact)
+
+    # -----------------------------
+    # Recovery
+    # -----------------------------
+    def recover(self, archive=None) -> Dict[str, PatientState]:
+        self.flush()
+        return recover_states(self.wal_dir, self.snapshot_dir, archive=archive)
+
+    def rebuild_patient(self, patient_id: str, **bounds) -> Optional[PatientState]:
+        self.flush()
+        return rebuild_patient(patient_id, self.wal_dir, self.snapshot_dir, **bounds)
+
+
+def transition_log_from_settings() -> Optional[TransitionLog]:
+    if not get_settings().wal_enabled:
+        return None
+    return TransitionLog()
+
+
+# -------------------------------------------------------------------
+# REPLAY CLI
+# -------------------------------------------------------------------
+
+def main():
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(
+        description="Rebuild a patient's state from the write-ahead log."
+    )
+    parser.add_argument("patient_id")
+    parser.add_argument("--until-lsn", type=int)
+    parser.add_argument("--until-time", type=datetime.fromisoformat)
+    parser.add_argument("--wal-dir", type=Path, default=settings.wal_dir)
+    parser.add_argument("--snapshot-dir", type=Path, default=settings.snapshot_dir)
+    args = parser.parse_args()
+
+    try:
+        patient_state = rebuild_patient(
+            args.patient_id,
+            args.wal_dir,
+            args.snapshot_dir,
+            until_lsn=args.until_lsn,
+            until_time=args.until_time,
+        )
+    except HistoryNotRetainedError as exc:
+        print(exc)
+        return
+
+    if patient_state is None:
+        print(f"No records for patient {args.patient_id}")
+        return
+
+    print(json.dumps(patient_state_to_dict(patient_state), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+http_server.py
+
+Local HTTP/1.1 front end for JourneyService, built on asyncio streams
+(standard library only, no web framework).
+
+Routes (JSON in, JSON out):
+- POST /patients          {"patient_id"}   (starts at NEW_PATIENT)
+- GET  /patients/<id>
+- POST /events            {"patient_id", "kind": "completed", "event_id"}
+                          {"patient_id", "kind": "clock", "minutes"}
+- POST /steps             {"patient_id"}
+- GET  /health
+- GET  /metrics
+
+Connections are kept alive; requests on one connection are answered
+in order.
+
+Run:
+    python -m app.service.http_server [--host H] [--port P] [--verbose]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.service.journey_service import (
+    EVENT,
+    GET,
+    JourneyService,
+    REGISTER,
+    STEP,
+    ServiceError,
+)
+
+
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# (method, path) → service operation; patient_id comes from the body
+BODY_ROUTES = {
+    ("POST", "/patients"): REGISTER,
+    ("POST", "/events"): EVENT,
+    ("POST", "/steps"): STEP,
+}
+
+
+class BadRequest(Exception):
+    """
+    The request cannot be framed; answered with `status` (400 by
+    default) and the connection is closed.
+    """
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _response(status: int, body: Dict, keep_alive: bool) -> bytes:
+    payload = json.dumps(body, default=str).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        f"\r\n"
+    )
+    return head.encode() + payload
+
+
+class JourneyHTTPServer:
+    def __init__(
+        self,
+        service: Optional[JourneyService] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+    ):
+        settings = get_settings()
+        self.service = service or JourneyService()
+        self.host = host or settings.service_host
+        self.port = settings.service_port if port is None else port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """
+        Starts the service and the listener. Returns the bound port
+        (useful with port=0).
+        """
+        await self.service.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"[JourneyHTTPServer] Listening on http://{self.host}:{self.port}")
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.service.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    # -----------------------------
+    # Connection handling
+    # -----------------------------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as exc:
+                    writer.write(_response(exc.status, {"error": str(exc)}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+
+                status, payload = await self._route(method, path, body)
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes, bool]]:
+        line = await reader.readline()
+        if not line:
+            return None
+
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise BadRequest("Malformed request line")
+        method, path, version = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        raw_length = headers.get("content-length", "0")
+        # ASCII digits only: str.isdigit() also accepts e.g. "²"
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            raise BadRequest(f"Invalid Content-Length: {raw_length!r}")
+        length = int(raw_length)
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(f"Request body exceeds {MAX_BODY_BYTES} bytes", status=413)
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, path.split("?", 1)[0], body, keep_alive
+
+    # -----------------------------
+    # Routing
+    # -----------------------------
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        try:
+            if path == "/health" and method == "GET":
+                return 200, self.service.health()
+
+            if path == "/metrics" and method == "GET":
+                return 200, self.service.metrics.to_dict()
+
+            if path.startswith("/patients/") and method == "GET":
+                return 200, await self.service.submit(GET, path[len("/patients/"):])
+
+            op = BODY_ROUTES.get((method, path))
+            if op is None:
+                known = {p for _, p in BODY_ROUTES} | {"/health", "/metrics"}
+                if path in known or path.startswith("/patients/"):
+                    raise ServiceError(405, f"{method} not allowed on {path}")
+                raise ServiceError(404, f"No route for {path}")
+
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise ServiceError(400, "Body is not valid JSON")
+            if not isinstance(payload, dict):
+                raise ServiceError(400, "Body must be a JSON object")
+
+            patient_id = str(payload.pop("patient_id", "") or "")
+            return 200, await self.service.submit(op, patient_id, payload)
+
+        except ServiceError as exc:
+            return exc.status, {"error": exc.message}
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+
+def main(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Patient journey HTTP service")
+    parser.add_argument("--host", default=settings.service_host)
+    parser.add_argument("--port", type=int, default=settings.service_port)
+    parser.add_argument(
+        "--verbose", action="store_true",
+        help="keep per-step agent logging (slow under load)",
+    )
+    args = parser.parse_args(argv)
+
+    server = JourneyHTTPServer(host=args.host, port=args.port)
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            # Agents log every step; keep only this line under load
+            print(f"[JourneyHTTPServer] Serving on http://{args.host}:{args.port} (agent logging off)")
+            sink = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(sink))
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
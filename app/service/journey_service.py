@@ -0,0 +1,454 @@
+"""
+journey_service.py
+
+Request orchestration behind the local HTTP service (see http_server.py).
+
+Upstream systems send patient requests one at a time. The service:
+- queues them and cuts MICRO-BATCHES every `batch_window_ms`
+  (or sooner, once `max_batch` requests are waiting)
+- groups each batch by patient, keeping arrival order
+- runs every patient group on the shared compiled async graph
+  (JourneyRunner), at most settings.worker_concurrency at a time
+- serialises each patient: a group starts only after that patient's
+  previous group finished, so per-patient order holds across batches
+
+Within one group, adjacent "step" requests (no event in between)
+share a single graph run: a run already continues until the journey
+stops, so the second run would only repeat the first.
+
+Operations:
+- "register": create a PatientState at NEW_PATIENT
+- "event":    upstream event ("completed" event, or "clock" advance)
+- "step":     run the journey graph
+- "get":      read the patient snapshot (ordered like writes)
+
+IMPORTANT:
+- In-memory patient store; durability comes from the runner's
+  optional write-ahead log
+- Latencies are measured from enqueue to result
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Deque, Dict, List, Optional
+
+from app.config.settings import get_settings
+from app.core.concurrency import WORKER, resource_limits
+from app.core.state import PatientState, PatientJourneyState, EventStatus
+from app.core.validator import validate_transition
+from app.agents.scheduling_agent import STATE_EVENT_TYPES
+from app.memory.history_archive import history_tiering_from_settings
+from app.memory.transition_log import transition_log_from_settings
+from app.tools.persistence_tools import patient_state_to_dict
+from app.workflows import patient_journey_graph
+from app.workflows.journey_runner import JourneyRunner, profiler_from_settings
+
+
+REGISTER = "register"
+EVENT = "event"
+STEP = "step"
+GET = "get"
+OPERATIONS = (REGISTER, EVENT, STEP, GET)
+
+# A completed event moves the journey out of its scheduled state
+EVENT_COMPLETES = {
+    PatientJourneyState.APPOINTMENT_SCHEDULED: PatientJourneyState.APPOINTMENT_COMPLETED,
+    PatientJourneyState.LAB_TEST_SCHEDULED: PatientJourneyState.LAB_TEST_COMPLETED,
+    PatientJourneyState.FOLLOW_UP_SCHEDULED: PatientJourneyState.FOLLOW_UP_COMPLETED,
+}
+
+
+class ServiceError(Exception):
+    """
+    A request the service rejects; `status` is the HTTP status code.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class ServiceRequest:
+    op: str
+    patient_id: str
+    payload: Dict
+    future: asyncio.Future
+    received: float = field(default_factory=time.perf_counter)
+
+
+# -------------------------------------------------------------------
+# METRICS
+# -------------------------------------------------------------------
+
+class LatencyWindow:
+    """
+    The most recent `size` latencies (milliseconds) for percentiles.
+    """
+
+    def __init__(self, size: int = 10000):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, latency_ms: float):
+        self.samples.append(latency_ms)
+        self.count += 1
+
+    def percentiles(self, points=(50, 90, 99)) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            f"p{p}": round(ordered[min(last, int(round(p / 100 * last)))], 3)
+            for p in points
+        }
+
+
+@dataclass
+class ServiceMetrics:
+    requests: int = 0
+    errors: int = 0
+    rejected: int = 0
+    batches: int = 0
+    batched_requests: int = 0
+    graph_runs: int = 0
+    coalesced_steps: int = 0
+    latency: Dict[str, LatencyWindow] = field(
+        default_factory=lambda: {op: LatencyWindow() for op in OPERATIONS}
+    )
+    overall: LatencyWindow = field(default_factory=LatencyWindow)
+
+    def observe(self, op: str, latency_ms: float):
+        self.latency[op].add(latency_ms)
+        self.overall.add(latency_ms)
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "mean_batch_size": (
+                self.batched_requests / self.batches if self.batches else 0.0
+            ),
+            "graph_runs": self.graph_runs,
+            "coalesced_steps": self.coalesced_steps,
+            "latency_ms": self.overall.percentiles(),
+            "latency_ms_by_op": {
+                op: window.percentiles()
+                for op, window in self.latency.items()
+                if window.count
+            },
+        }
+
+
+# -------------------------------------------------------------------
+# SERVICE
+# -------------------------------------------------------------------
+
+class JourneyService:
+    def __init__(
+        self,
+        runner: Optional[JourneyRunner] = None,
+        batch_window_ms: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        p99_target_ms: Optional[float] = None,
+    ):
+        settings = get_settings()
+        self.runner = runner or JourneyRunner(
+            profiler=profiler_from_settings(),
+            transition_log=transition_log_from_settings(),
+            tiering=history_tiering_from_settings(),
+        )
+        self.batch_window = (
+            settings.service_batch_window_ms if batch_window_ms is None else batch_window_ms
+        ) / 1000
+        self.max_batch = max_batch or settings.service_max_batch
+        self.max_pending = max_pending or settings.service_max_pending
+        self.p99_target_ms = p99_target_ms or settings.service_p99_target_ms
+
+        self.patients: Dict[str, PatientState] = {}
+        self.metrics = ServiceMetrics()
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        # Last scheduled group per patient (per-key serialisation)
+        self._tails: Dict[str, asyncio.Task] = {}
+        self._in_flight = 0
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    @property
+    def running(self) -> bool:
+        return self._batcher is not None and not self._batcher.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """
+        Stops accepting work, then drains queued and running groups.
+        """
+        if self._batcher is None:
+            return
+        batcher, self._batcher = self._batcher, None
+
+        await self._queue.join()
+        batcher.cancel()
+        await asyncio.gather(batcher, return_exceptions=True)
+        if self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+        if self.runner.transition_log is not None:
+            await self.runner.transition_log.aflush()
+
+        if self.runner.profiler is not None:
+            output_dir = self.runner.profiler.export()
+            if output_dir is not None:
+                print(f"[JourneyService] Profile written to {output_dir}")
+
+        # Releases the scheduling tool pool; bookings still run inline
+        patient_journey_graph.scheduling_agent.close()
+
+    # -----------------------------
+    # Requests
+    # -----------------------------
+    async def submit(self, op: str, patient_id: str, payload: Optional[Dict] = None) -> Dict:
+        """
+        Queues one request and waits for its result.
+        Raises ServiceError for rejected or failed requests.
+        """
+        if op not in OPERATIONS:
+            raise ServiceError(400, f"Unknown operation {op!r}")
+        if not patient_id:
+            raise ServiceError(400, "patient_id is required")
+        if not self.running:
+            raise ServiceError(503, "Service is not running")
+        if self._queue.qsize() + self._in_flight >= self.max_pending:
+            self.metrics.rejected += 1
+            raise ServiceError(503, "Too many pending requests")
+
+        request = ServiceRequest(
+            op=op,
+            patient_id=patient_id,
+            payload=payload or {},
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self.metrics.requests += 1
+        self._queue.put_nowait(request)
+        return await request.future
+
+    def health(self) -> Dict:
+        p99 = self.metrics.overall.percentiles().get("p99", 0.0)
+        healthy = self.running and p99 <= self.p99_target_ms
+        return {
+            "status": "ok" if healthy else "degraded",
+            "running": self.running,
+            "patients": len(self.patients),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self._in_flight,
+            "p99_ms": p99,
+            "p99_target_ms": self.p99_target_ms,
+        }
+
+    # -----------------------------
+    # Micro-batching
+    # -----------------------------
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[ServiceRequest]):
+        self.metrics.batches += 1
+        self.metrics.batched_requests += len(batch)
+        self._in_flight += len(batch)
+
+        groups: Dict[str, List[ServiceRequest]] = {}
+        for request in batch:
+            groups.setdefault(request.patient_id, []).append(request)
+
+        for patient_id, requests in groups.items():
+            previous = self._tails.get(patient_id)
+            task = asyncio.create_task(self._run_group(patient_id, requests, previous))
+            self._tails[patient_id] = task
+            task.add_done_callback(
+                lambda done, key=patient_id: self._release_tail(key, done)
+            )
+
+        for _ in batch:
+            self._queue.task_done()
+
+    def _release_tail(self, patient_id: str, task: asyncio.Task):
+        if self._tails.get(patient_id) is task:
+            del self._tails[patient_id]
+
+    async def _run_group(
+        self,
+        patient_id: str,
+        requests: List[ServiceRequest],
+        previous: Optional[asyncio.Task],
+    ):
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        async with resource_limits.limit(WORKER):
+            index = 0
+            while index < len(requests):
+                request = requests[index]
+
+                # Adjacent steps share one graph run
+                end = index + 1
+                if request.op == STEP:
+                    while end < len(requests) and requests[end].op == STEP:
+                        end += 1
+                    self.metrics.coalesced_steps += end - index - 1
+
+                try:
+                    result = await self._execute(request)
+                except ServiceError as exc:
+                    self._finish(requests[index:end], error=exc)
+                except Exception as exc:
+                    self._finish(
+                        requests[index:end],
+                        error=ServiceError(500, f"{type(exc).__name__}: {exc}"),
+                    )
+                else:
+                    self._finish(requests[index:end], result=result)
+                index = end
+
+    def _finish(self, requests: List[ServiceRequest], result=None, error=None):
+        now = time.perf_counter()
+        self._in_flight -= len(requests)
+        for request in requests:
+            if error is not None:
+                self.metrics.errors += 1
+            self.metrics.observe(request.op, (now - request.received) * 1000)
+            if request.future.done():
+                continue  # client went away
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+
+    # -----------------------------
+    # Operations
+    # -----------------------------
+    async def _execute(self, request: ServiceRequest) -> Dict:
+        if request.op == REGISTER:
+            return self._register(request.patient_id, request.payload)
+
+        patient_state = self.patients.get(request.patient_id)
+        if patient_state is None:
+            raise ServiceError(404, f"Unknown patient {request.patient_id}")
+
+        if request.op == EVENT:
+            self._apply_event(patient_state, request.payload)
+            return self._snapshot(patient_state)
+
+        if request.op == STEP:
+            before = patient_state.transition_count
+            result = await self.runner.arun(patient_state)
+            self.metrics.graph_runs += 1
+
+            response = self._snapshot(patient_state)
+            response["new_transitions"] = patient_state.transition_count - before
+            outcome = result.get("outcome")
+            if outcome is not None:
+                response["outcome"] = {"status": outcome.status, "reason": outcome.reason}
+            return response
+
+        return self._snapshot(patient_state, full=True)
+
+    def _register(self, patient_id: str, payload: Dict) -> Dict:
+        if patient_id in self.patients:
+            raise ServiceError(409, f"Patient {patient_id} already registered")
+
+        # A later state would have no history behind it; journeys only
+        # advance through validated transitions
+        requested = payload.get("current_state", PatientJourneyState.NEW_PATIENT.value)
+        if requested != PatientJourneyState.NEW_PATIENT.value:
+            raise ServiceError(
+                400,
+                f"Patients are registered at {PatientJourneyState.NEW_PATIENT.value}, "
+                f"not {requested!r}",
+            )
+
+        patient_state = PatientState(patient_id=patient_id)
+        self.patients[patient_id] = patient_state
+        return self._snapshot(patient_state)
+
+    def _apply_event(self, patient_state: PatientState, payload: Dict):
+        kind = payload.get("kind")
+
+        if kind == "clock":
+            minutes = payload.get("minutes")
+            if not isinstance(minutes, (int, float)) or minutes < 0:
+                raise ServiceError(400, "clock events need minutes >= 0")
+            patient_state.advance_time(timedelta(minutes=minutes))
+            return
+
+        if kind == "completed":
+            event_id = payload.get("event_id")
+            event = next(
+                (e for e in patient_state.events if e.event_id == event_id), None
+            )
+            if event is None:
+                raise ServiceError(404, f"Unknown event {event_id!r}")
+            if event.status != EventStatus.SCHEDULED:
+                raise ServiceError(409, f"Event {event_id} is already {event.status.value}")
+
+            # Only the event behind the current scheduled state completes it
+            current = patient_state.current_state
+            if event.event_type != STATE_EVENT_TYPES.get(current):
+                raise ServiceError(
+                    409, f"{event.event_type} event {event_id} does not complete {current.value}"
+                )
+
+            # Validate before mutating, so a rejected request changes nothing
+            to_state = EVENT_COMPLETES[current]
+            allowed, reason = validate_transition(
+                patient_state, to_state, requested_by="EventIngest"
+            )
+            if not allowed:
+                raise ServiceError(409, reason)
+
+            patient_state.set_event_status(event, EventStatus.COMPLETED)
+            patient_state.apply_transition(to_state=to_state, by="EventIngest")
+            return
+
+        raise ServiceError(400, f"Unknown event kind {kind!r}")
+
+    @staticmethod
+    def _snapshot(patient_state: PatientState, full: bool = False) -> Dict:
+        if full:
+            return patient_state_to_dict(patient_state)
+        return {
+            "patient_id": patient_state.patient_id,
+            "current_state": patient_state.current_state.value,
+            "current_time": patient_state.current_time.isoformat(),
+            "signals": sorted(k for k, v in patient_state.signals.items() if v),
+            "transitions": patient_state.transition_count,
+        }
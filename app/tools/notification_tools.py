@@ -4,9 +4,15 @@ notification_tools.py
 Mock notification tools used by ReminderAgent.
 These simulate external side effects like email/SMS/calls.
 
+Async variants (`asend_*`) respect the notification concurrency
+limit, so a journey can send all of its notifications at once.
+
 NO real integrations here.
 """
 
+from app.core.concurrency import NOTIFICATION, resource_limits
+
+
 def send_reminder(patient_id: str, event_type: str, event_id: str):
     """
     Simulate sending a reminder notification.
@@ -25,3 +31,13 @@ def send_missed_alert(patient_id: str, event_type: str, event_id: str):
         f"[NotificationTool] MISSED alert for patient {patient_id} "
         f"for {event_type} (event_id={event_id})"
     )
+
+
+async def asend_reminder(patient_id: str, event_type: str, event_id: str):
+    async with resource_limits.limit(NOTIFICATION):
+        send_reminder(patient_id, event_type, event_id)
+
+
+async def asend_missed_alert(patient_id: str, event_type: str, event_id: str):
+    async with resource_limits.limit(NOTIFICATION):
+        send_missed_alert(patient_id, event_type, event_id)
@@ -0,0 +1,132 @@
+"""
+persistence_tools.py
+
+Local persistence helpers for PatientState.
+
+Patient states are stored as JSON Lines (one patient per line), so
+large cohorts can be written and read back as a stream.
+
+NO external databases here.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+from app.core.state import (
+    PatientState,
+    PatientJourneyState,
+    PatientEvent,
+    EventStatus,
+    StateTransition,
+)
+
+
+# -------------------------------------------------------------------
+# SERIALIZATION
+# -------------------------------------------------------------------
+
+def transition_to_row(t: StateTransition) -> List:
+    return [t.from_state.value, t.to_state.value, t.by, t.at.isoformat()]
+
+
+def transition_from_row(row: List) -> StateTransition:
+    from_state, to_state, by, at = row
+    return StateTransition(
+        from_state=PatientJourneyState(from_state),
+        to_state=PatientJourneyState(to_state),
+        by=by,
+        at=datetime.fromisoformat(at),
+    )
+
+
+def event_to_row(e: PatientEvent) -> List:
+    return [
+        e.event_id,
+        e.event_type,
+        e.scheduled_time.isoformat(),
+        e.status.value,
+        e.attempt,
+        e.resource_id,
+    ]
+
+
+def event_from_row(row: List) -> PatientEvent:
+    event_id, event_type, scheduled_time, status, attempt, resource_id = row
+    return PatientEvent(
+        event_id=event_id,
+        event_type=event_type,
+        scheduled_time=datetime.fromisoformat(scheduled_time),
+        status=EventStatus(status),
+        attempt=attempt,
+        resource_id=resource_id,
+    )
+
+
+def patient_state_to_dict(patient_state: PatientState) -> Dict:
+    return {
+        "patient_id": patient_state.patient_id,
+        "current_state": patient_state.current_state.value,
+        "current_time": patient_state.current_time.isoformat(),
+        "history": [transition_to_row(t) for t in patient_state.history],
+        "events": [event_to_row(e) for e in patient_state.events],
+        "signals": dict(patient_state.signals),
+        "retry_counts": dict(patient_state.retry_counts),
+        "completed_mask": patient_state.completed_mask,
+        "archived_transitions": patient_state.archived_transitions,
+        "archived_events": patient_state.archived_events,
+    }
+
+
+def patient_state_from_dict(data: Dict, archive=None) -> PatientState:
+    """
+    archive:
+    HistoryArchive holding the patient's archived entries (see
+    app/memory/history_archive.py); needed for full_history() /
+    full_events() when the archived counts are nonzero.
+    """
+    return PatientState(
+        patient_id=data["patient_id"],
+        current_state=PatientJourneyState(data["current_state"]),
+        current_time=datetime.fromisoformat(data["current_time"]),
+        history=[transition_from_row(row) for row in data.get("history", [])],
+        events=[event_from_row(row) for row in data.get("events", [])],
+        signals=dict(data.get("signals", {})),
+        retry_counts=dict(data.get("retry_counts", {})),
+        completed_mask=data.get("completed_mask", 0),
+        archived_transitions=data.get("archived_transitions", 0),
+        archived_events=data.get("archived_events", 0),
+        archive=archive,
+    )
+
+
+# -------------------------------------------------------------------
+# JSONL STORE
+# -------------------------------------------------------------------
+
+def write_states_jsonl(states: Iterable[PatientState], path) -> int:
+    """
+    Writes patient states one per line. Returns the number written.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    count = 0
+    with path.open("w", encoding="utf-8") as handle:
+        for patient_state in states:
+            handle.write(json.dumps(patient_state_to_dict(patient_state)))
+            handle.write("\n")
+            count += 1
+    return count
+
+
+def iter_states_jsonl(path, archive=None) -> Iterator[PatientState]:
+    """
+    Streams patient states back from a JSONL file, reattaching
+    `archive` (see patient_state_from_dict).
+    """
+    with Path(path).open(encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield patient_state_from_dict(json.loads(line), archive=archive)
@@ -0,0 +1,485 @@
+"""
+scheduling_tools.py
+
+Capacity-aware slot allocation used by SchedulingAgent.
+
+Each resource (doctor, lab, ...) owns a calendar made of one bitmap
+per working day: bit i set means slot i of that day is booked.
+Finding a free run of n slots is a handful of integer operations,
+so allocating large cohorts stays fast without any external service.
+
+NO real integrations here.
+"""
+
+import heapq
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+
+# -------------------------------------------------------------------
+# DATA TYPES
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SlotRequest:
+    kind: str
+    earliest: datetime
+    duration_minutes: int = 30
+
+
+@dataclass(frozen=True)
+class SlotAssignment:
+    resource_id: str
+    kind: str
+    start: datetime
+    end: datetime
+
+
+FIRST_FIT = "first_fit"
+EARLIEST_FIT = "earliest_fit"
+
+
+# -------------------------------------------------------------------
+# RESOURCE CALENDAR
+# -------------------------------------------------------------------
+
+class ResourceCalendar:
+    """
+    Slot calendar for a single resource.
+
+    Days are created lazily, so the calendar has no fixed horizon.
+    """
+
+    def __init__(
+        self,
+        resource_id: str,
+        kind: str,
+        day_start: time = time(9, 0),
+        day_end: time = time(17, 0),
+        slot_minutes: int = 15,
+        workdays: Tuple[int, ...] = (0, 1, 2, 3, 4),
+    ):
+        self.resource_id = resource_id
+        self.kind = kind
+        self.day_start = day_start
+        self.opens_at = day_start.hour * 60 + day_start.minute
+        self.slot_minutes = slot_minutes
+        self.workdays = set(workdays)
+
+        day_minutes = (
+            (day_end.hour * 60 + day_end.minute)
+            - (day_start.hour * 60 + day_start.minute)
+        )
+        self.slots_per_day = day_minutes // slot_minutes
+        self._full_mask = (1 << self.slots_per_day) - 1
+
+        self._busy: Dict[date, int] = {}
+        self._full_days: Set[date] = set()
+
+    # -----------------------------
+    # Slot <-> time conversion
+    # -----------------------------
+    def slot_start(self, day: date, slot: int) -> datetime:
+        return datetime.combine(day, self.day_start) + timedelta(
+            minutes=slot * self.slot_minutes
+        )
+
+    def first_slot_at_or_after(self, moment: datetime, day: date) -> int:
+        if day > moment.date():
+            return 0
+        opening = datetime.combine(day, self.day_start)
+        if moment <= opening:
+            return 0
+        minutes = (moment - opening).total_seconds() / 60
+        return -int(-minutes // self.slot_minutes)  # ceil
+
+    def slots_for(self, duration_minutes: int) -> int:
+        return max(1, -(-duration_minutes // self.slot_minutes))
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def busy_mask(self, day: date) -> int:
+        return self._busy.get(day, 0)
+
+    def is_open(self, day: date) -> bool:
+        return day.weekday() in self.workdays and day not in self._full_days
+
+    def find_in_day(self, day: date, from_slot: int, n_slots: int) -> Optional[int]:
+        """
+        Returns the first slot index >= from_slot starting a free run
+        of `n_slots`, or None.
+        """
+        if from_slot + n_slots > self.slots_per_day:
+            return None
+
+        free = ~self._busy.get(day, 0) & self._full_mask
+
+        # Bit i survives only if slots i .. i+n-1 are all free
+        runs = free
+        for shift in range(1, n_slots):
+            runs &= free >> shift
+        runs &= self._full_mask >> (n_slots - 1)
+        runs &= ~((1 << from_slot) - 1)
+
+        if not runs:
+            return None
+        return (runs & -runs).bit_length() - 1
+
+    # -----------------------------
+    # Mutation
+    # -----------------------------
+    def book(self, day: date, slot: int, n_slots: int):
+        mask = ((1 << n_slots) - 1) << slot
+        busy = self._busy.get(day, 0)
+        if busy & mask:
+            raise ValueError(
+                f"Slot {slot} on {day} already booked for {self.resource_id}"
+            )
+        busy |= mask
+        self._busy[day] = busy
+        if busy == self._full_mask:
+            self._full_days.add(day)
+
+    def release(self, day: date, slot: int, n_slots: int):
+        mask = ((1 << n_slots) - 1) << slot
+        self._busy[day] = self._busy.get(day, 0) & ~mask
+        self._full_days.discard(day)
+
+    def utilisation(self, day: date) -> float:
+        return bin(self._busy.get(day, 0)).count("1") / self.slots_per_day
+
+
+# -------------------------------------------------------------------
+# SLOT ALLOCATOR
+# -------------------------------------------------------------------
+
+class _DeadDays:
+    """
+    Union-find over day ordinals.
+
+    find(d) returns the first day >= d not yet known to be unusable,
+    skipping runs of full days in amortised O(1).
+    """
+
+    def __init__(self):
+        self._next: Dict[int, int] = {}
+
+    def find(self, day: int) -> int:
+        root = day
+        while root in self._next:
+            root = self._next[root]
+        while day != root:
+            self._next[day], day = root, self._next[day]
+        return root
+
+    def kill(self, day: int):
+        self._next[day] = day + 1
+
+
+class SlotAllocator:
+    """
+    Allocates slots across all calendars of a resource kind.
+
+    Strategies:
+    - first_fit:    first resource (in registration order) with a slot
+                    on the earliest day that has any capacity
+    - earliest_fit: earliest slot start across all resources
+
+    earliest_fit keeps, per (kind, duration, day), a min-heap of each
+    resource's earliest free start, so a request costs O(log resources)
+    instead of a scan over every calendar.
+    """
+
+    def __init__(self, max_days_ahead: int = 60, strategy: str = EARLIEST_FIT):
+        self.max_days_ahead = max_days_ahead
+        self.strategy = strategy
+        self._calendars: Dict[str, List[ResourceCalendar]] = {}
+        self._workdays: Dict[str, Set[int]] = {}
+
+        # (kind, duration_minutes) → days where that duration fits nowhere
+        self._dead: Dict[Tuple[str, int], _DeadDays] = {}
+
+        # (kind, duration_minutes, day ordinal) → heap of
+        # (start minute, calendar index, busy mask it was computed from)
+        self._free: Dict[Tuple[str, int, int], List[Tuple[int, int, int]]] = {}
+
+    def add_resource(self, calendar: ResourceCalendar):
+        self._calendars.setdefault(calendar.kind, []).append(calendar)
+        self._workdays.setdefault(calendar.kind, set()).update(calendar.workdays)
+        self._forget_dead_days(calendar.kind)
+
+    def calendars(self, kind: str) -> List[ResourceCalendar]:
+        return self._calendars.get(kind, [])
+
+    # -----------------------------
+    # Dead-day bookkeeping
+    # -----------------------------
+    def _dead_days(self, kind: str, duration: int) -> _DeadDays:
+        key = (kind, duration)
+        if key not in self._dead:
+            self._dead[key] = _DeadDays()
+        return self._dead[key]
+
+    def _kill_day(self, kind: str, duration: int, day: int):
+        # If a run does not fit, no longer run fits either
+        for (k, d), dead in self._dead.items():
+            if k == kind and d >= duration:
+                dead.kill(day)
+        self._free.pop((kind, duration, day), None)
+
+    def _forget_dead_days(self, kind: str):
+        for key in [k for k in self._dead if k[0] == kind]:
+            del self._dead[key]
+        for key in [k for k in self._free if k[0] == kind]:
+            del self._free[key]
+
+    # -----------------------------
+    # Earliest-free index
+    # -----------------------------
+    @staticmethod
+    def _free_entry(calendar: ResourceCalendar, index: int, day: date, n_slots: int):
+        slot = calendar.find_in_day(day, 0, n_slots)
+        if slot is None:
+            return None
+        start_minute = calendar.opens_at + slot * calendar.slot_minutes
+        return start_minute, index, calendar.busy_mask(day)
+
+    def _earliest_free(
+        self,
+        kind: str,
+        duration: int,
+        day: date,
+        calendars: List[ResourceCalendar],
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Returns (start minute, calendar index) of the earliest free run
+        of `duration` on `day` across `calendars`, or None.
+
+        Bookings only ever push a calendar's earliest start later, so
+        stale entries are refreshed lazily when they reach the top.
+        Releases drop the index (see release).
+        """
+        key = (kind, duration, day.toordinal())
+        heap = self._free.get(key)
+        if heap is None:
+            heap = []
+            for index, calendar in enumerate(calendars):
+                if calendar.is_open(day):
+                    entry = self._free_entry(calendar, index, day, calendar.slots_for(duration))
+                    if entry is not None:
+                        heap.append(entry)
+            heapq.heapify(heap)
+            self._free[key] = heap
+
+        while heap:
+            start_minute, index, busy = heap[0]
+            calendar = calendars[index]
+            if calendar.busy_mask(day) == busy:
+                return start_minute, index
+
+            heapq.heappop(heap)
+            if calendar.is_open(day):
+                entry = self._free_entry(calendar, index, day, calendar.slots_for(duration))
+                if entry is not None:
+                    heapq.heappush(heap, entry)
+        return None
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def find_slot(
+        self,
+        request: SlotRequest,
+        strategy: Optional[str] = None,
+    ) -> Optional[Tuple[ResourceCalendar, date, int, int]]:
+        """
+        Returns (calendar, day, slot, n_slots) without booking it.
+        """
+        strategy = strategy or self.strategy
+        calendars = self.calendars(request.kind)
+        if not calendars:
+            return None
+
+        kind = request.kind
+        duration = request.duration_minutes
+        workdays = self._workdays[kind]
+        dead = self._dead_days(kind, duration)
+
+        first_day = request.earliest.date().toordinal()
+        last_day = first_day + self.max_days_ahead
+        earliest_minute = request.earliest.hour * 60 + request.earliest.minute
+        opening_minute = min(c.opens_at for c in calendars)
+
+        day_no = first_day
+        while True:
+            day_no = dead.find(day_no)
+            if day_no > last_day:
+                return None
+
+            day = date.fromordinal(day_no)
+            if day.weekday() not in workdays:
+                dead.kill(day_no)
+                continue
+
+            # Nothing can start before this minute of the day
+            floor = opening_minute
+            if day_no == first_day:
+                floor = max(floor, earliest_minute)
+
+            if strategy == EARLIEST_FIT:
+                earliest = self._earliest_free(kind, duration, day, calendars)
+                if earliest is None:
+                    self._kill_day(kind, duration, day_no)
+                    day_no += 1
+                    continue
+
+                # Every resource's earliest start is at or after the
+                # floor, so the overall minimum is the answer
+                start_minute, index = earliest
+                if start_minute >= floor:
+                    calendar = calendars[index]
+                    n_slots = calendar.slots_for(duration)
+                    slot = (start_minute - calendar.opens_at) // calendar.slot_minutes
+                    return calendar, day, slot, n_slots
+
+            best = None
+            whole_day = True
+
+            for calendar in calendars:
+                if not calendar.is_open(day):
+                    continue
+
+                n_slots = calendar.slots_for(duration)
+                from_slot = calendar.first_slot_at_or_after(request.earliest, day)
+                whole_day = whole_day and from_slot == 0
+
+                slot = calendar.find_in_day(day, from_slot, n_slots)
+                if slot is None:
+                    continue
+
+                if strategy == FIRST_FIT:
+                    return calendar, day, slot, n_slots
+
+                start_minute = calendar.opens_at + slot * calendar.slot_minutes
+                if best is None or start_minute < best[0]:
+                    best = (start_minute, calendar, slot, n_slots)
+                    if start_minute <= floor:
+                        break
+
+            if best is not None:
+                _, calendar, slot, n_slots = best
+                return calendar, day, slot, n_slots
+
+            if whole_day:
+                self._kill_day(kind, duration, day_no)
+            day_no += 1
+
+    def allocate(
+        self,
+        request: SlotRequest,
+        strategy: Optional[str] = None,
+    ) -> Optional[SlotAssignment]:
+        """
+        Books the best slot for `request`, or returns None if the
+        kind has no capacity within `max_days_ahead`.
+        """
+        found = self.find_slot(request, strategy)
+        if found is None:
+            return None
+
+        calendar, day, slot, n_slots = found
+        calendar.book(day, slot, n_slots)
+
+        start = calendar.slot_start(day, slot)
+        return SlotAssignment(
+            resource_id=calendar.resource_id,
+            kind=calendar.kind,
+            start=start,
+            end=start + timedelta(minutes=n_slots * calendar.slot_minutes),
+        )
+
+    def allocate_many(
+        self,
+        requests: Iterable[SlotRequest],
+        strategy: Optional[str] = None,
+    ) -> List[Optional[SlotAssignment]]:
+        """
+        Allocates a whole cohort in one pass.
+
+        Requests are served in order of their earliest time (ties keep
+        input order); results are returned in input order.
+        """
+        requests = list(requests)
+        results: List[Optional[SlotAssignment]] = [None] * len(requests)
+
+        order = sorted(range(len(requests)), key=lambda i: requests[i].earliest)
+        for i in order:
+            results[i] = self.allocate(requests[i], strategy)
+
+        return results
+
+    def release(self, assignment: SlotAssignment):
+        for calendar in self.calendars(assignment.kind):
+            if calendar.resource_id == assignment.resource_id:
+                day = assignment.start.date()
+                slot = calendar.first_slot_at_or_after(assignment.start, day)
+                minutes = (assignment.end - assignment.start).total_seconds() / 60
+                calendar.release(day, slot, calendar.slots_for(int(minutes)))
+                # A release can move a start earlier; rebuild lazily
+                self._forget_dead_days(assignment.kind)
+                return
+
+
+# -------------------------------------------------------------------
+# DEFAULT CLINIC
+# -------------------------------------------------------------------
+
+def build_default_allocator(doctors: int = 3, labs: int = 1) -> SlotAllocator:
+    """
+    Small clinic used by the default graph and simulations.
+    """
+    allocator = SlotAllocator()
+
+    for i in range(1, doctors + 1):
+        allocator.add_resource(ResourceCalendar(f"doctor-{i}", "doctor"))
+
+    for i in range(1, labs + 1):
+        allocator.add_resource(
+            ResourceCalendar(f"lab-{i}", "lab", day_start=time(7, 0), slot_minutes=10)
+        )
+
+    return allocator
+
+
+# -------------------------------------------------------------------
+# TOOLS
+# -------------------------------------------------------------------
+
+def build_scheduling_tools(allocator: SlotAllocator) -> List[BaseTool]:
+    """
+    Exposes `allocator` as LangChain tools for a ToolExecutor.
+
+    Booking changes the calendars, so these tools are not "pure"
+    and their results are never cached.
+    """
+
+    def allocate_slot(
+        kind: str,
+        earliest: datetime,
+        duration_minutes: int = 30,
+    ) -> Optional[SlotAssignment]:
+        """
+        Books the best free slot of a resource kind at or after
+        `earliest`. Returns None if the kind has no capacity left.
+        """
+        return allocator.allocate(
+            SlotRequest(kind=kind, earliest=earliest, duration_minutes=duration_minutes)
+        )
+
+    return [
+        StructuredTool.from_function(allocate_slot, metadata={"pure": False}),
+    ]
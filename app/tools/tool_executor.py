@@ -0,0 +1,335 @@
+"""
+tool_executor.py
+
+Tool-call execution layer for LLM-backed agents.
+
+One model turn may request several tool calls. They are independent
+by construction (the model has not seen any of their results yet), so:
+- calls run concurrently (thread pool, or asyncio for `aexecute`)
+- each call gets its own timeout
+- results come back as ToolMessages in the SAME order as the calls
+- results of pure tools are cached (LRU + TTL) across turns and agents
+
+Tools are LangChain tools. Per-tool behaviour is declared in
+`tool.metadata`:
+- "pure": True      → result depends only on the arguments (cacheable)
+- "timeout": float  → seconds before the call is abandoned
+
+A failing or timed-out call becomes an error ToolMessage instead of
+raising, so the model can react to it on the next turn.
+
+Agents also call tools directly with `call`, which shares the same
+tool registry and result cache.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+from app.config.settings import get_settings
+
+
+_MISS = object()
+
+
+# -------------------------------------------------------------------
+# RESULT CACHE
+# -------------------------------------------------------------------
+
+class ToolResultCache:
+    """
+    Thread-safe LRU cache with a time-to-live, for pure tool results.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 300.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tool_name: str, args: Dict) -> Tuple[str, str]:
+        return tool_name, json.dumps(args, sort_keys=True, default=str)
+
+    def get(self, key: Tuple[str, str]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return _MISS
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[str, str], value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# -------------------------------------------------------------------
+# EXECUTOR
+# -------------------------------------------------------------------
+
+class ToolExecutor:
+    """
+    Runs the tool calls of one model turn concurrently.
+    """
+
+    def __init__(
+        self,
+        tools: Iterable,
+        max_workers: Optional[int] = None,
+        default_timeout: Optional[float] = None,
+        cache: Optional[ToolResultCache] = None,
+    ):
+        settings = get_settings()
+        self.tools = {tool.name: tool for tool in tools}
+        self.default_timeout = default_timeout or settings.tool_timeout_seconds
+        self.cache = cache or ToolResultCache(
+            max_size=settings.tool_cache_size,
+            ttl_seconds=settings.tool_cache_ttl_seconds,
+        )
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or settings.tool_concurrency,
+            thread_name_prefix="tool",
+        )
+
+    def close(self):
+        # Timed-out calls may still be running; do not wait for them
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # -----------------------------
+    # Per-tool metadata
+    # -----------------------------
+    def _meta(self, tool_name: str) -> Dict:
+        tool = self.tools.get(tool_name)
+        return (tool.metadata or {}) if tool is not None else {}
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self._meta(tool_name).get("timeout", self.default_timeout)
+
+    def is_pure(self, tool_name: str) -> bool:
+        return bool(self._meta(tool_name).get("pure"))
+
+    # -----------------------------
+    # Direct calls (from agent code)
+    # -----------------------------
+    def call(self, tool_name: str, args: Dict) -> Any:
+        """
+        Runs one tool inline and returns its raw result.
+
+        Pure results come from / go to the cache. Unlike `execute`,
+        errors propagate to the caller.
+        """
+        if tool_name not in self.tools:
+            raise KeyError(f"unknown tool {tool_name!r}")
+
+        cache_key = ToolResultCache.key(tool_name, args) if self.is_pure(tool_name) else None
+        if cache_key is not None:
+            value = self.cache.get(cache_key)
+            if value is not _MISS:
+                return value
+
+        value = self.tools[tool_name].invoke(args)
+        if cache_key is not None:
+            self.cache.put(cache_key, value)
+        return value
+
+    # -----------------------------
+    # Sync execution
+    # -----------------------------
+    def execute(self, tool_calls: List[Dict]) -> List[ToolMessage]:
+        """
+        Runs `tool_calls` (as found on AIMessage.tool_calls) and returns
+        one ToolMessage per call, in call order.
+        """
+        futures: Dict[int, Any] = {}
+        results: Dict[int, ToolMessage] = {}
+        # Identical pure calls in one turn share a single execution
+        shared: Dict[Tuple[str, str], Any] = {}
+
+        for index, call in enumerate(tool_calls):
+            early = self._precheck(call)
+            if early is not None:
+                results[index] = early
+                continue
+
+            cache_key = self._cache_key(call)
+            if cache_key is not None and cache_key in shared:
+                futures[index] = shared[cache_key]
+                continue
+
+            future = self._pool.submit(self.tools[call["name"]].invoke, call["args"])
+            futures[index] = future
+            if cache_key is not None:
+                shared[cache_key] = future
+
+        started = time.monotonic()
+        for index, future in futures.items():
+            call = tool_calls[index]
+            timeout = self.timeout_for(call["name"])
+            remaining = max(0.0, started + timeout - time.monotonic())
+
+            try:
+                value = future.result(timeout=remaining)
+            except FutureTimeout:
+                future.cancel()
+                results[index] = self._error(call, f"timed out after {timeout}s")
+                continue
+            except Exception as exc:
+                results[index] = self._error(call, f"{type(exc).__name__}: {exc}")
+                continue
+
+            results[index] = self._success(call, value)
+
+        return [results[index] for index in range(len(tool_calls))]
+
+    # -----------------------------
+    # Async execution
+    # -----------------------------
+    async def aexecute(self, tool_calls: List[Dict]) -> List[ToolMessage]:
+        """
+        Async `execute`: calls are gathered on the running loop.
+        Async-native tools run without occupying a thread.
+        """
+        shared: Dict[Tuple[str, str], asyncio.Task] = {}
+
+        async def run_one(call: Dict) -> ToolMessage:
+            early = self._precheck(call)
+            if early is not None:
+                return early
+
+            cache_key = self._cache_key(call)
+            if cache_key is not None and cache_key in shared:
+                task = shared[cache_key]
+            else:
+                task = asyncio.ensure_future(
+                    self.tools[call["name"]].ainvoke(call["args"])
+                )
+                if cache_key is not None:
+                    shared[cache_key] = task
+
+            timeout = self.timeout_for(call["name"])
+            try:
+                value = await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                task.cancel()
+                return self._error(call, f"timed out after {timeout}s")
+            except Exception as exc:
+                return self._error(call, f"{type(exc).__name__}: {exc}")
+
+            return self._success(call, value)
+
+        return list(await asyncio.gather(*(run_one(call) for call in tool_calls)))
+
+    # -----------------------------
+    # Helpers
+    # -----------------------------
+    def _cache_key(self, call: Dict) -> Optional[Tuple[str, str]]:
+        if not self.is_pure(call["name"]):
+            return None
+        return ToolResultCache.key(call["name"], call["args"])
+
+    def _precheck(self, call: Dict) -> Optional[ToolMessage]:
+        """
+        Resolves calls that need no execution: unknown tools and
+        cache hits.
+        """
+        if call["name"] not in self.tools:
+            return self._error(call, f"unknown tool {call['name']!r}")
+
+        cache_key = self._cache_key(call)
+        if cache_key is not None:
+            value = self.cache.get(cache_key)
+            if value is not _MISS:
+                return self._message(call, value)
+        return None
+
+    def _success(self, call: Dict, value: Any) -> ToolMessage:
+        cache_key = self._cache_key(call)
+        if cache_key is not None:
+            self.cache.put(cache_key, value)
+        return self._message(call, value)
+
+    @staticmethod
+    def _message(call: Dict, value: Any) -> ToolMessage:
+        content = value if isinstance(value, str) else json.dumps(value, default=str)
+        return ToolMessage(content=content, name=call["name"], tool_call_id=call["id"])
+
+    @staticmethod
+    def _error(call: Dict, reason: str) -> ToolMessage:
+        print(f"[ToolExecutor] {call['name']} failed: {reason}")
+        return ToolMessage(
+            content=f"Error: {reason}",
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+        )
+
+
+# -------------------------------------------------------------------
+# TOOL-CALLING LOOP
+# -------------------------------------------------------------------
+
+def run_tool_loop(
+    model,
+    messages: List[BaseMessage],
+    executor: ToolExecutor,
+    max_turns: int = 5,
+) -> AIMessage:
+    """
+    Invokes `model` (already bound to the executor's tools) until it
+    answers without tool calls, feeding back each turn's results in
+    call order. Returns the final AIMessage.
+
+    `messages` is extended in place with the full exchange.
+    """
+    for _ in range(max_turns):
+        response = model.invoke(messages)
+        messages.append(response)
+
+        if not response.tool_calls:
+            return response
+
+        messages.extend(executor.execute(response.tool_calls))
+
+    raise RuntimeError(f"Model still calling tools after {max_turns} turns")
+
+
+async def arun_tool_loop(
+    model,
+    messages: List[BaseMessage],
+    executor: ToolExecutor,
+    max_turns: int = 5,
+) -> AIMessage:
+    """
+    Async `run_tool_loop`.
+    """
+    for _ in range(max_turns):
+        response = await model.ainvoke(messages)
+        messages.append(response)
+
+        if not response.tool_calls:
+            return response
+
+        messages.extend(await executor.aexecute(response.tool_calls))
+
+    raise RuntimeError(f"Model still calling tools after {max_turns} turns")
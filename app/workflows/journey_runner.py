@@ -0,0 +1,175 @@
+"""
+journey_runner.py
+
+Runs patient journeys through the compiled LangGraph workflow.
+
+The runner owns:
+- the compiled graph (built once, shared by all journeys)
+- the per-journey budget (guard + recursion limit)
+- optional sampled profiling (see profiling.py)
+- optional write-ahead logging (see app/memory/transition_log.py)
+- optional history tiering (see app/memory/history_archive.py)
+
+`arun` / `arun_cohort` drive the async graph with `ainvoke`, so many
+journeys overlap their I/O (bounded by settings.worker_concurrency).
+"""
+
+import asyncio
+import itertools
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional
+
+from app.config.settings import get_settings
+from app.core.concurrency import WORKER, resource_limits
+from app.core.journey_guard import JourneyBudget, JourneyGuard
+from app.core.state import PatientState
+from app.memory.history_archive import HistoryTiering
+from app.memory.transition_log import TransitionLog
+from app.workflows.patient_journey_graph import (
+    build_patient_journey_graph,
+    journey_budget,
+)
+from app.workflows.profiling import JourneyProfiler
+
+
+def profiler_from_settings() -> Optional[JourneyProfiler]:
+    """
+    Returns a profiler when settings.profile_sample_rate > 0.
+    """
+    settings = get_settings()
+    if settings.profile_sample_rate <= 0:
+        return None
+    return JourneyProfiler(
+        sample_rate=settings.profile_sample_rate,
+        output_dir=settings.profile_dir,
+    )
+
+
+class JourneyRunner:
+    def __init__(
+        self,
+        graph=None,
+        budget: Optional[JourneyBudget] = None,
+        profiler: Optional[JourneyProfiler] = None,
+        transition_log: Optional[TransitionLog] = None,
+        async_graph=None,
+        tiering: Optional[HistoryTiering] = None,
+    ):
+        self.graph = graph or build_patient_journey_graph()
+        self._async_graph = async_graph
+        self.tiering = tiering
+        self.budget = budget or journey_budget
+        self.profiler = profiler
+        self.transition_log = transition_log
+
+    @property
+    def async_graph(self):
+        if self._async_graph is None:
+            self._async_graph = build_patient_journey_graph(use_async=True)
+        return self._async_graph
+
+    def _inputs(self, patient_state: PatientState):
+        # A stall ends the run that detected it; each new run gets a
+        # fresh guard and must not be halted by the old signal
+        patient_state.clear_signal("journey_stalled")
+        inputs = {
+            "patient_state": patient_state,
+            "guard": JourneyGuard(self.budget),
+        }
+        config = {"recursion_limit": self.budget.recursion_limit}
+        return inputs, config
+
+    def run(self, patient_state: PatientState) -> Dict:
+        """
+        Runs one journey to completion (or until the guard stops it).
+        """
+        inputs, config = self._inputs(patient_state)
+
+        if self.transition_log is not None:
+            self.transition_log.attach(patient_state)
+
+        if self.profiler is None:
+            result = self.graph.invoke(inputs, config=config)
+        else:
+            with self.profiler.capture(patient_state.patient_id) as capture:
+                result = self.graph.invoke(inputs, config=config)
+                if capture is not None:
+                    capture.final_state = result["patient_state"].current_state.value
+
+        if self.transition_log is not None:
+            self.transition_log.maybe_compact()
+
+        if self.tiering is not None:
+            self.tiering.apply(patient_state)
+
+        return result
+
+    def run_cohort(self, states: Iterable[PatientState]) -> Iterator[Dict]:
+        """
+        Runs journeys one after another, yielding each result.
+        """
+        for patient_state in states:
+            yield self.run(patient_state)
+
+        if self.transition_log is not None:
+            self.transition_log.flush()
+
+    # -----------------------------
+    # Async
+    # -----------------------------
+    async def arun(self, patient_state: PatientState) -> Dict:
+        """
+        Async `run` on the async graph.
+
+        Sampled journeys record wall time and allocations (see
+        JourneyProfiler.acapture); cProfile cannot separate
+        interleaved journeys.
+        """
+        inputs, config = self._inputs(patient_state)
+
+        if self.transition_log is not None:
+            self.transition_log.attach(patient_state)
+
+        if self.profiler is None:
+            result = await self.async_graph.ainvoke(inputs, config=config)
+        else:
+            async with self.profiler.acapture(patient_state.patient_id) as capture:
+                result = await self.async_graph.ainvoke(inputs, config=config)
+                if capture is not None:
+                    capture.final_state = result["patient_state"].current_state.value
+
+        if self.transition_log is not None:
+            await self.transition_log.amaybe_compact()
+
+        if self.tiering is not None:
+            self.tiering.apply(patient_state)
+
+        return result
+
+    async def arun_cohort(
+        self,
+        states: Iterable[PatientState],
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Runs journeys concurrently (at most settings.worker_concurrency
+        at a time), yielding results in input order.
+
+        States are consumed in batches of settings.cohort_batch_size,
+        so arbitrarily large cohorts never sit in memory at once.
+        """
+        batch_size = batch_size or get_settings().cohort_batch_size
+
+        async def run_one(patient_state: PatientState) -> Dict:
+            async with resource_limits.limit(WORKER):
+                return await self.arun(patient_state)
+
+        states = iter(states)
+        while True:
+            batch = list(itertools.islice(states, batch_size))
+            if not batch:
+                break
+            for result in await asyncio.gather(*(run_one(s) for s in batch)):
+                yield result
+
+        if self.transition_log is not None:
+            await self.transition_log.aflush()
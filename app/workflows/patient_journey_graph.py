@@ -7,14 +7,21 @@ Core principles:
 - Nodes ALWAYS return state dicts
 - Routers control flow (strings)
 - State mutations happen only via validated transitions
+
+Every node has an async twin (`a<name>`) for `ainvoke`; nodes whose
+work is CPU-only just call their sync version, while I/O (notifications)
+runs concurrently under per-resource limits.
 """
 
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 from langgraph.graph import StateGraph, END
 
 from app.core.state import PatientState
 from app.core.validator import validate_transition
+from app.core.journey_guard import JourneyBudget, JourneyGuard, JourneyOutcome
+from app.memory.escalation_queue import escalation_queue_from_settings
 
+from app.agents.intake_agent import IntakeAgent
 from app.agents.scheduling_agent import SchedulingAgent
 from app.agents.dependency_agent import DependencyAgent
 from app.agents.monitoring_agent import MonitoringAgent
@@ -28,19 +35,53 @@ from app.agents.reminder_agent import ReminderAgent
 class JourneyGraphState(TypedDict):
     """
     LangGraph-compatible state wrapper.
+
+    guard / outcome are optional: the guard is created on the first
+    monitoring pass, and outcome is only set when a journey stalls.
     """
     patient_state: PatientState
+    guard: NotRequired[JourneyGuard]
+    outcome: NotRequired[JourneyOutcome]
 
 
 # ---------------------------------------------------------------------
 # Agent Instances (singletons)
 # ---------------------------------------------------------------------
 
+intake_agent = IntakeAgent()
 scheduling_agent = SchedulingAgent()
 dependency_agent = DependencyAgent()
 monitoring_agent = MonitoringAgent()
 reminder_agent = ReminderAgent()
 
+journey_budget = JourneyBudget.from_settings()
+
+# Patients halted on escalation_required wait here for a reviewer
+escalation_queue = escalation_queue_from_settings()
+
+
+# ---------------------------------------------------------------------
+# Intake Agent Node
+# ---------------------------------------------------------------------
+
+def intake_node(state: JourneyGraphState) -> JourneyGraphState:
+    """
+    IntakeAgent node.
+
+    Moves NEW_PATIENT into INTAKE_COMPLETED; no-op for any other state.
+    """
+
+    patient_state = state["patient_state"]
+
+    if intake_agent.complete_intake(patient_state):
+        print("[IntakeAgent] Intake completed.")
+
+    return {"patient_state": patient_state}
+
+
+async def aintake_node(state: JourneyGraphState) -> JourneyGraphState:
+    return intake_node(state)
+
 
 # ---------------------------------------------------------------------
 # Scheduling Agent Node
@@ -57,6 +98,24 @@ def scheduling_node(state: JourneyGraphState) -> JourneyGraphState:
 
     desired_state = scheduling_agent.decide_next_state(patient_state)
 
+    return _commit_desired_state(state, desired_state)
+
+
+async def ascheduling_node(state: JourneyGraphState) -> JourneyGraphState:
+    patient_state = state["patient_state"]
+
+    desired_state = await scheduling_agent.adecide_next_state(patient_state)
+
+    return _commit_desired_state(state, desired_state)
+
+
+def _commit_desired_state(state: JourneyGraphState, desired_state) -> JourneyGraphState:
+    """
+    Validates, books and applies the transition chosen by SchedulingAgent.
+    """
+
+    patient_state = state["patient_state"]
+
     if desired_state is None:
         return state
 
@@ -70,6 +129,18 @@ def scheduling_node(state: JourneyGraphState) -> JourneyGraphState:
         print(f"[SchedulingAgent] Transition blocked: {reason}")
         return state
 
+    if scheduling_agent.needs_booking(desired_state):
+        event = scheduling_agent.book_event(patient_state, desired_state)
+
+        if event is None:
+            print("[SchedulingAgent] Transition blocked: no slot available")
+            return state
+
+        print(
+            f"[SchedulingAgent] Booked {event.event_type} with "
+            f"{event.resource_id} at {event.scheduled_time}"
+        )
+
     patient_state.apply_transition(
         to_state=desired_state,
         by="SchedulingAgent"
@@ -99,6 +170,10 @@ def dependency_node(state: JourneyGraphState) -> JourneyGraphState:
     return state
 
 
+async def adependency_node(state: JourneyGraphState) -> JourneyGraphState:
+    return dependency_node(state)
+
+
 def dependency_router(state: JourneyGraphState) -> str:
     """
     Routes based on dependency check result.
@@ -122,18 +197,30 @@ def reminder_node(state: JourneyGraphState) -> JourneyGraphState:
     Does NOT mutate patient state.
     """
 
-    patient_state = state["patient_state"]
+    signals = reminder_agent.run(state["patient_state"])
+    _report_reminders(signals)
+
+    return state
 
-    signals = reminder_agent.run(patient_state)
 
+async def areminder_node(state: JourneyGraphState) -> JourneyGraphState:
+    """
+    Async ReminderAgent node: all notifications are sent concurrently.
+    """
+
+    signals = await reminder_agent.arun(state["patient_state"])
+    _report_reminders(signals)
+
+    return state
+
+
+def _report_reminders(signals):
     if signals.get("missed_detected"):
         print("[ReminderAgent] Missed event detected.")
 
     if signals.get("reminder_sent"):
         print("[ReminderAgent] Reminder sent.")
 
-    return state
-
 
 # ---------------------------------------------------------------------
 # Monitoring Agent Node + Router
@@ -143,24 +230,48 @@ def monitoring_node(state: JourneyGraphState) -> JourneyGraphState:
     """
     MonitoringAgent node.
 
-    Evaluates workflow health.
+    Evaluates workflow health and enforces the journey budget.
     NEVER returns routing decisions.
     """
 
-    decision = monitoring_agent.decide(state["patient_state"])
+    patient_state = state["patient_state"]
+    guard = state.get("guard") or JourneyGuard(journey_budget)
+
+    decision = monitoring_agent.decide(patient_state)
 
     if decision == "continue":
+        outcome = guard.tick(patient_state)
+
+        if outcome is not None:
+            print(f"[MonitoringAgent] Journey stalled: {outcome.reason}")
+            patient_state.set_signal("journey_stalled")
+            return {"patient_state": patient_state, "guard": guard, "outcome": outcome}
+
         print("[MonitoringAgent] Workflow still active.")
     else:
         print("[MonitoringAgent] Workflow halted.")
 
-    return state
+        if patient_state.signals.get("escalation_required"):
+            escalation = escalation_queue.escalate(patient_state)
+            print(
+                f"[MonitoringAgent] Escalated as {escalation.escalation_id} "
+                f"(severity {escalation.severity})"
+            )
+
+    return {"patient_state": patient_state, "guard": guard}
+
+
+async def amonitoring_node(state: JourneyGraphState) -> JourneyGraphState:
+    return monitoring_node(state)
 
 
 def monitoring_router(state: JourneyGraphState) -> str:
     """
     Controls graph flow based on MonitoringAgent decision.
     """
+    if state.get("outcome") is not None:
+        return "stop"
+
     return monitoring_agent.decide(state["patient_state"])
 
 
@@ -168,21 +279,42 @@ def monitoring_router(state: JourneyGraphState) -> str:
 # Graph Builder
 # ---------------------------------------------------------------------
 
-def build_patient_journey_graph():
+SYNC_NODES = {
+    "intake_agent": intake_node,
+    "dependency_agent": dependency_node,
+    "scheduling_agent": scheduling_node,
+    "reminder_agent": reminder_node,
+    "monitoring_agent": monitoring_node,
+}
+
+ASYNC_NODES = {
+    "intake_agent": aintake_node,
+    "dependency_agent": adependency_node,
+    "scheduling_agent": ascheduling_node,
+    "reminder_agent": areminder_node,
+    "monitoring_agent": amonitoring_node,
+}
+
+
+def build_patient_journey_graph(use_async: bool = False):
     """
     Builds and compiles the LangGraph workflow.
+
+    use_async=True registers the async nodes; the compiled graph must
+    then be run with `ainvoke`.
     """
 
     graph = StateGraph(JourneyGraphState)
 
     # Register nodes
-    graph.add_node("dependency_agent", dependency_node)
-    graph.add_node("scheduling_agent", scheduling_node)
-    graph.add_node("reminder_agent", reminder_node)
-    graph.add_node("monitoring_agent", monitoring_node)
+    for name, node in (ASYNC_NODES if use_async else SYNC_NODES).items():
+        graph.add_node(name, node)
 
     # Entry point
-    graph.set_entry_point("dependency_agent")
+    graph.set_entry_point("intake_agent")
+
+    # Intake → Dependency
+    graph.add_edge("intake_agent", "dependency_agent")
 
     # Dependency → Scheduling
     graph.add_conditional_edges(
@@ -0,0 +1,245 @@
+"""
+profiling.py
+
+Sampled cProfile / tracemalloc capture for cohort runs.
+
+Only 1 in `sample_rate` journeys is profiled (chosen by a stable hash
+of patient_id, so reruns profile the same patients). Samples are
+tagged with patient_id and final state, and aggregated into:
+- one merged pstats file
+- a top-allocations report (by source line)
+- a JSONL index of sampled journeys
+
+Allocations are recorded as the growth between a snapshot taken when
+the sample starts and one taken when it ends, so memory that was
+already traced (an outer session, earlier samples) is not counted.
+
+Async journeys (JourneyRunner.arun) interleave on one event loop, so
+cProfile cannot attribute time to a single journey. `acapture` records
+wall time and allocations only; their peak_bytes is the process-wide
+peak while the journey ran. Samples that overlap in time still see
+each other's allocations made during the overlap.
+"""
+
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+import zlib
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# Allocations made by the import system / tracemalloc itself are noise
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def _growth(
+    before: tracemalloc.Snapshot,
+    after: tracemalloc.Snapshot,
+) -> List[Tuple[Tuple[str, int], int, int]]:
+    """
+    Returns [((filename, lineno), bytes, blocks)] for every line whose
+    live allocations grew between the two snapshots.
+    """
+    grown = []
+    for diff in after.compare_to(before, "lineno"):
+        if diff.size_diff > 0:
+            frame = diff.traceback[0]
+            grown.append(((frame.filename, frame.lineno), diff.size_diff, max(diff.count_diff, 0)))
+    return grown
+
+
+# -------------------------------------------------------------------
+# SAMPLE RECORD
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class ProfileSample:
+    patient_id: str
+    final_state: str
+    wall_seconds: float
+    peak_bytes: int
+    mode: str = "sync"
+
+
+@dataclass
+class _Capture:
+    """
+    Filled in by JourneyProfiler.capture() while a journey runs.
+    """
+    patient_id: str
+    final_state: str = ""
+
+
+# -------------------------------------------------------------------
+# PROFILER
+# -------------------------------------------------------------------
+
+@dataclass
+class JourneyProfiler:
+    sample_rate: int = 1000
+    output_dir: Path = Path("data/profiles")
+    top_allocations: int = 25
+    tracemalloc_frames: int = 1
+
+    samples: List[ProfileSample] = field(default_factory=list)
+    _stats: Optional[pstats.Stats] = None
+    _allocations: Dict[Tuple[str, int], Tuple[int, int]] = field(default_factory=dict)
+    # Overlapping async captures share one tracemalloc session
+    _tracers: int = 0
+    _owns_tracing: bool = False
+
+    def should_sample(self, patient_id: str) -> bool:
+        if self.sample_rate <= 0:
+            return False
+        return zlib.crc32(patient_id.encode()) % self.sample_rate == 0
+
+    @contextmanager
+    def capture(self, patient_id: str):
+        """
+        Profiles the enclosed block if `patient_id` is sampled.
+
+        The caller sets `final_state` on the yielded capture (or None
+        when the journey is not sampled).
+        """
+        if not self.should_sample(patient_id):
+            yield None
+            return
+
+        capture = _Capture(patient_id=patient_id)
+        profiler = cProfile.Profile()
+
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(self.tracemalloc_frames)
+        tracemalloc.reset_peak()
+        baseline = _snapshot()
+
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield capture
+        finally:
+            profiler.disable()
+            wall_seconds = time.perf_counter() - started
+
+            allocations = _growth(baseline, _snapshot())
+            _, peak = tracemalloc.get_traced_memory()
+            if not already_tracing:
+                tracemalloc.stop()
+
+            self._record(capture, profiler, allocations, wall_seconds, peak)
+
+    @asynccontextmanager
+    async def acapture(self, patient_id: str):
+        """
+        Async `capture`: wall time and allocations, no cProfile.
+        """
+        if not self.should_sample(patient_id):
+            yield None
+            return
+
+        capture = _Capture(patient_id=patient_id)
+        self._start_tracing()
+        baseline = _snapshot()
+
+        started = time.perf_counter()
+        try:
+            yield capture
+        finally:
+            wall_seconds = time.perf_counter() - started
+
+            allocations = _growth(baseline, _snapshot())
+            _, peak = tracemalloc.get_traced_memory()
+            self._stop_tracing()
+
+            self._record(capture, None, allocations, wall_seconds, peak, mode="async")
+
+    def _start_tracing(self):
+        if self._tracers == 0:
+            self._owns_tracing = not tracemalloc.is_tracing()
+            if self._owns_tracing:
+                tracemalloc.start(self.tracemalloc_frames)
+            tracemalloc.reset_peak()
+        self._tracers += 1
+
+    def _stop_tracing(self):
+        self._tracers -= 1
+        if self._tracers == 0 and self._owns_tracing:
+            tracemalloc.stop()
+
+    def _record(self, capture, profiler, allocations, wall_seconds, peak, mode="sync"):
+        # Async samples carry no cProfile data
+        if profiler is not None:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+
+        for key, grown_size, grown_count in allocations:
+            size, count = self._allocations.get(key, (0, 0))
+            self._allocations[key] = (size + grown_size, count + grown_count)
+
+        self.samples.append(ProfileSample(
+            patient_id=capture.patient_id,
+            final_state=capture.final_state,
+            wall_seconds=wall_seconds,
+            peak_bytes=peak,
+            mode=mode,
+        ))
+
+    # -----------------------------
+    # Reports
+    # -----------------------------
+    def allocation_report(self) -> List[Tuple[str, int, int, int]]:
+        """
+        Returns the top (filename, lineno, bytes, blocks) summed over
+        all sampled journeys.
+        """
+        ranked = sorted(
+            self._allocations.items(),
+            key=lambda item: item[1][0],
+            reverse=True,
+        )[:self.top_allocations]
+        return [(f, line, size, count) for (f, line), (size, count) in ranked]
+
+    def export(self) -> Optional[Path]:
+        """
+        Writes cohort.pstats, allocations.txt and samples.jsonl to
+        `output_dir`. Returns the directory, or None if nothing was sampled.
+        """
+        if not self.samples:
+            return None
+
+        out = Path(self.output_dir)
+        out.mkdir(parents=True, exist_ok=True)
+
+        if self._stats is not None:
+            self._stats.dump_stats(str(out / "cohort.pstats"))
+
+        with (out / "allocations.txt").open("w", encoding="utf-8") as handle:
+            handle.write(f"Top allocations over {len(self.samples)} sampled journeys\n")
+            for filename, lineno, size, count in self.allocation_report():
+                handle.write(f"{size / 1024:10.1f} KiB {count:8d} blocks  {filename}:{lineno}\n")
+
+        with (out / "samples.jsonl").open("w", encoding="utf-8") as handle:
+            for sample in self.samples:
+                handle.write(json.dumps(asdict(sample)) + "\n")
+
+        return out
+
+    def print_hotspots(self, limit: int = 20, sort: str = "cumulative"):
+        if self._stats is not None:
+            self._stats.sort_stats(sort).print_stats(limit)
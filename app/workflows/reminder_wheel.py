@@ -0,0 +1,207 @@
+"""
+reminder_wheel.py
+
+Cohort-wide reminder / deadline index on a hierarchical timing wheel.
+
+Instead of re-walking every patient's events on every graph loop,
+each SCHEDULED event registers two timers when it is added:
+- "reminder" at scheduled_time - reminder offset
+- "deadline" just after scheduled_time (when it becomes missed)
+
+Timers are cancelled as soon as the event leaves SCHEDULED.
+`CohortClock` advances simulated time for the whole cohort and only
+runs the patients whose timers fired through the graph, handing the
+fired events to ReminderAgent (PatientState.due_events) so it does
+not scan the patient's other events.
+
+IMPORTANT:
+- No LLM usage
+- Timers are driven by PatientState change notifications (observers),
+  so agents do not need to know the wheel exists
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.core.state import PatientState, PatientEvent, EventStatus, SIMULATION_START
+from app.core.timing_wheel import HierarchicalTimingWheel
+
+
+REMINDER = "reminder"
+DEADLINE = "deadline"
+
+TimerItem = Tuple[str, str, str]
+# (kind, patient_id, event_id)
+
+
+# -------------------------------------------------------------------
+# REMINDER WHEEL
+# -------------------------------------------------------------------
+
+class ReminderWheel:
+    """
+    Holds reminder and deadline timers for every tracked patient.
+    """
+
+    def __init__(
+        self,
+        start: Optional[datetime] = None,
+        reminder_offset_minutes: Optional[int] = None,
+        resolution: Optional[timedelta] = None,
+    ):
+        settings = get_settings()
+        if reminder_offset_minutes is None:
+            reminder_offset_minutes = settings.reminder_offset_minutes
+        if resolution is None:
+            resolution = timedelta(seconds=settings.reminder_wheel_resolution_seconds)
+
+        self.reminder_offset = timedelta(minutes=reminder_offset_minutes)
+        self.wheel = HierarchicalTimingWheel(start or SIMULATION_START, resolution)
+
+        # (patient_id, event_id) -> timer ids
+        self._timers: Dict[Tuple[str, str], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.wheel)
+
+    @property
+    def now(self) -> datetime:
+        return self.wheel.now
+
+    # -----------------------------
+    # Tracking
+    # -----------------------------
+    def attach(self, patient_state: PatientState):
+        """
+        Starts tracking a patient: indexes its existing SCHEDULED events
+        and follows future changes.
+        """
+        for event in patient_state.events:
+            if event.status == EventStatus.SCHEDULED:
+                self.track(patient_state.patient_id, event.event_id, event.scheduled_time)
+        patient_state.add_observer(self._on_change)
+
+    def track(self, patient_id: str, event_id: str, scheduled_time: datetime):
+        key = (patient_id, event_id)
+        self.untrack(patient_id, event_id)
+
+        # Missed means current_time > scheduled_time, so fire strictly after
+        self._timers[key] = [
+            self.wheel.schedule(scheduled_time - self.reminder_offset, (REMINDER, patient_id, event_id)),
+            self.wheel.schedule(scheduled_time + timedelta(microseconds=1), (DEADLINE, patient_id, event_id)),
+        ]
+
+    def untrack(self, patient_id: str, event_id: str):
+        for timer_id in self._timers.pop((patient_id, event_id), ()):
+            self.wheel.cancel(timer_id)
+
+    def _on_change(self, patient_id: str, kind: str, data: Dict, at: datetime):
+        if kind == "event_added":
+            if data["status"] == EventStatus.SCHEDULED.value:
+                self.track(
+                    patient_id,
+                    data["event_id"],
+                    datetime.fromisoformat(data["scheduled_time"]),
+                )
+        elif kind == "event_status":
+            if data["status"] != EventStatus.SCHEDULED.value:
+                self.untrack(patient_id, data["event_id"])
+
+    # -----------------------------
+    # Firing
+    # -----------------------------
+    def tick(self, now: datetime) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Advances to `now` and returns {patient_id: [(kind, event_id)]}
+        for every timer that fell due, in due order.
+        """
+        due: Dict[str, List[Tuple[str, str]]] = {}
+        for kind, patient_id, event_id in self.wheel.advance(now):
+            if kind == DEADLINE:
+                self._timers.pop((patient_id, event_id), None)
+            due.setdefault(patient_id, []).append((kind, event_id))
+        return due
+
+
+# -------------------------------------------------------------------
+# COHORT CLOCK
+# -------------------------------------------------------------------
+
+class CohortClock:
+    """
+    Drives simulated time for a whole cohort.
+
+    Only patients with a fired timer are advanced and re-run through
+    the graph; everyone else stays untouched.
+    """
+
+    def __init__(self, runner, wheel: Optional[ReminderWheel] = None):
+        self.runner = runner
+        self.wheel = wheel or ReminderWheel()
+        self.patients: Dict[str, PatientState] = {}
+
+    def add(self, patient_state: PatientState, run: bool = True) -> Optional[Dict]:
+        """
+        Registers a patient; by default runs it once so intake and the
+        first booking happen (which registers its timers).
+        """
+        self.patients[patient_state.patient_id] = patient_state
+        self.wheel.attach(patient_state)
+        return self.runner.run(patient_state) if run else None
+
+    def add_many(self, states: Iterable[PatientState], run: bool = True) -> int:
+        count = 0
+        for patient_state in states:
+            self.add(patient_state, run=run)
+            count += 1
+        return count
+
+    def advance_to(self, now: datetime) -> List[Dict]:
+        """
+        Moves the cohort clock to `now` and runs every patient with a
+        reminder or deadline due. Returns their graph results.
+        """
+        results = []
+        for patient_id, fired in self.wheel.tick(now).items():
+            patient_state = self.patients.get(patient_id)
+            if patient_state is None:
+                continue
+            if now > patient_state.current_time:
+                patient_state.advance_time(now - patient_state.current_time)
+
+            patient_state.due_events = self._fired_events(patient_state, fired)
+            try:
+                results.append(self.runner.run(patient_state))
+            finally:
+                patient_state.due_events = None
+        return results
+
+    @staticmethod
+    def _fired_events(patient_state: PatientState, fired: List[Tuple[str, str]]) -> List[PatientEvent]:
+        """
+        Resolves fired event ids to events. Fired events are the most
+        recent ones, so the backwards walk usually stops early.
+        """
+        wanted = {event_id for _, event_id in fired}
+        found = []
+        for event in reversed(patient_state.events):
+            if event.event_id in wanted:
+                found.append(event)
+                wanted.discard(event.event_id)
+                if not wanted:
+                    break
+        found.reverse()
+        return found
+
+    def run_until(self, until: datetime, step: timedelta) -> int:
+        """
+        Advances in `step` increments up to `until`.
+        Returns how many patient runs were triggered.
+        """
+        runs = 0
+        now = self.wheel.now
+        while now < until:
+            now = min(now + step, until)
+            runs += len(self.advance_to(now))
+        return runs
@@ -3,22 +3,38 @@ main.py — Production Entry Point
 """
 
 from app.core.state import PatientState
-from app.workflows.patient_journey_graph import build_patient_journey_graph
+from app.memory.history_archive import history_tiering_from_settings
+from app.memory.transition_log import transition_log_from_settings
+from app.workflows.journey_runner import JourneyRunner, profiler_from_settings
 
 
 def main():
     patient_state = PatientState(patient_id="P001")
 
-    graph = build_patient_journey_graph()
-    result = graph.invoke({"patient_state": patient_state})
+    runner = JourneyRunner(
+        profiler=profiler_from_settings(),
+        transition_log=transition_log_from_settings(),
+        tiering=history_tiering_from_settings(),
+    )
+    result = runner.run(patient_state)
 
     final_state = result["patient_state"]
 
     print("Final Patient State:", final_state.current_state.value)
+    if result.get("outcome"):
+        print("Outcome:", result["outcome"].status, "-", result["outcome"].reason)
     print("State History:")
-    for h in final_state.history:
+    for h in final_state.full_history():
         print(f"{h.from_state.value} → {h.to_state.value} by {h.by}")
 
+    if runner.profiler is not None:
+        output_dir = runner.profiler.export()
+        if output_dir is not None:
+            print("Profile written to:", output_dir)
+
+    if runner.transition_log is not None:
+        runner.transition_log.close()
+
 
 if __name__ == "__main__":
     main()
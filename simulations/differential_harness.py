@@ -0,0 +1,539 @@
+"""
+differential_harness.py
+
+Property-based differential testing: a candidate journey engine must
+produce EXACTLY what the reference LangGraph journey produces.
+
+Reference:
+    JourneyRunner(build_patient_journey_graph()).run  (sync graph)
+
+Built-in candidates:
+- "async": the async graph via JourneyRunner.arun
+
+Any `module:function` taking a PatientState and returning the graph
+result dict (or None) can be plugged in as a candidate.
+
+For every generated case:
+1. A random CaseSpec is drawn: a validator-approved history walk,
+   events (completed / scheduled, past or future), retry counts,
+   signals and a clock
+2. Reference and candidate each run on their own copy, with FRESH
+   agent singletons (slot capacity, reschedule queue, escalation queue)
+3. Final state, time, history, events, signals, retry counts,
+   completed_mask and guard outcome are compared field by field
+4. Mismatching cases are shrunk to a smaller spec that still differs
+
+A second check compares the precomputed journey index
+(app/core/journey_index.py) with a brute-force search driven by
+validate_transition.
+
+Engine timings exclude case building and copying, so the report's
+speedup is candidate time vs reference time on identical inputs.
+
+Run:
+    python -m simulations.differential_harness --candidate async --cases 200
+Exits non-zero if any mismatch is found.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.agents.dependency_agent import DependencyAgent
+from app.agents.intake_agent import IntakeAgent
+from app.agents.monitoring_agent import MonitoringAgent
+from app.agents.reminder_agent import ReminderAgent
+from app.agents.scheduling_agent import SchedulingAgent, STATE_EVENT_TYPES
+from app.core.journey_index import journey_index, STATES, STATE_CODES, MASKS
+from app.core.state import (
+    PatientState,
+    PatientJourneyState,
+    PatientEvent,
+    EventStatus,
+    STATE_BITS,
+)
+from app.core.transitions import ALLOWED_TRANSITIONS
+from app.core.validator import validate_transition
+from app.memory.escalation_queue import EscalationQueue
+from app.tools.persistence_tools import transition_to_row, event_to_row
+from app.workflows import patient_journey_graph
+from app.workflows.journey_runner import JourneyRunner
+
+
+Engine = Callable[[PatientState], Optional[Dict]]
+
+SIGNALS = ("missed_event", "escalation_required", "journey_stalled")
+
+# Who records each generated transition
+AUTHORS = {
+    PatientJourneyState.INTAKE_COMPLETED: "IntakeAgent",
+    **{state: "SchedulingAgent" for state in STATE_EVENT_TYPES},
+}
+
+# Module-level singletons the graph nodes read, and how to rebuild them
+AGENT_SINGLETONS = {
+    "intake_agent": IntakeAgent,
+    "scheduling_agent": SchedulingAgent,
+    "dependency_agent": DependencyAgent,
+    "monitoring_agent": MonitoringAgent,
+    "reminder_agent": ReminderAgent,
+    "escalation_queue": EscalationQueue,
+}
+
+
+# -------------------------------------------------------------------
+# CASES
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class CaseSpec:
+    """
+    A reproducible PatientState recipe. Times are minutes after
+    SIMULATION_START.
+    """
+    patient_id: str
+    path: Tuple[str, ...] = ()
+    step_minutes: Tuple[int, ...] = ()
+    # (event_type, scheduled minute, status, attempt)
+    events: Tuple[Tuple[str, int, str, int], ...] = ()
+    retry_counts: Tuple[Tuple[str, int], ...] = ()
+    signals: Tuple[str, ...] = ()
+    clock_minutes: int = 0
+
+    def build(self) -> PatientState:
+        patient_state = PatientState(patient_id=self.patient_id)
+        start = patient_state.current_time
+
+        for value, minutes in zip(self.path, self.step_minutes):
+            state = PatientJourneyState(value)
+            patient_state.current_time += timedelta(minutes=minutes)
+            patient_state.apply_transition(state, by=AUTHORS.get(state, "Simulator"))
+
+        for n, (event_type, minute, status, attempt) in enumerate(self.events, start=1):
+            patient_state.events.append(PatientEvent(
+                event_id=f"{self.patient_id}-{event_type}-{n}",
+                event_type=event_type,
+                scheduled_time=start + timedelta(minutes=minute),
+                status=EventStatus(status),
+                attempt=attempt,
+            ))
+
+        patient_state.retry_counts = dict(self.retry_counts)
+        patient_state.signals = {key: True for key in self.signals}
+        patient_state.current_time = start + timedelta(minutes=self.clock_minutes)
+        return patient_state
+
+    def to_dict(self) -> Dict:
+        return {
+            "patient_id": self.patient_id,
+            "path": list(self.path),
+            "step_minutes": list(self.step_minutes),
+            "events": [list(e) for e in self.events],
+            "retry_counts": dict(self.retry_counts),
+            "signals": list(self.signals),
+            "clock_minutes": self.clock_minutes,
+        }
+
+
+def generate_case(rng: random.Random, patient_id: str) -> CaseSpec:
+    """
+    Draws a random case. Histories only take validator-approved steps;
+    everything else (events, retries, signals, clock) is unconstrained.
+    """
+    walker = PatientState(patient_id=patient_id)
+    path, step_minutes = [], []
+    for _ in range(rng.randint(0, len(STATES) - 1)):
+        options = [
+            state for state in sorted(ALLOWED_TRANSITIONS[walker.current_state], key=lambda s: s.value)
+            if validate_transition(walker, state, requested_by="Generator")[0]
+        ]
+        if not options:
+            break
+        state = rng.choice(options)
+        walker.apply_transition(state, by="Generator")
+        path.append(state.value)
+        step_minutes.append(rng.randint(0, 3 * 24 * 60))
+
+    elapsed = 0
+    events = []
+    for index, (value, minutes) in enumerate(zip(path, step_minutes)):
+        elapsed += minutes
+        event_type = STATE_EVENT_TYPES.get(PatientJourneyState(value))
+        if event_type is None:
+            continue
+        current = index == len(path) - 1
+        status = EventStatus.SCHEDULED if current else rng.choice(
+            [EventStatus.COMPLETED] * 3 + [EventStatus.MISSED]
+        )
+        events.append((event_type, elapsed + rng.randint(0, 7 * 24 * 60), status.value, rng.randint(0, 2)))
+
+    retry_counts = tuple(
+        (event_type, count)
+        for event_type in sorted({e[0] for e in events})
+        for count in [rng.choice([0, 0, 0, 1, 2, 3])]
+        if count
+    )
+    signals = tuple(key for key in SIGNALS if rng.random() < 0.1)
+    clock_minutes = elapsed + rng.randint(0, 10 * 24 * 60)
+
+    return CaseSpec(
+        patient_id=patient_id,
+        path=tuple(path),
+        step_minutes=tuple(step_minutes),
+        events=tuple(events),
+        retry_counts=retry_counts,
+        signals=signals,
+        clock_minutes=clock_minutes,
+    )
+
+
+def _simplifications(spec: CaseSpec) -> Iterator[CaseSpec]:
+    """
+    Strictly smaller variants of `spec`, most aggressive first.
+    """
+    if spec.path:
+        yield replace(spec, path=spec.path[:-1], step_minutes=spec.step_minutes[:-1])
+    for i in range(len(spec.events)):
+        yield replace(spec, events=spec.events[:i] + spec.events[i + 1:])
+    for i in range(len(spec.retry_counts)):
+        yield replace(spec, retry_counts=spec.retry_counts[:i] + spec.retry_counts[i + 1:])
+    for i in range(len(spec.signals)):
+        yield replace(spec, signals=spec.signals[:i] + spec.signals[i + 1:])
+    if spec.clock_minutes:
+        yield replace(spec, clock_minutes=spec.clock_minutes // 2)
+
+
+# -------------------------------------------------------------------
+# ENGINES
+# -------------------------------------------------------------------
+
+@contextlib.contextmanager
+def fresh_agents():
+    """
+    Swaps the graph's module-level agents for new instances, so every
+    engine run starts from identical clinic capacity and queues.
+    """
+    saved = {name: getattr(patient_journey_graph, name) for name in AGENT_SINGLETONS}
+    for name, factory in AGENT_SINGLETONS.items():
+        setattr(patient_journey_graph, name, factory())
+    try:
+        yield
+    finally:
+        patient_journey_graph.scheduling_agent.close()
+        for name, value in saved.items():
+            setattr(patient_journey_graph, name, value)
+
+
+_runner: Optional[JourneyRunner] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _shared_runner() -> JourneyRunner:
+    # Compiled once: graph construction is not part of the comparison
+    global _runner
+    if _runner is None:
+        _runner = JourneyRunner()
+    return _runner
+
+
+def reference_engine(patient_state: PatientState) -> Dict:
+    return _shared_runner().run(patient_state)
+
+
+def async_engine(patient_state: PatientState) -> Dict:
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(_shared_runner().arun(patient_state))
+
+
+CANDIDATES: Dict[str, Engine] = {
+    "reference": reference_engine,
+    "async": async_engine,
+}
+
+
+def load_engine(name: str) -> Engine:
+    """
+    A built-in candidate name, or "package.module:function".
+    """
+    if name in CANDIDATES:
+        return CANDIDATES[name]
+    module_name, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(f"Unknown candidate {name!r} (use a built-in name or module:function)")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+# -------------------------------------------------------------------
+# COMPARISON
+# -------------------------------------------------------------------
+
+def observe(patient_state: PatientState, result: Optional[Dict]) -> Dict:
+    """
+    Everything a candidate must reproduce exactly.
+    """
+    outcome = (result or {}).get("outcome")
+    return {
+        "current_state": patient_state.current_state.value,
+        "current_time": patient_state.current_time.isoformat(),
+        "history": [transition_to_row(t) for t in patient_state.full_history()],
+        "events": [event_to_row(e) for e in patient_state.full_events()],
+        "signals": sorted(key for key, value in patient_state.signals.items() if value),
+        "retry_counts": dict(sorted(patient_state.retry_counts.items())),
+        "completed_mask": patient_state.completed_mask,
+        "outcome": None if outcome is None else [outcome.status, outcome.reason, outcome.iterations],
+    }
+
+
+def compare(expected: Dict, actual: Dict) -> List[str]:
+    differences = []
+    for key, want in expected.items():
+        got = actual.get(key)
+        if want == got:
+            continue
+        if isinstance(want, list) and isinstance(got, list) and key in ("history", "events"):
+            for index in range(max(len(want), len(got))):
+                a = want[index] if index < len(want) else "<missing>"
+                b = got[index] if index < len(got) else "<missing>"
+                if a != b:
+                    differences.append(f"{key}[{index}]: expected {a}, got {b}")
+                    break
+        else:
+            differences.append(f"{key}: expected {want}, got {got}")
+    return differences
+
+
+def _timed_run(engine: Engine, spec: CaseSpec) -> Tuple[Dict, float]:
+    patient_state = spec.build()
+    with fresh_agents():
+        started = time.perf_counter()
+        result = engine(patient_state)
+        seconds = time.perf_counter() - started
+    return observe(patient_state, result), seconds
+
+
+def run_case(reference: Engine, candidate: Engine, spec: CaseSpec) -> Tuple[List[str], float, float]:
+    """
+    Returns (differences, reference seconds, candidate seconds).
+    """
+    expected, reference_seconds = _timed_run(reference, spec)
+    try:
+        actual, candidate_seconds = _timed_run(candidate, spec)
+    except Exception as exc:
+        return [f"candidate raised {type(exc).__name__}: {exc}"], reference_seconds, 0.0
+    return compare(expected, actual), reference_seconds, candidate_seconds
+
+
+def shrink(reference: Engine, candidate: Engine, spec: CaseSpec, max_attempts: int = 500) -> CaseSpec:
+    """
+    Greedily simplifies a failing spec while it keeps failing.
+    """
+    attempts = 0
+    improved = True
+    while improved and attempts < max_attempts:
+        improved = False
+        for smaller in _simplifications(spec):
+            attempts += 1
+            if run_case(reference, candidate, smaller)[0]:
+                spec, improved = smaller, True
+                break
+            if attempts >= max_attempts:
+                break
+    return spec
+
+
+# -------------------------------------------------------------------
+# DIFFERENTIAL RUN
+# -------------------------------------------------------------------
+
+@dataclass
+class Mismatch:
+    case: int
+    spec: CaseSpec
+    differences: List[str]
+    shrunk: Optional[CaseSpec] = None
+    shrunk_differences: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            "case": self.case,
+            "spec": self.spec.to_dict(),
+            "differences": self.differences,
+            "shrunk": self.shrunk.to_dict() if self.shrunk else None,
+            "shrunk_differences": self.shrunk_differences,
+        }
+
+
+@dataclass
+class DifferentialReport:
+    candidate: str
+    cases: int
+    seed: int
+    reference_seconds: float = 0.0
+    candidate_seconds: float = 0.0
+    mismatches: List[Mismatch] = field(default_factory=list)
+    index_mismatches: List[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return not self.mismatches and not self.index_mismatches
+
+    @property
+    def speedup(self) -> float:
+        """
+        Reference time / candidate time (> 1 means the candidate is faster).
+        """
+        if self.candidate_seconds <= 0:
+            return 0.0
+        return self.reference_seconds / self.candidate_seconds
+
+    def to_dict(self) -> Dict:
+        return {
+            "candidate": self.candidate,
+            "cases": self.cases,
+            "seed": self.seed,
+            "passed": self.passed,
+            "reference_seconds": round(self.reference_seconds, 4),
+            "candidate_seconds": round(self.candidate_seconds, 4),
+            "speedup": round(self.speedup, 3),
+            "mismatches": [m.to_dict() for m in self.mismatches],
+            "index_mismatches": self.index_mismatches,
+        }
+
+
+def run_differential(
+    candidate: str = "async",
+    cases: int = 200,
+    seed: int = 0,
+    reference: Engine = reference_engine,
+    shrink_failures: bool = True,
+    max_mismatches: int = 5,
+) -> DifferentialReport:
+    """
+    Runs `cases` generated cases through reference and candidate.
+    Stops collecting after `max_mismatches` failures.
+    """
+    engine = load_engine(candidate)
+    report = DifferentialReport(candidate=candidate, cases=0, seed=seed)
+
+    for index in range(cases):
+        # String seeds are hashed deterministically across processes
+        rng = random.Random(f"{seed}:{index}")
+        spec = generate_case(rng, patient_id=f"D{index:05d}")
+
+        differences, reference_seconds, candidate_seconds = run_case(reference, engine, spec)
+        report.cases += 1
+        report.reference_seconds += reference_seconds
+        report.candidate_seconds += candidate_seconds
+
+        if differences:
+            mismatch = Mismatch(case=index, spec=spec, differences=differences)
+            if shrink_failures:
+                mismatch.shrunk = shrink(reference, engine, spec)
+                mismatch.shrunk_differences = run_case(reference, engine, mismatch.shrunk)[0]
+            report.mismatches.append(mismatch)
+            if len(report.mismatches) >= max_mismatches:
+                break
+
+    return report
+
+
+# -------------------------------------------------------------------
+# JOURNEY INDEX vs VALIDATOR
+# -------------------------------------------------------------------
+
+def _validator_search(state: PatientJourneyState, completed_mask: int) -> Tuple[int, Optional[int]]:
+    """
+    Breadth-first search over validate_transition from (state, mask).
+    Returns (reachable-state bitmask, fewest steps to JOURNEY_CLOSED).
+    """
+    reachable = 0
+    steps_to_close = None
+    seen = {(state, completed_mask)}
+    queue = deque([(state, completed_mask, 0)])
+
+    while queue:
+        current, mask, depth = queue.popleft()
+        reachable |= STATE_BITS[current]
+        if current == PatientJourneyState.JOURNEY_CLOSED and steps_to_close is None:
+            steps_to_close = depth
+
+        probe = PatientState(patient_id="probe", current_state=current)
+        probe.completed_mask = mask
+        for target in STATES:
+            if not validate_transition(probe, target, requested_by="Harness")[0]:
+                continue
+            key = (target, mask | STATE_BITS[target])
+            if key not in seen:
+                seen.add(key)
+                queue.append((target, key[1], depth + 1))
+
+    return reachable, steps_to_close
+
+
+def check_journey_index(samples: int = 500, seed: int = 0) -> List[str]:
+    """
+    Compares journey_index lookups with a validator-driven search on
+    random (state, completed_mask) pairs.
+    """
+    rng = random.Random(f"index:{seed}")
+    mismatches = []
+    for _ in range(samples):
+        state = rng.choice(STATES)
+        mask = rng.randrange(MASKS)
+
+        reachable, steps = _validator_search(state, mask)
+        indexed = journey_index.reachable[STATE_CODES[state] * MASKS + mask]
+        if indexed != reachable or journey_index.steps_to_close(state, mask) != steps:
+            mismatches.append(
+                f"{state.value} mask={mask:#x}: index reach={indexed:#x} "
+                f"steps={journey_index.steps_to_close(state, mask)}, "
+                f"validator reach={reachable:#x} steps={steps}"
+            )
+    return mismatches
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Differential test: candidate engine vs reference graph")
+    parser.add_argument("--candidate", default="async", help="built-in name or module:function")
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--index-samples", type=int, default=500)
+    parser.add_argument("--no-shrink", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="keep agent logging")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            sink = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(sink))
+
+        report = run_differential(
+            candidate=args.candidate,
+            cases=args.cases,
+            seed=args.seed,
+            shrink_failures=not args.no_shrink,
+        )
+        report.index_mismatches = check_journey_index(args.index_samples, args.seed)
+
+    print(json.dumps(report.to_dict(), indent=2))
+    return 0 if report.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
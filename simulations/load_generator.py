@@ -0,0 +1,254 @@
+"""
+load_generator.py
+
+Closed-loop load generator for the journey HTTP service
+(app/service/http_server.py).
+
+Each of `connections` keep-alive connections sends requests back to
+back. After registering `patients` patients, every request picks a
+random patient and one of:
+- POST /steps
+- POST /events  ("completed" for a scheduled event seen in an earlier
+                 GET, otherwise a "clock" advance)
+- GET  /patients/<id>
+
+Reports requests per second, latency percentiles (client side, ms),
+status counts and the server's own /metrics.
+
+Run against a running server:
+    python -m simulations.load_generator --port 8080
+or start one in-process (no other setup needed):
+    python -m simulations.load_generator --embedded
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+PERCENTILES = (50, 90, 99)
+
+# Request mix (relative weights)
+MIX = {"step": 5, "event": 3, "get": 2}
+
+
+# -------------------------------------------------------------------
+# HTTP CLIENT
+# -------------------------------------------------------------------
+
+class Connection:
+    """
+    One keep-alive HTTP/1.1 connection; requests are sent one at a time.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def open(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self._writer.wait_closed()
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, Dict]:
+        payload = json.dumps(body).encode() if body is not None else b""
+        self._writer.write(
+            (
+                f"{method} {path} HTTP/1.1\r\n"
+                f"Host: {self.host}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"\r\n"
+            ).encode() + payload
+        )
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+
+        data = await self._reader.readexactly(length) if length else b"{}"
+        return status, json.loads(data)
+
+
+# -------------------------------------------------------------------
+# WORKLOAD
+# -------------------------------------------------------------------
+
+@dataclass
+class LoadReport:
+    requests: int
+    seconds: float
+    latencies_ms: List[float] = field(repr=False)
+    statuses: Dict[int, int]
+    server_metrics: Dict = field(default_factory=dict)
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self.latencies_ms:
+            return {}
+        ordered = sorted(self.latencies_ms)
+        last = len(ordered) - 1
+        values = {
+            f"p{p}": round(ordered[min(last, int(round(p / 100 * last)))], 3)
+            for p in PERCENTILES
+        }
+        values["max"] = round(ordered[-1], 3)
+        return values
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "seconds": round(self.seconds, 3),
+            "requests_per_second": round(self.requests_per_second, 1),
+            "latency_ms": self.percentiles(),
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "server_metrics": self.server_metrics,
+        }
+
+
+async def run_load(
+    host: str,
+    port: int,
+    requests: int = 2000,
+    connections: int = 16,
+    patients: int = 200,
+    seed: int = 7,
+) -> LoadReport:
+    rng = random.Random(seed)
+    patient_ids = [f"LG{seed}-{i:05d}" for i in range(patients)]
+    # Scheduled event ids seen in GET responses, per patient
+    scheduled: Dict[str, List[str]] = {}
+
+    pool = [Connection(host, port) for _ in range(connections)]
+    await asyncio.gather(*(c.open() for c in pool))
+
+    # Registration is setup, not measured
+    for start in range(0, patients, connections):
+        await asyncio.gather(*(
+            c.request("POST", "/patients", {"patient_id": pid})
+            for c, pid in zip(pool, patient_ids[start:start + connections])
+        ))
+
+    ops = list(MIX)
+    weights = [MIX[op] for op in ops]
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = [requests]
+
+    async def client(connection: Connection):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            patient_id = rng.choice(patient_ids)
+            op = rng.choices(ops, weights)[0]
+
+            if op == "step":
+                call = ("POST", "/steps", {"patient_id": patient_id})
+            elif op == "event" and scheduled.get(patient_id):
+                event_id = scheduled[patient_id].pop()
+                call = ("POST", "/events", {
+                    "patient_id": patient_id, "kind": "completed", "event_id": event_id,
+                })
+            elif op == "event":
+                call = ("POST", "/events", {
+                    "patient_id": patient_id, "kind": "clock", "minutes": rng.randint(10, 24 * 60),
+                })
+            else:
+                call = ("GET", f"/patients/{patient_id}", None)
+
+            started = time.perf_counter()
+            status, body = await connection.request(*call)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+            if op == "get" and status == 200:
+                # Event rows: [event_id, event_type, scheduled_time, status, ...]
+                scheduled[patient_id] = [
+                    row[0] for row in body.get("events", []) if row[3] == "scheduled"
+                ]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in pool))
+    seconds = time.perf_counter() - started
+
+    _, server_metrics = await pool[0].request("GET", "/metrics")
+    await asyncio.gather(*(c.close() for c in pool))
+
+    return LoadReport(
+        requests=len(latencies),
+        seconds=seconds,
+        latencies_ms=latencies,
+        statuses=statuses,
+        server_metrics=server_metrics,
+    )
+
+
+async def run_embedded(**kwargs) -> LoadReport:
+    """
+    Starts a server in this process on a free port and loads it.
+    """
+    from app.service.http_server import JourneyHTTPServer
+
+    server = JourneyHTTPServer(host="127.0.0.1", port=0)
+    port = await server.start()
+    try:
+        return await run_load("127.0.0.1", port, **kwargs)
+    finally:
+        await server.stop()
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the journey HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--embedded", action="store_true", help="start a server in-process")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    options = dict(
+        requests=args.requests,
+        connections=args.connections,
+        patients=args.patients,
+        seed=args.seed,
+    )
+
+    if args.embedded:
+        # Silence the in-process agents' per-step logging
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            report = asyncio.run(run_embedded(**options))
+    else:
+        report = asyncio.run(run_load(args.host, args.port, **options))
+
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+test_escalation_queue.py
+
+Escalation priority ordering, filtering, claim / release / resolve and journal recovery.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from app.core.state import (
+    EventStatus,
+    PatientEvent,
+    PatientJourneyState,
+    PatientState,
+)
+from app.memory.escalation_queue import (
+    CLAIMED,
+    OPEN,
+    RESOLVED,
+    EscalationQueue,
+)
+
+
+# -------------------------------------------------------------------
+# FIXTURES
+# -------------------------------------------------------------------
+
+@pytest.fixture
+def journal(tmp_path):
+    return tmp_path / "escalations.jsonl"
+
+
+@pytest.fixture
+def queue(journal):
+    queue = EscalationQueue(path=journal)
+    yield queue
+    queue.close()
+
+
+def halted(patient_id, event_type, retries=0, waited=timedelta(0), state=PatientJourneyState.APPOINTMENT_SCHEDULED):
+    """
+    A patient whose last `event_type` event was MISSED.
+    """
+    patient_state = PatientState(patient_id=patient_id)
+    patient_state.current_state = state
+    patient_state.advance_time(waited)
+    event = PatientEvent(f"{patient_id}-{event_type}-1", event_type, patient_state.current_time)
+    patient_state.add_event(event)
+    for _ in range(retries):
+        patient_state.increment_retry(event_type)
+    patient_state.set_event_status(event, EventStatus.MISSED)
+    patient_state.set_signal("escalation_required")
+    return patient_state
+
+
+def ids(escalations):
+    return [e.patient_id for e in escalations]
+
+
+# -------------------------------------------------------------------
+# ORDERING AND FILTERS
+# -------------------------------------------------------------------
+
+def test_orders_by_severity_then_wait_then_retries(queue):
+    queue.escalate(halted("follow", "follow_up"))
+    queue.escalate(halted("appt-late", "appointment", waited=timedelta(hours=1)))
+    queue.escalate(halted("appt-early", "appointment"))
+    queue.escalate(halted("lab", "lab_test", waited=timedelta(hours=5)))
+    queue.escalate(halted("appt-early-retried", "appointment", retries=3))
+
+    assert ids(queue.peek()) == ["lab", "appt-early-retried", "appt-early", "appt-late", "follow"]
+
+
+def test_escalate_is_idempotent_per_patient(queue):
+    patient_state = halted("P1", "lab_test", retries=2)
+
+    first = queue.escalate(patient_state, reason="retries exhausted")
+    second = queue.escalate(patient_state)
+
+    assert first is second
+    assert len(queue) == 1
+    assert first.severity == 3
+    assert first.retry_count == 2
+    assert first.event_type == "lab_test"
+
+
+def test_peek_filters_by_event_type_and_state(queue):
+    queue.escalate(halted("A", "lab_test", state=PatientJourneyState.LAB_TEST_SCHEDULED))
+    queue.escalate(halted("B", "appointment"))
+    queue.escalate(halted("C", "appointment", waited=timedelta(hours=1)))
+    queue.escalate(halted("D", "lab_test", waited=timedelta(hours=1)))
+
+    assert ids(queue.peek(event_type="appointment")) == ["B", "C"]
+    assert ids(queue.peek(state=PatientJourneyState.APPOINTMENT_SCHEDULED.value)) == ["D", "B", "C"]
+    assert ids(queue.peek(event_type="lab_test", state=PatientJourneyState.LAB_TEST_SCHEDULED.value)) == ["A"]
+    assert ids(queue.peek(limit=2)) == ["A", "D"]
+    assert queue.count_open(event_type="lab_test") == 2
+    assert queue.count_open(event_type="lab_test", state=PatientJourneyState.APPOINTMENT_SCHEDULED.value) == 1
+
+
+# -------------------------------------------------------------------
+# CLAIM / RELEASE / RESOLVE
+# -------------------------------------------------------------------
+
+def test_claim_removes_from_open_and_release_restores_priority(queue):
+    for i, event_type in enumerate(["lab_test", "appointment", "follow_up"]):
+        queue.escalate(halted(f"P{i}", event_type))
+
+    claimed = queue.claim("ops-1", limit=2)
+
+    assert ids(claimed) == ["P0", "P1"]
+    assert all(e.status == CLAIMED and e.claimed_by == "ops-1" for e in claimed)
+    assert ids(queue.peek()) == ["P2"]
+    assert queue.stats()["claimed"] == 2
+    assert queue.claim("ops-2", event_type="lab_test") == []
+
+    assert queue.release(reviewer="ops-1") == 2
+    assert ids(queue.peek()) == ["P0", "P1", "P2"]
+    assert queue.claimed_by("ops-1") == []
+    assert all(e.status == OPEN for e in queue.peek())
+
+
+def test_resolve_clears_signal_and_rejects_second_resolve(queue):
+    escalation = queue.escalate(halted("P1", "appointment", retries=3))
+    patient_state = queue.patient_state(escalation.escalation_id)
+
+    queue.resolve(escalation.escalation_id, resolution="called patient", rebook=True)
+
+    assert escalation.status == RESOLVED
+    assert escalation.resolution == "called patient"
+    assert not patient_state.signals.get("escalation_required")
+    assert patient_state.get_retry_count("appointment") == 0
+    assert len(queue) == 0
+    with pytest.raises(KeyError):
+        queue.resolve(escalation.escalation_id)
+
+    # The patient can be escalated again once resolved
+    assert queue.escalate(halted("P1", "appointment")).escalation_id != escalation.escalation_id
+
+
+def test_in_memory_queue_needs_no_journal():
+    queue = EscalationQueue()
+    queue.escalate(halted("P1", "lab_test"))
+
+    assert ids(queue.claim("ops")) == ["P1"]
+    queue.compact()
+    assert len(queue) == 1
+
+
+# -------------------------------------------------------------------
+# DURABILITY
+# -------------------------------------------------------------------
+
+def test_reload_restores_open_claimed_and_resolved(queue, journal):
+    a = queue.escalate(halted("A", "lab_test"))
+    queue.escalate(halted("B", "appointment"))
+    c = queue.escalate(halted("C", "follow_up"))
+    queue.claim("ops", limit=1)
+    queue.resolve(c.escalation_id)
+    queue.close()
+
+    reloaded = EscalationQueue(path=journal)
+    try:
+        assert len(reloaded) == 2
+        assert ids(reloaded.peek()) == ["B"]
+        assert reloaded.get(a.escalation_id).claimed_by == "ops"
+        assert reloaded.patient_state(a.escalation_id).patient_id == "A"
+        assert reloaded.get(c.escalation_id) is None
+        # Ids keep counting from the journal
+        assert reloaded.escalate(halted("D", "lab_test")).escalation_id == "ESC-00000004"
+    finally:
+        reloaded.close()
+
+
+def test_torn_tail_is_truncated_on_reload(queue, journal):
+    queue.escalate(halted("A", "lab_test"))
+    queue.close()
+    intact = journal.read_bytes()
+    journal.write_bytes(intact + b'{"op":"escalate","escalation":{"escal')
+
+    reloaded = EscalationQueue(path=journal)
+    reloaded.escalate(halted("B", "appointment"))
+    reloaded.close()
+
+    assert journal.read_bytes().startswith(intact)
+    again = EscalationQueue(path=journal)
+    try:
+        assert ids(again.peek()) == ["A", "B"]
+    finally:
+        again.close()
+
+
+def test_compact_keeps_only_unresolved(queue, journal):
+    escalations = [queue.escalate(halted(f"P{i}", "appointment", waited=timedelta(minutes=i))) for i in range(5)]
+    queue.claim("ops", limit=1)
+    for escalation in escalations[2:]:
+        queue.resolve(escalation.escalation_id)
+
+    queue.compact()
+    queue.close()
+
+    # meta + 2 escalate + 1 claim
+    assert len(journal.read_text(encoding="utf-8").splitlines()) == 4
+    reloaded = EscalationQueue(path=journal)
+    try:
+        assert ids(reloaded.peek()) == ["P1"]
+        assert ids(reloaded.claimed_by("ops")) == ["P0"]
+        assert reloaded.escalate(halted("P9", "lab_test")).escalation_id == "ESC-00000006"
+    finally:
+        reloaded.close()
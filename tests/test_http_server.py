@@ -0,0 +1,242 @@
+"""
+test_http_server.py
+
+HTTP/1.1 framing, keep-alive ordering and error responses of the journey service front end.
+"""
+
+import asyncio
+import json
+
+from app.core.state import EventStatus, PatientEvent, PatientJourneyState
+from app.service.http_server import MAX_BODY_BYTES, JourneyHTTPServer
+from app.service.journey_service import JourneyService
+from app.workflows.journey_runner import JourneyRunner
+
+
+# -------------------------------------------------------------------
+# HELPERS
+# -------------------------------------------------------------------
+
+def serve(scenario):
+    """
+    Runs `scenario(server)` against a server on an ephemeral port.
+    """
+    async def main():
+        server = JourneyHTTPServer(
+            service=JourneyService(runner=JourneyRunner(), batch_window_ms=1),
+            host="127.0.0.1",
+            port=0,
+        )
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def request(method, path, body=None, headers=None):
+    payload = b"" if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode())
+    head = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(payload)}"]
+    for name, value in (headers or {}).items():
+        head.append(f"{name}: {value}")
+    return ("\r\n".join(head) + "\r\n\r\n").encode() + payload
+
+
+async def read_response(reader):
+    """
+    Returns (status, headers, json body), or None at EOF.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    status = int(line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers["content-length"]))
+    return status, headers, json.loads(body)
+
+
+async def exchange(server, raw: bytes, count: int = 1):
+    """
+    Writes raw bytes on one connection and reads up to `count` responses.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    try:
+        writer.write(raw)
+        await writer.drain()
+        responses = []
+        for _ in range(count):
+            response = await read_response(reader)
+            if response is None:
+                break
+            responses.append(response)
+        return responses
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def call(server, method, path, body=None):
+    (response,) = await exchange(server, request(method, path, body, {"Connection": "close"}))
+    return response
+
+
+# -------------------------------------------------------------------
+# ROUTES
+# -------------------------------------------------------------------
+
+def test_register_step_and_get():
+    async def scenario(server):
+        status, _, registered = await call(server, "POST", "/patients", {"patient_id": "P1"})
+        assert status == 200
+        assert registered["current_state"] == PatientJourneyState.NEW_PATIENT.value
+
+        status, _, stepped = await call(server, "POST", "/steps", {"patient_id": "P1"})
+        assert status == 200
+        assert stepped["new_transitions"] > 0
+
+        status, _, full = await call(server, "GET", "/patients/P1?verbose=1")
+        assert status == 200
+        assert full["patient_id"] == "P1"
+        assert full["current_state"] == stepped["current_state"]
+
+        assert (await call(server, "GET", "/health"))[0] == 200
+
+    serve(scenario)
+
+
+def test_keep_alive_answers_pipelined_requests_in_order():
+    async def scenario(server):
+        raw = (
+            request("POST", "/patients", {"patient_id": "K1"})
+            + request("POST", "/patients", {"patient_id": "K2"})
+            + request("GET", "/patients/K1")
+            + request("POST", "/patients", {"patient_id": "K1"}, {"Connection": "close"})
+        )
+        responses = await exchange(server, raw, count=4)
+
+        assert [status for status, _, _ in responses] == [200, 200, 200, 409]
+        assert [body.get("patient_id") for _, _, body in responses[:3]] == ["K1", "K2", "K1"]
+        assert responses[0][1]["connection"] == "keep-alive"
+        assert responses[-1][1]["connection"] == "close"
+
+    serve(scenario)
+
+
+def test_unknown_route_and_wrong_method():
+    async def scenario(server):
+        assert (await call(server, "GET", "/nowhere"))[0] == 404
+        assert (await call(server, "GET", "/steps"))[0] == 405
+        assert (await call(server, "DELETE", "/patients/P1"))[0] == 405
+        assert (await call(server, "GET", "/patients/ghost"))[0] == 404
+
+    serve(scenario)
+
+
+# -------------------------------------------------------------------
+# FRAMING ERRORS
+# -------------------------------------------------------------------
+
+def test_invalid_content_length_is_400_and_closes():
+    async def scenario(server):
+        for value in ("abc", "²", "-5", "1.5"):
+            raw = f"POST /patients HTTP/1.1\r\nContent-Length: {value}\r\n\r\n".encode()
+            responses = await exchange(server, raw + request("GET", "/health"), count=2)
+
+            assert len(responses) == 1, value
+            status, headers, body = responses[0]
+            assert status == 400
+            assert headers["connection"] == "close"
+            assert "Content-Length" in body["error"]
+
+    serve(scenario)
+
+
+def test_malformed_request_line_is_400():
+    async def scenario(server):
+        responses = await exchange(server, b"GARBAGE\r\n\r\n", count=2)
+
+        assert [status for status, _, _ in responses] == [400]
+        assert responses[0][2]["error"] == "Malformed request line"
+
+    serve(scenario)
+
+
+def test_oversized_body_is_413_without_reading_it():
+    async def scenario(server):
+        raw = f"POST /patients HTTP/1.1\r\nContent-Length: {MAX_BODY_BYTES + 1}\r\n\r\n".encode()
+        (response,) = await exchange(server, raw)
+
+        assert response[0] == 413
+        assert response[1]["connection"] == "close"
+
+    serve(scenario)
+
+
+def test_body_must_be_a_json_object():
+    async def scenario(server):
+        status, _, body = await call(server, "POST", "/patients", b"{not json")
+        assert (status, body["error"]) == (400, "Body is not valid JSON")
+
+        status, _, body = await call(server, "POST", "/patients", [1, 2])
+        assert (status, body["error"]) == (400, "Body must be a JSON object")
+
+        assert (await call(server, "POST", "/patients", {}))[0] == 400
+
+    serve(scenario)
+
+
+# -------------------------------------------------------------------
+# SERVICE ERRORS
+# -------------------------------------------------------------------
+
+def test_registration_only_at_new_patient():
+    async def scenario(server):
+        status, _, _ = await call(server, "POST", "/patients", {
+            "patient_id": "P1",
+            "current_state": PatientJourneyState.FOLLOW_UP_SCHEDULED.value,
+        })
+        assert status == 400
+        assert (await call(server, "GET", "/patients/P1"))[0] == 404
+
+    serve(scenario)
+
+
+def test_completed_event_of_wrong_type_is_409_and_changes_nothing():
+    async def scenario(server):
+        await call(server, "POST", "/patients", {"patient_id": "P1"})
+        await call(server, "POST", "/steps", {"patient_id": "P1"})
+
+        patient_state = server.service.patients["P1"]
+        assert patient_state.current_state == PatientJourneyState.APPOINTMENT_SCHEDULED
+        stray = PatientEvent("P1-lab_test-99", "lab_test", patient_state.current_time)
+        patient_state.add_event(stray)
+        transitions = patient_state.transition_count
+
+        status, _, body = await call(server, "POST", "/events", {
+            "patient_id": "P1", "kind": "completed", "event_id": stray.event_id,
+        })
+
+        assert status == 409
+        assert "does not complete" in body["error"]
+        assert stray.status == EventStatus.SCHEDULED
+        assert patient_state.transition_count == transitions
+
+        status, _, body = await call(server, "POST", "/events", {
+            "patient_id": "P1", "kind": "completed", "event_id": "missing",
+        })
+        assert status == 404
+
+        status, _, _ = await call(server, "POST", "/events", {
+            "patient_id": "P1", "kind": "clock", "minutes": -1,
+        })
+        assert status == 400
+
+    serve(scenario)
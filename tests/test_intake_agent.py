@@ -0,0 +1,132 @@
+"""
+test_intake_agent.py
+
+IntakeAgent parsing, validation, rejection and streaming onboarding.
+"""
+
+from datetime import date
+
+import pytest
+
+from app.agents.intake_agent import IntakeAgent, IntakeSummary, iter_rows
+from app.core.state import PatientJourneyState, PatientState
+
+
+TODAY = date(2025, 1, 1)
+
+VALID = {
+    "patient_id": "P1",
+    "full_name": "Ada Lovelace",
+    "date_of_birth": "1990-05-17",
+    "email": "ada@example.com",
+}
+
+
+def parse(**overrides):
+    row = dict(VALID, **overrides)
+    return IntakeAgent(chunk_size=10).parse_record(row, TODAY)
+
+
+# -------------------------------------------------------------------
+# PARSING
+# -------------------------------------------------------------------
+
+def test_valid_row_is_parsed_and_trimmed():
+    record, reason = parse(full_name="  Ada Lovelace ", phone=" ")
+
+    assert reason == "OK"
+    assert record.full_name == "Ada Lovelace"
+    assert record.date_of_birth == date(1990, 5, 17)
+    assert record.phone is None
+
+
+@pytest.mark.parametrize("overrides, reason", [
+    ({"patient_id": ""}, "Missing required field: patient_id"),
+    ({"full_name": None}, "Missing required field: full_name"),
+    ({"date_of_birth": "17/05/1990"}, "Invalid date_of_birth"),
+    ({"date_of_birth": "2030-01-01"}, "date_of_birth is in the future"),
+    ({"email": "", "phone": ""}, "At least one contact"),
+    ({"email": "not-an-email"}, "Invalid email"),
+])
+def test_invalid_rows_are_rejected_with_a_reason(overrides, reason):
+    record, message = parse(**overrides)
+
+    assert record is None
+    assert message.startswith(reason)
+
+
+def test_duplicates_within_a_chunk_are_rejected():
+    summary = IntakeSummary()
+    rows = [(1, VALID), (2, dict(VALID)), (3, dict(VALID, patient_id="P2"))]
+
+    accepted = IntakeAgent().validate_batch(rows, TODAY, summary)
+
+    assert [r.patient_id for r in accepted] == ["P1", "P2"]
+    assert summary.rejections == [(2, "Duplicate patient_id: P1")]
+
+
+def test_summary_keeps_a_bounded_number_of_rejections():
+    summary = IntakeSummary(max_rejections_kept=2)
+    for line_no in range(5):
+        summary.reject(line_no, "bad")
+
+    assert summary.rejected == 5
+    assert len(summary.rejections) == 2
+
+
+# -------------------------------------------------------------------
+# STREAMING
+# -------------------------------------------------------------------
+
+def test_csv_rows_are_numbered_from_the_first_data_line(tmp_path):
+    path = tmp_path / "patients.csv"
+    path.write_text("patient_id,full_name,date_of_birth,phone\nP1,Ada,1990-01-01,555\n")
+
+    assert list(iter_rows(path)) == [
+        (2, {"patient_id": "P1", "full_name": "Ada", "date_of_birth": "1990-01-01", "phone": "555"}),
+    ]
+
+
+def test_unsupported_file_type_raises(tmp_path):
+    path = tmp_path / "patients.xml"
+    path.write_text("<patients/>")
+
+    with pytest.raises(ValueError):
+        list(iter_rows(path))
+
+
+def test_stream_intake_onboards_valid_rows_and_rejects_the_rest(tmp_path):
+    path = tmp_path / "patients.jsonl"
+    path.write_text("\n".join([
+        '{"patient_id": "P1", "full_name": "A", "date_of_birth": "1990-01-01", "phone": "1"}',
+        "null",
+        "[1]",
+        "{broken",
+        "",
+        '{"patient_id": "P2", "full_name": "B", "date_of_birth": "1991-01-01", "email": "b@x.org"}',
+        '{"patient_id": "P3", "full_name": "C", "date_of_birth": "1992-01-01"}',
+    ]) + "\n")
+    summary = IntakeSummary()
+
+    chunks = list(IntakeAgent(chunk_size=2).stream_intake(path, summary))
+
+    patients = [p for chunk in chunks for p in chunk]
+    assert [p.patient_id for p in patients] == ["P1", "P2"]
+    assert all(p.current_state == PatientJourneyState.INTAKE_COMPLETED for p in patients)
+    assert all(len(chunk) <= 2 for chunk in chunks)
+
+    assert (summary.accepted, summary.rejected) == (2, 4)
+    reasons = dict(summary.rejections)
+    assert reasons[2] == "Expected a JSON object, got NoneType"
+    assert reasons[3] == "Expected a JSON object, got list"
+    assert reasons[4].startswith("Invalid JSON")
+    assert reasons[7].startswith("At least one contact")
+
+
+def test_complete_intake_only_applies_to_new_patients():
+    agent = IntakeAgent()
+    patient_state = PatientState(patient_id="P1")
+
+    assert agent.complete_intake(patient_state) is True
+    assert agent.complete_intake(patient_state) is False
+    assert [t.by for t in patient_state.history] == ["IntakeAgent"]
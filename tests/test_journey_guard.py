@@ -0,0 +1,101 @@
+"""
+test_journey_guard.py
+
+JourneyGuard budgets and their use by the journey graph.
+"""
+
+from datetime import timedelta
+
+from app.core.journey_guard import STALLED, JourneyBudget, JourneyGuard
+from app.core.state import PatientJourneyState, PatientState
+from app.workflows.journey_runner import JourneyRunner
+
+
+def test_unchanged_state_stalls_after_no_progress_budget():
+    guard = JourneyGuard(JourneyBudget(max_iterations=100, max_no_progress=3))
+    patient_state = PatientState(patient_id="P1")
+
+    outcomes = [guard.tick(patient_state) for _ in range(4)]
+
+    assert outcomes[:3] == [None, None, None]
+    assert outcomes[3].status == STALLED
+    assert "No progress for 3 iterations" in outcomes[3].reason
+    assert outcomes[3].iterations == 4
+
+
+def test_progress_resets_the_no_progress_counter():
+    guard = JourneyGuard(JourneyBudget(max_iterations=100, max_no_progress=2))
+    patient_state = PatientState(patient_id="P1")
+
+    for _ in range(10):
+        patient_state.advance_time(timedelta(minutes=1))
+        assert guard.tick(patient_state) is None
+    assert guard.no_progress == 0
+
+
+def test_signals_count_as_progress():
+    guard = JourneyGuard(JourneyBudget(max_iterations=100, max_no_progress=1))
+    patient_state = PatientState(patient_id="P1")
+
+    assert guard.tick(patient_state) is None
+    patient_state.set_signal("missed_event")
+    assert guard.tick(patient_state) is None
+    assert guard.tick(patient_state).status == STALLED
+
+
+def test_iteration_budget():
+    guard = JourneyGuard(JourneyBudget(max_iterations=5, max_no_progress=100))
+    patient_state = PatientState(patient_id="P1")
+
+    for i in range(4):
+        patient_state.advance_time(timedelta(minutes=1))
+        assert guard.tick(patient_state) is None
+
+    patient_state.advance_time(timedelta(minutes=1))
+    outcome = guard.tick(patient_state)
+    assert outcome.status == STALLED
+    assert "Iteration budget of 5" in outcome.reason
+
+
+def test_wall_clock_budget():
+    guard = JourneyGuard(JourneyBudget(max_iterations=100, max_wall_seconds=1.0, max_no_progress=100))
+    guard.started_at -= 2.0
+
+    outcome = guard.tick(PatientState(patient_id="P1"))
+    assert outcome.status == STALLED
+    assert "Wall-clock budget" in outcome.reason
+    assert outcome.elapsed_seconds >= 2.0
+
+
+def test_recursion_limit_is_never_reached_first():
+    budget = JourneyBudget(max_iterations=7)
+    assert budget.recursion_limit > budget.max_iterations * 4
+
+
+# -------------------------------------------------------------------
+# GRAPH
+# -------------------------------------------------------------------
+
+def test_stuck_journey_ends_with_an_outcome_instead_of_raising():
+    runner = JourneyRunner(budget=JourneyBudget(max_iterations=10, max_no_progress=2))
+    patient_state = PatientState(patient_id="P1")
+
+    result = runner.run(patient_state)
+
+    # Nothing completes the booked appointment, so the journey stalls
+    assert patient_state.current_state == PatientJourneyState.APPOINTMENT_SCHEDULED
+    assert result["outcome"].status == STALLED
+    assert result["outcome"].iterations <= 10
+    assert patient_state.signals["journey_stalled"] is True
+
+
+def test_next_run_is_not_halted_by_an_old_stall():
+    runner = JourneyRunner(budget=JourneyBudget(max_iterations=10, max_no_progress=2))
+    patient_state = PatientState(patient_id="P1")
+    runner.run(patient_state)
+
+    # Time moves on and the appointment is missed: the next run reschedules
+    patient_state.advance_time(timedelta(days=1))
+    runner.run(patient_state)
+
+    assert patient_state.get_retry_count("appointment") == 1
@@ -0,0 +1,138 @@
+"""
+test_rescheduling.py
+
+Retry policies, backoff and missed-event rescheduling in SchedulingAgent.
+"""
+
+from datetime import timedelta
+
+from app.agents.scheduling_agent import SchedulingAgent
+from app.core.rescheduling import RetryPolicy, reschedule_event
+from app.core.state import EventStatus, PatientEvent, PatientState
+from app.tools.scheduling_tools import (
+    ResourceCalendar,
+    SlotAllocator,
+    build_default_allocator,
+)
+
+
+def missed_appointment(patient_state, event_id="P1-appointment-1", attempt=0):
+    event = PatientEvent(
+        event_id=event_id,
+        event_type="appointment",
+        scheduled_time=patient_state.current_time,
+        attempt=attempt,
+    )
+    patient_state.add_event(event)
+    patient_state.advance_time(timedelta(hours=1))
+    return event
+
+
+def agent(max_retries=2, allocator=None):
+    return SchedulingAgent(
+        slot_allocator=build_default_allocator() if allocator is None else allocator,
+        retry_policies={"appointment": RetryPolicy(max_retries=max_retries, base_delay=timedelta(days=2))},
+    )
+
+
+# -------------------------------------------------------------------
+# RETRY POLICY
+# -------------------------------------------------------------------
+
+def test_backoff_grows_geometrically_and_is_capped():
+    policy = RetryPolicy(max_retries=5, base_delay=timedelta(days=1), factor=2.0, max_delay=timedelta(days=5))
+
+    assert [policy.backoff(n) for n in (1, 2, 3, 4)] == [
+        timedelta(days=1), timedelta(days=2), timedelta(days=4), timedelta(days=5),
+    ]
+
+
+def test_jitter_is_deterministic_and_bounded():
+    policy = RetryPolicy(max_retries=1, base_delay=timedelta(hours=1), jitter=timedelta(minutes=30))
+
+    first = policy.backoff(1, key="P1:E1")
+    assert first == policy.backoff(1, key="P1:E1")
+    assert timedelta(hours=1) <= first < timedelta(hours=1, minutes=30)
+    assert policy.backoff(1) == timedelta(hours=1)
+
+
+def test_reschedule_event_marks_missed_and_builds_next_attempt():
+    patient_state = PatientState(patient_id="P1")
+    event = missed_appointment(patient_state, event_id="P1-appointment-1#1", attempt=1)
+    policy = RetryPolicy(max_retries=3, base_delay=timedelta(days=1))
+
+    replacement = reschedule_event(patient_state, event, policy)
+
+    assert event.status == EventStatus.MISSED
+    assert replacement.event_id == "P1-appointment-1#2"
+    assert replacement.attempt == 2
+    assert replacement.scheduled_time == patient_state.current_time + timedelta(days=2)
+    # Not attached: the caller books it first
+    assert replacement not in patient_state.events
+
+
+# -------------------------------------------------------------------
+# SCHEDULING AGENT
+# -------------------------------------------------------------------
+
+def test_missed_event_is_rebooked_after_backoff():
+    patient_state = PatientState(patient_id="P1")
+    missed_appointment(patient_state)
+
+    assert agent().handle_missed_events(patient_state) is True
+
+    original, replacement = patient_state.events
+    assert original.status == EventStatus.MISSED
+    assert replacement.status == EventStatus.SCHEDULED
+    assert replacement.attempt == 1
+    assert replacement.resource_id is not None
+    assert replacement.scheduled_time >= patient_state.current_time + timedelta(days=2)
+    assert patient_state.get_retry_count("appointment") == 1
+    assert not patient_state.signals.get("escalation_required")
+
+
+def test_exhausted_retries_escalate():
+    patient_state = PatientState(patient_id="P1")
+    scheduler = agent(max_retries=1)
+
+    missed_appointment(patient_state)
+    assert scheduler.handle_missed_events(patient_state) is True
+
+    patient_state.current_time = patient_state.events[-1].scheduled_time
+    patient_state.advance_time(timedelta(hours=1))
+    assert scheduler.handle_missed_events(patient_state) is False
+
+    assert patient_state.signals["escalation_required"] is True
+    assert [e.status for e in patient_state.events] == [EventStatus.MISSED, EventStatus.MISSED]
+
+
+def test_no_capacity_for_replacement_escalates():
+    patient_state = PatientState(patient_id="P1")
+    missed_appointment(patient_state)
+
+    assert agent(allocator=SlotAllocator()).handle_missed_events(patient_state) is False
+
+    assert patient_state.signals["escalation_required"] is True
+    assert len(patient_state.events) == 1
+    assert patient_state.events[0].status == EventStatus.MISSED
+
+
+def test_rescheduling_is_deterministic():
+    def run():
+        patient_state = PatientState(patient_id="P1")
+        missed_appointment(patient_state)
+        allocator = SlotAllocator()
+        allocator.add_resource(ResourceCalendar("doctor-1", "doctor"))
+        agent(allocator=allocator).handle_missed_events(patient_state)
+        return [(e.event_id, e.scheduled_time, e.resource_id) for e in patient_state.events]
+
+    assert run() == run()
+
+
+def test_unknown_event_types_are_not_retried():
+    patient_state = PatientState(patient_id="P1")
+    patient_state.add_event(PatientEvent("P1-x-1", "x_ray", patient_state.current_time))
+    patient_state.advance_time(timedelta(hours=1))
+
+    assert agent().handle_missed_events(patient_state) is False
+    assert patient_state.signals["escalation_required"] is True
@@ -0,0 +1,174 @@
+"""
+test_scheduling_tools.py
+
+Bitmap resource calendars and the capacity-aware SlotAllocator.
+"""
+
+from datetime import date, datetime, time
+
+import pytest
+
+from app.tools.scheduling_tools import (
+    EARLIEST_FIT,
+    FIRST_FIT,
+    ResourceCalendar,
+    SlotAllocator,
+    SlotRequest,
+)
+
+
+WEDNESDAY = date(2025, 1, 1)
+SATURDAY = date(2025, 1, 4)
+
+
+def allocator(*calendars, strategy=EARLIEST_FIT, max_days_ahead=60):
+    result = SlotAllocator(max_days_ahead=max_days_ahead, strategy=strategy)
+    for calendar in calendars:
+        result.add_resource(calendar)
+    return result
+
+
+def at(day, hour, minute=0):
+    return datetime.combine(day, time(hour, minute))
+
+
+# -------------------------------------------------------------------
+# RESOURCE CALENDAR
+# -------------------------------------------------------------------
+
+def test_find_in_day_skips_booked_runs():
+    calendar = ResourceCalendar("doctor-1", "doctor")
+    assert calendar.slots_per_day == 32
+
+    calendar.book(WEDNESDAY, 0, 2)
+    calendar.book(WEDNESDAY, 3, 1)
+
+    assert calendar.find_in_day(WEDNESDAY, 0, 1) == 2
+    assert calendar.find_in_day(WEDNESDAY, 0, 2) == 4
+    assert calendar.find_in_day(WEDNESDAY, 5, 3) == 5
+    assert calendar.find_in_day(WEDNESDAY, 31, 2) is None
+
+
+def test_double_booking_raises_and_release_frees():
+    calendar = ResourceCalendar("doctor-1", "doctor")
+    calendar.book(WEDNESDAY, 4, 2)
+
+    with pytest.raises(ValueError):
+        calendar.book(WEDNESDAY, 5, 1)
+
+    calendar.release(WEDNESDAY, 4, 2)
+    assert calendar.find_in_day(WEDNESDAY, 0, 32) == 0
+
+
+def test_full_day_is_closed():
+    calendar = ResourceCalendar("doctor-1", "doctor")
+    calendar.book(WEDNESDAY, 0, calendar.slots_per_day)
+
+    assert not calendar.is_open(WEDNESDAY)
+    assert calendar.utilisation(WEDNESDAY) == 1.0
+
+
+def test_slot_time_conversion_rounds_up():
+    calendar = ResourceCalendar("doctor-1", "doctor")
+
+    assert calendar.first_slot_at_or_after(at(WEDNESDAY, 8), WEDNESDAY) == 0
+    assert calendar.first_slot_at_or_after(at(WEDNESDAY, 9, 1), WEDNESDAY) == 1
+    assert calendar.slot_start(WEDNESDAY, 5) == at(WEDNESDAY, 10, 15)
+    assert calendar.slots_for(20) == 2
+
+
+# -------------------------------------------------------------------
+# ALLOCATOR
+# -------------------------------------------------------------------
+
+def test_allocate_books_consecutive_slots():
+    slots = allocator(ResourceCalendar("doctor-1", "doctor"))
+
+    first = slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 9), 30))
+    second = slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 9), 30))
+
+    assert (first.start, first.end) == (at(WEDNESDAY, 9), at(WEDNESDAY, 9, 30))
+    assert second.start == at(WEDNESDAY, 9, 30)
+
+
+def test_request_after_hours_rolls_to_next_workday():
+    slots = allocator(ResourceCalendar("doctor-1", "doctor"))
+
+    # Friday evening → Monday morning
+    assignment = slots.allocate(SlotRequest("doctor", at(date(2025, 1, 3), 18), 30))
+    assert assignment.start == at(date(2025, 1, 6), 9)
+
+
+def test_earliest_fit_picks_the_earliest_start_across_resources():
+    busy = ResourceCalendar("doctor-1", "doctor")
+    busy.book(WEDNESDAY, 0, 8)
+    late_opener = ResourceCalendar("doctor-2", "doctor", day_start=time(10, 0))
+    early_opener = ResourceCalendar("doctor-3", "doctor", day_start=time(8, 0))
+
+    earliest = allocator(busy, late_opener, early_opener, strategy=EARLIEST_FIT)
+    assignment = earliest.allocate(SlotRequest("doctor", at(WEDNESDAY, 7), 15))
+    assert (assignment.resource_id, assignment.start) == ("doctor-3", at(WEDNESDAY, 8))
+
+
+def test_first_fit_prefers_registration_order():
+    busy = ResourceCalendar("doctor-1", "doctor")
+    busy.book(WEDNESDAY, 0, 8)
+    other = ResourceCalendar("doctor-2", "doctor", day_start=time(8, 0))
+
+    first = allocator(busy, other, strategy=FIRST_FIT)
+    assignment = first.allocate(SlotRequest("doctor", at(WEDNESDAY, 7), 15))
+    assert (assignment.resource_id, assignment.start) == ("doctor-1", at(WEDNESDAY, 11))
+
+
+def test_earliest_fit_respects_the_requested_start_time():
+    slots = allocator(
+        ResourceCalendar("doctor-1", "doctor"),
+        ResourceCalendar("doctor-2", "doctor"),
+    )
+    slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 9), 15))
+
+    assignment = slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 13, 5), 15))
+    assert assignment.start == at(WEDNESDAY, 13, 15)
+
+
+def test_weekends_and_unknown_kinds_get_no_slot():
+    weekdays_only = allocator(ResourceCalendar("doctor-1", "doctor"), max_days_ahead=1)
+
+    assert weekdays_only.allocate(SlotRequest("doctor", at(SATURDAY, 9), 15)) is None
+    assert weekdays_only.allocate(SlotRequest("lab", at(WEDNESDAY, 9), 15)) is None
+
+
+def test_full_capacity_returns_none_until_released():
+    slots = allocator(ResourceCalendar("doctor-1", "doctor"), max_days_ahead=0)
+    booked = [slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 9), 60)) for _ in range(8)]
+
+    assert all(booked)
+    assert slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 9), 15)) is None
+
+    slots.release(booked[3])
+    again = slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 9), 60))
+    assert again.start == booked[3].start
+
+
+def test_allocate_many_serves_in_time_order_and_returns_input_order():
+    slots = allocator(ResourceCalendar("doctor-1", "doctor"))
+    requests = [
+        SlotRequest("doctor", at(WEDNESDAY, 10), 15),
+        SlotRequest("doctor", at(WEDNESDAY, 9), 60),
+    ]
+
+    late, early = slots.allocate_many(requests)
+
+    assert early.start == at(WEDNESDAY, 9)
+    assert late.start == at(WEDNESDAY, 10)
+
+
+def test_strategies_agree_on_a_single_resource():
+    def book_all(strategy):
+        slots = allocator(ResourceCalendar("doctor-1", "doctor"), strategy=strategy)
+        return [
+            slots.allocate(SlotRequest("doctor", at(WEDNESDAY, 9 + i % 8), 15 * (1 + i % 4))).start
+            for i in range(200)
+        ]
+
+    assert book_all(FIRST_FIT) == book_all(EARLIEST_FIT)
@@ -0,0 +1,269 @@
+"""
+test_tool_executor.py
+
+ToolExecutor and the tool-calling loop, driven by a scripted fake model.
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+
+from app.tools.tool_executor import (
+    ToolExecutor,
+    ToolResultCache,
+    _MISS,
+    arun_tool_loop,
+    run_tool_loop,
+)
+
+
+# -------------------------------------------------------------------
+# FIXTURES
+# -------------------------------------------------------------------
+
+class FakeModel:
+    """
+    Returns scripted AIMessages in order, recording what it was sent.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.seen = []
+
+    def invoke(self, messages):
+        self.seen.append(list(messages))
+        return self.responses.pop(0)
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+def tool_call(name, args, call_id):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+def make_tools(calls):
+    def slow_echo(text: str, delay: float = 0.0) -> str:
+        """Echoes text after a delay."""
+        calls.append(("slow_echo", text))
+        time.sleep(delay)
+        return text
+
+    def square(x: int) -> int:
+        """Squares x."""
+        calls.append(("square", x))
+        return x * x
+
+    def hang(seconds: float) -> str:
+        """Sleeps for `seconds`."""
+        time.sleep(seconds)
+        return "done"
+
+    def explode() -> str:
+        """Always fails."""
+        raise RuntimeError("boom")
+
+    return [
+        StructuredTool.from_function(slow_echo),
+        StructuredTool.from_function(square, metadata={"pure": True}),
+        StructuredTool.from_function(hang, metadata={"timeout": 0.05}),
+        StructuredTool.from_function(explode),
+    ]
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def executor(calls):
+    executor = ToolExecutor(make_tools(calls), max_workers=4, default_timeout=5.0)
+    yield executor
+    executor.close()
+
+
+# -------------------------------------------------------------------
+# EXECUTE
+# -------------------------------------------------------------------
+
+def test_results_come_back_in_call_order(executor):
+    # The first call finishes last
+    results = executor.execute([
+        tool_call("slow_echo", {"text": "a", "delay": 0.2}, "1"),
+        tool_call("slow_echo", {"text": "b", "delay": 0.0}, "2"),
+        tool_call("square", {"x": 3}, "3"),
+    ])
+
+    assert [m.tool_call_id for m in results] == ["1", "2", "3"]
+    assert [m.content for m in results] == ["a", "b", "9"]
+
+
+def test_calls_run_concurrently(executor):
+    started = time.monotonic()
+    executor.execute([
+        tool_call("slow_echo", {"text": str(i), "delay": 0.2}, str(i))
+        for i in range(4)
+    ])
+    assert time.monotonic() - started < 0.6
+
+
+def test_timeout_becomes_error_message(executor):
+    results = executor.execute([
+        tool_call("hang", {"seconds": 1.0}, "1"),
+        tool_call("square", {"x": 2}, "2"),
+    ])
+
+    assert results[0].status == "error"
+    assert "timed out" in results[0].content
+    assert results[1].content == "4"
+
+
+def test_unknown_tool_and_failures_do_not_raise(executor):
+    results = executor.execute([
+        tool_call("nope", {}, "1"),
+        tool_call("explode", {}, "2"),
+    ])
+
+    assert results[0].status == "error"
+    assert "unknown tool" in results[0].content
+    assert results[1].status == "error"
+    assert "RuntimeError: boom" in results[1].content
+
+
+def test_pure_results_are_cached_across_turns(executor, calls):
+    executor.execute([tool_call("square", {"x": 5}, "1")])
+    again = executor.execute([
+        tool_call("square", {"x": 5}, "2"),
+        tool_call("square", {"x": 5}, "3"),
+    ])
+
+    assert [m.content for m in again] == ["25", "25"]
+    assert calls.count(("square", 5)) == 1
+    assert executor.cache.hits >= 2
+
+
+def test_identical_pure_calls_in_one_turn_share_one_execution(executor, calls):
+    executor.execute([
+        tool_call("square", {"x": 7}, "1"),
+        tool_call("square", {"x": 7}, "2"),
+    ])
+    assert calls.count(("square", 7)) == 1
+
+
+def test_impure_results_are_not_cached(executor, calls):
+    executor.execute([tool_call("slow_echo", {"text": "x"}, "1")])
+    executor.execute([tool_call("slow_echo", {"text": "x"}, "2")])
+    assert calls.count(("slow_echo", "x")) == 2
+
+
+def test_aexecute_keeps_order_and_times_out(executor):
+    results = asyncio.run(executor.aexecute([
+        tool_call("hang", {"seconds": 1.0}, "1"),
+        tool_call("slow_echo", {"text": "a", "delay": 0.1}, "2"),
+        tool_call("nope", {}, "3"),
+    ]))
+
+    assert [m.tool_call_id for m in results] == ["1", "2", "3"]
+    assert "timed out" in results[0].content
+    assert results[1].content == "a"
+    assert results[2].status == "error"
+
+
+# -------------------------------------------------------------------
+# DIRECT CALLS
+# -------------------------------------------------------------------
+
+def test_call_returns_raw_value_and_uses_cache(executor, calls):
+    assert executor.call("square", {"x": 4}) == 16
+    assert executor.call("square", {"x": 4}) == 16
+    assert calls.count(("square", 4)) == 1
+
+
+def test_call_raises_for_unknown_tool_and_failures(executor):
+    with pytest.raises(KeyError):
+        executor.call("nope", {})
+    with pytest.raises(RuntimeError):
+        executor.call("explode", {})
+
+
+# -------------------------------------------------------------------
+# CACHE
+# -------------------------------------------------------------------
+
+def test_cache_evicts_least_recently_used():
+    cache = ToolResultCache(max_size=2, ttl_seconds=60)
+    a, b, c = (ToolResultCache.key("t", {"x": i}) for i in range(3))
+
+    cache.put(a, 1)
+    cache.put(b, 2)
+    cache.get(a)  # a is now most recent
+    cache.put(c, 3)
+
+    assert cache.get(a) == 1
+    assert cache.get(c) == 3
+    assert cache.get(b) is _MISS
+    assert len(cache) == 2
+
+
+def test_cache_entries_expire():
+    cache = ToolResultCache(max_size=10, ttl_seconds=0.05)
+    key = ToolResultCache.key("t", {"x": 1})
+    cache.put(key, 1)
+    assert cache.get(key) == 1
+
+    time.sleep(0.1)
+    assert cache.get(key) is _MISS
+    assert len(cache) == 0
+
+
+def test_cache_key_ignores_argument_order():
+    assert ToolResultCache.key("t", {"a": 1, "b": 2}) == ToolResultCache.key("t", {"b": 2, "a": 1})
+
+
+# -------------------------------------------------------------------
+# TOOL-CALLING LOOP
+# -------------------------------------------------------------------
+
+def test_run_tool_loop_feeds_results_back_in_order(executor):
+    model = FakeModel([
+        AIMessage(content="", tool_calls=[
+            tool_call("slow_echo", {"text": "first", "delay": 0.1}, "1"),
+            tool_call("square", {"x": 6}, "2"),
+            tool_call("nope", {}, "3"),
+        ]),
+        AIMessage(content="all done"),
+    ])
+    messages = [HumanMessage(content="go")]
+
+    final = run_tool_loop(model, messages, executor)
+
+    assert final.content == "all done"
+    second_turn = model.seen[1]
+    tool_messages = second_turn[2:]
+    assert [m.tool_call_id for m in tool_messages] == ["1", "2", "3"]
+    assert [m.content for m in tool_messages[:2]] == ["first", "36"]
+    assert tool_messages[2].status == "error"
+    assert messages[-1] is final
+
+
+def test_run_tool_loop_gives_up_after_max_turns(executor):
+    looping = AIMessage(content="", tool_calls=[tool_call("square", {"x": 1}, "1")])
+    model = FakeModel([looping] * 3)
+
+    with pytest.raises(RuntimeError):
+        run_tool_loop(model, [HumanMessage(content="go")], executor, max_turns=3)
+
+
+def test_arun_tool_loop(executor):
+    model = FakeModel([
+        AIMessage(content="", tool_calls=[tool_call("square", {"x": 9}, "1")]),
+        AIMessage(content="81"),
+    ])
+    final = asyncio.run(arun_tool_loop(model, [HumanMessage(content="go")], executor))
+
+    assert final.content == "81"
+    assert model.seen[1][-1].content == "81"
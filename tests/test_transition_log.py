@@ -0,0 +1,184 @@
+"""
+test_transition_log.py
+
+Write-ahead log recording, recovery, compaction and point-in-time replay.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from app.agents.intake_agent import IntakeAgent
+from app.core.state import (
+    EventStatus,
+    PatientEvent,
+    PatientJourneyState,
+    PatientState,
+    SIMULATION_START,
+)
+from app.memory.transition_log import (
+    HistoryNotRetainedError,
+    TransitionLog,
+    apply_record,
+    recover_states,
+    rebuild_patient,
+)
+from app.tools.persistence_tools import patient_state_to_dict
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    return tmp_path / "wal", tmp_path / "snapshots"
+
+
+@pytest.fixture
+def log(dirs):
+    wal_dir, snapshot_dir = dirs
+    log = TransitionLog(
+        wal_dir=wal_dir,
+        snapshot_dir=snapshot_dir,
+        fsync=False,
+        snapshot_every=10 ** 9,
+        keep_snapshots=1,
+    )
+    yield log
+    log.close()
+
+
+def drive(patient_state):
+    """
+    Makes one change of every recorded kind.
+    """
+    IntakeAgent().complete_intake(patient_state)
+    event = PatientEvent(f"{patient_state.patient_id}-appointment-1", "appointment", patient_state.current_time)
+    patient_state.add_event(event)
+    patient_state.apply_transition(PatientJourneyState.APPOINTMENT_SCHEDULED, by="SchedulingAgent")
+    patient_state.advance_time(timedelta(hours=2))
+    patient_state.set_signal("missed_event")
+    patient_state.increment_retry("appointment")
+    patient_state.set_event_status(event, EventStatus.MISSED)
+    patient_state.clear_signal("missed_event")
+
+
+def same(a: PatientState, b: PatientState) -> bool:
+    return patient_state_to_dict(a) == patient_state_to_dict(b)
+
+
+# -------------------------------------------------------------------
+# RECOVERY
+# -------------------------------------------------------------------
+
+def test_recover_rebuilds_every_change(log):
+    patients = [PatientState(patient_id=f"P{i}") for i in range(3)]
+    for patient_state in patients:
+        log.attach(patient_state)
+        drive(patient_state)
+
+    recovered = log.recover()
+
+    assert set(recovered) == {"P0", "P1", "P2"}
+    for patient_state in patients:
+        assert same(recovered[patient_state.patient_id], patient_state)
+
+
+def test_history_before_attach_is_recovered(log):
+    patient_state = PatientState(patient_id="P1")
+    IntakeAgent().complete_intake(patient_state)
+
+    log.attach(patient_state)
+    log.attach(patient_state)  # runners attach on every run
+    patient_state.apply_transition(PatientJourneyState.APPOINTMENT_SCHEDULED, by="SchedulingAgent")
+
+    recovered = log.recover()["P1"]
+    assert same(recovered, patient_state)
+    assert recovered.has_completed(PatientJourneyState.INTAKE_COMPLETED)
+
+
+def test_lsns_are_monotonic_and_survive_reopen(dirs):
+    wal_dir, snapshot_dir = dirs
+    first = TransitionLog(wal_dir=wal_dir, snapshot_dir=snapshot_dir, fsync=False)
+    lsns = [first.record("P1", "time", {}, SIMULATION_START) for _ in range(3)]
+    first.close()
+
+    second = TransitionLog(wal_dir=wal_dir, snapshot_dir=snapshot_dir, fsync=False)
+    assert second.record("P1", "time", {}, SIMULATION_START, wait=True) == lsns[-1] + 1
+    second.close()
+    assert lsns == [1, 2, 3]
+
+
+def test_torn_final_line_is_ignored(log, dirs):
+    wal_dir, snapshot_dir = dirs
+    patient_state = PatientState(patient_id="P1")
+    log.attach(patient_state)
+    drive(patient_state)
+    log.flush()
+
+    segment = sorted(wal_dir.glob("wal-*"))[-1]
+    with segment.open("a", encoding="utf-8") as handle:
+        handle.write('{"lsn": 999, "pid": "P1", "kind": "trans')
+
+    assert same(recover_states(wal_dir, snapshot_dir)["P1"], patient_state)
+
+
+def test_compaction_keeps_recovery_exact(log):
+    patient_state = PatientState(patient_id="P1")
+    log.attach(patient_state)
+    IntakeAgent().complete_intake(patient_state)
+
+    assert log.compact() is not None
+    event = PatientEvent("P1-appointment-1", "appointment", patient_state.current_time)
+    patient_state.add_event(event)
+    patient_state.apply_transition(PatientJourneyState.APPOINTMENT_SCHEDULED, by="SchedulingAgent")
+
+    assert same(log.recover()["P1"], patient_state)
+
+
+def test_unknown_record_kind_raises():
+    with pytest.raises(ValueError):
+        apply_record({}, {"pid": "P1", "kind": "bogus", "at": SIMULATION_START.isoformat(), "data": {}})
+
+
+# -------------------------------------------------------------------
+# POINT-IN-TIME REPLAY
+# -------------------------------------------------------------------
+
+def test_replay_until_lsn_and_time(log, dirs):
+    wal_dir, snapshot_dir = dirs
+    patient_state = PatientState(patient_id="P1")
+    log.attach(patient_state)
+
+    IntakeAgent().complete_intake(patient_state)
+    intake_lsn = log.record("P1", "time", {}, patient_state.current_time, wait=True)
+
+    patient_state.advance_time(timedelta(days=1))
+    patient_state.apply_transition(PatientJourneyState.APPOINTMENT_SCHEDULED, by="SchedulingAgent")
+    log.flush()
+
+    by_lsn = rebuild_patient("P1", wal_dir, snapshot_dir, until_lsn=intake_lsn)
+    assert by_lsn.current_state == PatientJourneyState.INTAKE_COMPLETED
+
+    by_time = rebuild_patient("P1", wal_dir, snapshot_dir, until_time=SIMULATION_START + timedelta(hours=1))
+    assert by_time.current_state == PatientJourneyState.INTAKE_COMPLETED
+
+    latest = rebuild_patient("P1", wal_dir, snapshot_dir)
+    assert latest.current_state == PatientJourneyState.APPOINTMENT_SCHEDULED
+    assert rebuild_patient("nobody", wal_dir, snapshot_dir) is None
+
+
+def test_replay_before_retained_history_raises(log, dirs):
+    wal_dir, snapshot_dir = dirs
+    patient_state = PatientState(patient_id="P1")
+    log.attach(patient_state)
+
+    IntakeAgent().complete_intake(patient_state)
+    log.compact()
+    patient_state.advance_time(timedelta(hours=1))
+    log.compact()
+    patient_state.advance_time(timedelta(hours=1))
+    log.compact()
+
+    with pytest.raises(HistoryNotRetainedError):
+        rebuild_patient("P1", wal_dir, snapshot_dir, until_lsn=1)
+
+    # Recent history is still replayable
+    assert rebuild_patient("P1", wal_dir, snapshot_dir).current_state == PatientJourneyState.INTAKE_COMPLETED